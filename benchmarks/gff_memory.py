@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+""" Reports the time and peak memory to read a GFF3 file into memory. """
+
+import time
+import argparse
+import resource
+
+from predectorutils.gff import GFFRecord
+
+
+def cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument(
+        "infile",
+        type=argparse.FileType('r'),
+        help="The GFF3 file to read."
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = cli()
+
+    start = time.perf_counter()
+    records = list(GFFRecord.from_file(args.infile))
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on linux.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"records\t{len(records)}")
+    print(f"max_rss_mib\t{rss:.0f}")
+    print(f"seconds\t{elapsed:.2f}")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+""" Reports the throughput of GFFRecord.parse on GFF3 files. """
+
+import time
+import argparse
+
+from predectorutils.gff import GFFRecord
+
+
+def cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument(
+        "infiles",
+        type=argparse.FileType('r'),
+        nargs="+",
+        help="The GFF3 files to parse."
+    )
+
+    parser.add_argument(
+        "-r", "--repeats",
+        type=int,
+        default=3,
+        help="Report the fastest of this many runs. Default: 3"
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = cli()
+
+    print("file\tlines\tlines_per_second")
+    for handle in args.infiles:
+        # Only time the parsing, not the reading or the comment checks.
+        lines = [
+            line.rstrip("\n")
+            for line
+            in handle
+            if not line.startswith("#") and line.strip() != ""
+        ]
+        handle.close()
+
+        best = float("inf")
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            for line in lines:
+                GFFRecord.parse(line)
+            best = min(best, time.perf_counter() - start)
+
+        print(f"{handle.name}\t{len(lines)}\t{len(lines) / best:.0f}")
+    return
+
+
+if __name__ == "__main__":
+    main()
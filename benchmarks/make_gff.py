@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+""" Writes a synthetic genome annotation and matching predector GFF3.
+
+The genes have one mRNA each, with exons and CDSs, and the protein
+annotations use the mRNA IDs as seqids, like the input to map_to_genome.
+Both files are sorted by mRNA ID.
+The defaults give about 530k gene lines and 370k annotation lines.
+"""
+
+import random
+import argparse
+
+
+def cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument(
+        "genes",
+        type=argparse.FileType('w'),
+        help="Where to write the genome annotation GFF3."
+    )
+
+    parser.add_argument(
+        "annotations",
+        type=argparse.FileType('w'),
+        help="Where to write the protein annotation GFF3."
+    )
+
+    parser.add_argument(
+        "-n", "--ngenes",
+        type=int,
+        default=53000,
+        help="The number of genes to write. Default: 53000"
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The random seed. Default: 0"
+    )
+
+    return parser.parse_args()
+
+
+def make_gene(rng: random.Random, i: int) -> tuple[str, int]:
+    """ Makes the GFF lines for a gene and the length of its protein. """
+    seqid = f"contig{i}"
+    strand = rng.choice("+-")
+
+    exons = []
+    start = rng.randint(1000, 5000)
+    for _ in range(rng.randint(1, 7)):
+        end = start + rng.randint(30, 350)
+        exons.append((start, end))
+        start = end + rng.randint(50, 200)
+
+    gstart = exons[0][0]
+    gend = exons[-1][1]
+    mrna = f"mrna{i}"
+
+    lines = [
+        f"{seqid}\tsrc\tgene\t{gstart}\t{gend}\t.\t{strand}\t.\t"
+        f"ID=gene{i};Name=G%3B{i}",
+        f"{seqid}\tsrc\tmRNA\t{gstart}\t{gend}\t.\t{strand}\t.\t"
+        f"ID={mrna};Parent=gene{i};Note=a%2Cb,c",
+    ]
+
+    for j, (start, end) in enumerate(exons):
+        lines.append(
+            f"{seqid}\tsrc\texon\t{start}\t{end}\t.\t{strand}\t.\t"
+            f"ID={mrna}.exon{j};Parent={mrna}"
+        )
+
+    # The phase of each CDS depends on the length of the ones before it,
+    # which are upstream on the - strand.
+    length = 0
+    cdss = []
+    for start, end in (exons if strand == "+" else reversed(exons)):
+        phase = (3 - length % 3) % 3
+        cdss.append(
+            f"{seqid}\tsrc\tCDS\t{start}\t{end}\t.\t{strand}\t{phase}\t"
+            f"ID=cds-{mrna};Parent={mrna}"
+        )
+        length += end - start + 1
+
+    lines.extend(cdss if strand == "+" else reversed(cdss))
+    lines.append("###")
+    return "\n".join(lines), max(length // 3 - 1, 10)
+
+
+def make_annotations(rng: random.Random, i: int, length: int) -> str:
+    """ Makes the GFF lines for predector-like features of one protein. """
+    seqid = f"mrna{i}"
+    lines = []
+
+    def region(size: int) -> tuple[int, int]:
+        size = min(size, length)
+        start = rng.randint(1, length - size + 1)
+        return start, start + size - 1
+
+    if rng.random() < 0.5:
+        end = rng.randint(15, 30)
+        lines.extend([
+            f"{seqid}\tSignalP:4.1\tsignal_peptide\t1\t{end}\t0.8\t+\t.\t"
+            "d=0.8;d_decision=true",
+            f"{seqid}\tSignalP:3.0b\tsignal_peptide\t1\t{end}\t0.7\t+\t.\t"
+            "d=0.7;d_decision=true",
+            f"{seqid}\tSignalP:3.0b\tsignal_peptide\t1\t{end}\t0.6\t+\t.\t"
+            "cmax=0.3",
+            f"{seqid}\tPhobius:1\tsignal_peptide\t1\t{end}\t.\t+\t.\t"
+            f"ID=signal_peptide{i}",
+            f"{seqid}\tPhobius:1\tn_terminal_region\t1\t3\t.\t+\t.\t"
+            f"Parent=signal_peptide{i}",
+        ])
+
+    for _ in range(rng.choice([0, 0, 1, 2, 3, 4])):
+        start, end = region(21)
+        lines.append(
+            f"{seqid}\tTMHMM:2\ttransmembrane_polypeptide_region\t"
+            f"{start}\t{end}\t.\t+\t.\t."
+        )
+
+    for _ in range(rng.randint(0, 4)):
+        start, end = region(rng.randint(5, 200))
+        pfam = f"PF{rng.randint(0, 20000):05d}"
+        lines.append(
+            f"{seqid}\tPfam:1\tprotein_hmm_match\t{start}\t{end}\t"
+            f"{rng.random():.3f}\t+\t.\t"
+            f"Target={pfam} 1 {end - start + 1} +;Note=dom%3Dain,two;"
+            f"Dbxref=Pfam:{pfam};evalue=1e-{rng.randint(0, 30)}"
+        )
+
+    if rng.random() < 0.3:
+        start, end = region(rng.randint(20, 300))
+        lines.append(
+            f"{seqid}\tPHIbase:1\tprotein_match\t{start}\t{end}\t"
+            f"{rng.randint(30, 500)}\t+\t.\t"
+            f"Target=phi%20x{i} 1 {end - start + 1};custom=yes"
+        )
+
+    if rng.random() < 0.25:
+        start, end = region(2)
+        lines.append(
+            f"{seqid}\tkex2_cutsite:1\tpropeptide_cleavage_site\t"
+            f"{start}\t{end}\t.\t+\t.\tpattern=[KR]R"
+        )
+
+    if rng.random() < 0.3:
+        start, end = region(4)
+        lines.append(
+            f"{seqid}\tregex:1\tpolypeptide_motif\t{start}\t{end}\t.\t+\t.\t"
+            "pattern=R[A-Z]LR"
+        )
+
+    return "\n".join(lines)
+
+
+def main() -> None:
+    args = cli()
+    rng = random.Random(args.seed)
+
+    blocks = []
+    for i in range(args.ngenes):
+        gene, length = make_gene(rng, i)
+        blocks.append((f"mrna{i}", gene, make_annotations(rng, i, length)))
+
+    # Sorted by protein ID so that map_to_genome --sorted can read them.
+    blocks.sort(key=lambda b: b[0])
+
+    print("##gff-version 3", file=args.genes)
+    for _, gene, annotations in blocks:
+        print(gene, file=args.genes)
+        if annotations != "":
+            print(annotations, file=args.annotations)
+
+    args.genes.close()
+    args.annotations.close()
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+""" Times split_protein_features for map_to_genome and prot_to_genome.
+
+Each protein has 6 CDSs, a signal peptide, a kex2 cutsite and a varying
+number of Pfam matches.
+"""
+
+import time
+import argparse
+
+from predectorutils.gff import GFFRecord
+from predectorutils.subcommands import map_to_genome, prot_to_genome
+
+
+def cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument(
+        "-n", "--nmatches",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="The numbers of Pfam matches to time. Default: 10 100 1000"
+    )
+
+    parser.add_argument(
+        "--ncds",
+        type=int,
+        default=6,
+        help="The number of CDSs in the gene. Default: 6"
+    )
+
+    return parser.parse_args()
+
+
+def make_protein(
+    nmatches: int,
+    ncds: int,
+) -> tuple[list[GFFRecord], list[GFFRecord]]:
+    cdss = []
+    start = 1000
+    for _ in range(ncds):
+        cdss.append(GFFRecord.parse(
+            f"chr1\tsrc\tCDS\t{start}\t{start + 299}\t.\t+\t0\t"
+            "ID=mrna1;Parent=mrna1"
+        ))
+        start += 500
+
+    lines = [
+        "mrna1\tSignalP:4.1\tsignal_peptide\t1\t20\t.\t+\t.\tID=sp1",
+        "mrna1\tPhobius:1\tn_terminal_region\t1\t3\t.\t+\t.\tParent=sp1",
+        "mrna1\tkex2_cutsite:1\tpropeptide_cleavage_site\t40\t41\t.\t+\t.\t"
+        "pattern=[KR]R",
+    ]
+
+    for i in range(nmatches):
+        start = 1 + (i * 7) % 500
+        lines.append(
+            f"mrna1\tPfam:1\tprotein_hmm_match\t{start}\t{start + 80}\t"
+            f"{i}.5\t+\t.\tTarget=PF{i:05d} 1 80;Dbxref=Pfam:PF{i:05d};"
+            f"Note=desc,more;evalue=1e-{i % 30}"
+        )
+
+    return list(GFFRecord.from_file(lines)), cdss
+
+
+def main() -> None:
+    args = cli()
+
+    print("subcommand\tmatches\tms_per_protein")
+    for nmatches in args.nmatches:
+        prots, cdss = make_protein(nmatches, args.ncds)
+        reps = max(1, 2000 // nmatches)
+
+        for name, module, kwargs in [
+            ("map_to_genome", map_to_genome, {"filter_kex2": True}),
+            ("prot_to_genome", prot_to_genome, {}),
+        ]:
+            start = time.perf_counter()
+            for _ in range(reps):
+                module.split_protein_features(
+                    prots,
+                    cdss,
+                    separate_peps=True,
+                    regions=True,
+                    **kwargs
+                )
+            elapsed = (time.perf_counter() - start) / reps
+            print(f"{name}\t{nmatches}\t{elapsed * 1000:.2f}")
+    return
+
+
+if __name__ == "__main__":
+    main()
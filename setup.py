@@ -77,8 +77,7 @@ setup(
         'biopython>=1.70',
         'pandas',
         'numpy',
-        'xgboost',
-        'intervaltree'
+        'xgboost'
         ],
     py_modules=[splitext(basename(path))[0] for path in glob('src/*.py')],
 
@@ -1,19 +1,25 @@
 #!/usr/bin/env python3
-import pandas as pd
+from __future__ import annotations
 
 import json
 
+from typing import TYPE_CHECKING
 from typing import Callable
 from typing import ClassVar
 from typing import Any
 from typing import TextIO
 from typing import TypeVar
 from typing import Optional, Union
-from collections.abc import Iterator
+from collections.abc import Iterator, Iterable
+from functools import lru_cache
 
 from ..checksum import checksum
 from ..gff import GFFRecord
 
+# pandas is slow to import, so it is only imported when it is needed.
+if TYPE_CHECKING:
+    import pandas as pd
+
 T = TypeVar("T")
 
 def int_or_none(i: Any) -> Optional[int]:
@@ -50,6 +56,38 @@ def list_of(fn: Callable[[Any], T]) -> Callable[[Any], list[T]]:
 list_of_str = list_of(str)
 
 
+def batch_dtype(type_: Callable[[Any], Any]) -> str:
+    """ The pandas dtype used to store a column in a batch of records. """
+    dtypes: dict[Callable[[Any], Any], str] = {
+        int: "int64",
+        int_or_none: "Int64",
+        float: "float64",
+        float_or_none: "float64",
+        bool: "bool",
+    }
+    return dtypes.get(type_, "object")
+
+
+def value_types(type_: Callable[[Any], Any]) -> tuple[type, ...]:
+    """ The types of values that type_ returns unchanged.
+
+    This is empty for any types that aren't known, so that they're always
+    converted. Lists must also only contain strings.
+    """
+    none = type(None)
+    types: dict[Callable[[Any], Any], tuple[type, ...]] = {
+        int: (int,),
+        float: (float,),
+        str: (str,),
+        bool: (bool,),
+        int_or_none: (int, none),
+        float_or_none: (float, none),
+        str_or_none: (str, none),
+        list_of_str: (list,),
+    }
+    return types.get(type_, ())
+
+
 class Analysis(object):
 
     columns: ClassVar[list[str]] = []
@@ -84,6 +122,34 @@ class Analysis(object):
         )
         return cls(*fields)
 
+    @classmethod
+    def is_normalised_dict(cls, d: dict[str, Any]) -> bool:
+        """ Checks if a dict is already the same as from_dict(d).as_dict().
+
+        This only checks the keys and the types of the values, so it is
+        much faster than creating the object.
+        """
+        if list(d) != cls.columns:
+            return False
+
+        # Not isinstance, because bools are ints and ints aren't floats.
+        for value, types in zip(d.values(), cls.column_value_types()):
+            if type(value) not in types:
+                return False
+            elif (type(value) is list) and not all(
+                type(v) is str
+                for v
+                in value
+            ):
+                return False
+        return True
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def column_value_types(cls) -> list[tuple[type, ...]]:
+        """ The result of value_types for each column. """
+        return [value_types(t) for t in cls.types]
+
     def __repr__(self) -> str:
         inner = ", ".join([repr(getattr(self, k)) for k in self.columns])
         return f"{self.__class__.__name__}({inner})"
@@ -92,13 +158,79 @@ class Analysis(object):
     def from_file(cls, handle: TextIO) -> Iterator['Analysis']:
         raise NotImplementedError()
 
+    @classmethod
+    def batch_dtypes(cls) -> dict[str, str]:
+        return {
+            column: batch_dtype(type_)
+            for column, type_
+            in zip(cls.columns, cls.types)
+        }
+
+    @classmethod
+    def batch_from_records(
+        cls,
+        records: Iterable["Analysis"]
+    ) -> pd.DataFrame:
+        """ Converts records into a DataFrame with one column per field. """
+        import pandas as pd
+        rows = [
+            tuple(getattr(r, c) for c in cls.columns)
+            for r
+            in records
+        ]
+        df = pd.DataFrame.from_records(rows, columns=cls.columns)
+        return df.astype(cls.batch_dtypes())
+
+    @classmethod
+    def batch_from_dicts(
+        cls,
+        dicts: Iterable[dict[str, Any]]
+    ) -> pd.DataFrame:
+        """ Like `batch_from_records` but from the output of `as_dict`.
+
+        This avoids creating an object for each record.
+        """
+        import pandas as pd
+        rows = [
+            tuple(d.get(c, None) for c in cls.columns)
+            for d
+            in dicts
+        ]
+        df = pd.DataFrame.from_records(rows, columns=cls.columns)
+        return df.astype(cls.batch_dtypes())
+
+    @classmethod
+    def from_file_batches(
+        cls,
+        handle: TextIO,
+        batch_size: int = 10000
+    ) -> Iterator[pd.DataFrame]:
+        """ Parses a file into DataFrames of at most batch_size records.
+
+        The columns are typed according to the `columns` and `types`
+        of the analysis.
+        """
+        batch: list["Analysis"] = []
+        for record in cls.from_file(handle):
+            batch.append(record)
+
+            if len(batch) >= batch_size:
+                yield cls.batch_from_records(batch)
+                batch = []
+
+        if len(batch) > 0:
+            yield cls.batch_from_records(batch)
+        return
+
     def as_series(self) -> pd.Series:
+        import pandas as pd
         return pd.Series(
             [getattr(self, c) for c in self.columns],
             index=self.columns
         )
 
     def as_df(self, analysis: Optional[str] = None) -> pd.DataFrame:
+        import pandas as pd
         if analysis is None:
             analysis = self.analysis
 
@@ -136,10 +268,12 @@ class Analysis(object):
 
     @classmethod
     def from_json_str(cls, s: str) -> "Analysis":
-        return cls.from_dict(json.loads(s))
+        from .. import ldjson
+        return cls.from_dict(ldjson.loads(s))
 
     def as_json_str(self) -> str:
-        return json.dumps(self.as_dict(), separators=(',', ':'))
+        from .. import ldjson
+        return ldjson.dumps(self.as_dict())
 
 
 class GFFAble(object):
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
+from __future__ import annotations
 
+from typing import TYPE_CHECKING
 from typing import TypeVar
 from typing import TextIO
 from typing import Optional
 from collections.abc import Iterator, Sequence
 
-import pandas as pd
-
 from ..gff import (
     GFFRecord,
     Strand
@@ -23,6 +23,9 @@ from ..parsers import (
 
 from .base import Analysis, GFFAble
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 __all__ = ["TMBed"]
 
 
@@ -0,0 +1,708 @@
+#!/usr/bin/env python3
+
+""" A writer for BigWig files.
+
+BigWig files store intervals with values, compressed in blocks and
+indexed by an R-tree so that genome browsers can read a region without
+loading the whole file.
+They also store summaries of the data at several lower resolutions
+("zoom levels") for viewing large regions.
+
+This follows the format described in Kent et al. (2010)
+doi:10.1093/bioinformatics/btq351, and the UCSC kent source code.
+All numbers are little endian.
+"""
+
+import zlib
+import struct
+
+from typing import BinaryIO, cast
+from collections.abc import Iterator, Mapping, Sequence
+
+import numpy as np
+
+BIGWIG_MAGIC = 0x888FFC26
+CHROM_TREE_MAGIC = 0x78CA8C91
+INDEX_MAGIC = 0x2468ACE0
+BIGWIG_VERSION = 4
+
+# The number of items or zoom records in each compressed block,
+# and the number of children of each node in the R-tree.
+ITEMS_PER_SLOT = 1024
+BLOCK_SIZE = 256
+
+# The number of children of each node in the chromosome B+ tree.
+CHROM_BLOCK_SIZE = 256
+
+# The approximate number of records to read back at a time when
+# making the zoom levels.
+READ_BATCH_SIZE = 1 << 20
+
+MAX_ZOOM_LEVELS = 10
+ZOOM_INCREMENT = 4
+
+HEADER = struct.Struct("<IHHQQQHHQQIQ")
+ZOOM_HEADER = struct.Struct("<IIQQ")
+TOTAL_SUMMARY = struct.Struct("<Qdddd")
+CHROM_TREE_HEADER = struct.Struct("<IIIIQQ")
+NODE_HEADER = struct.Struct("<BBH")
+CHROM_ITEM = struct.Struct("<II")
+SECTION_HEADER = struct.Struct("<IIIIIBBH")
+INDEX_HEADER = struct.Struct("<IIQIIIIQII")
+LEAF_ITEM = struct.Struct("<IIIIQQ")
+BRANCH_ITEM = struct.Struct("<IIIIQ")
+
+BEDGRAPH_SECTION = 1
+
+ITEM_DTYPE = np.dtype([
+    ("start", "<u4"),
+    ("end", "<u4"),
+    ("value", "<f4"),
+])
+
+ZOOM_DTYPE = np.dtype([
+    ("chrom", "<u4"),
+    ("start", "<u4"),
+    ("end", "<u4"),
+    ("valid_count", "<u4"),
+    ("min", "<f4"),
+    ("max", "<f4"),
+    ("sum", "<f4"),
+    ("sum_squares", "<f4"),
+])
+
+# (start chrom, start base, end chrom, end base, file offset, size)
+IndexEntry = tuple[int, int, int, int, int, int]
+
+
+def block_bounds(chroms: np.ndarray, items_per_slot: int) -> list[int]:
+    """ Splits sorted records into blocks that don't span chromosomes.
+
+    Returns the index of the first record in each block,
+    and the number of records at the end.
+    """
+
+    changes = np.flatnonzero(np.diff(chroms)) + 1
+    chrom_starts = np.concatenate([[0], changes, [len(chroms)]])
+
+    bounds = []
+    for first, last in zip(chrom_starts[:-1], chrom_starts[1:]):
+        bounds.extend(range(first, last, items_per_slot))
+
+    bounds.append(len(chroms))
+    return bounds
+
+
+def write_blocks(
+    handle: BinaryIO,
+    bounds: Sequence[int],
+    chroms: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    records: np.ndarray,
+    section_header: bool,
+) -> tuple[list[IndexEntry], int]:
+    """ Writes zlib compressed blocks of records.
+
+    Returns the index entries for each block and the size of the
+    largest block before compression.
+    """
+
+    index: list[IndexEntry] = []
+    max_size = 0
+
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        chrom = int(chroms[first])
+        start = int(starts[first])
+        end = int(ends[first:last].max())
+
+        data = records[first:last].tobytes()
+        if section_header:
+            data = SECTION_HEADER.pack(
+                chrom, start, end, 0, 0,
+                BEDGRAPH_SECTION, 0, last - first
+            ) + data
+
+        max_size = max(max_size, len(data))
+        compressed = zlib.compress(data)
+        offset = handle.tell()
+        handle.write(compressed)
+        index.append((chrom, start, chrom, end, offset, len(compressed)))
+
+    return index, max_size
+
+
+def entry_bounds(
+    entries: Sequence[IndexEntry]
+) -> tuple[int, int, int, int]:
+    """ The region covered by some sorted index entries. """
+
+    if len(entries) == 0:
+        return (0, 0, 0, 0)
+
+    end_chrom = entries[-1][2]
+    end = max(e[3] for e in entries if e[2] == end_chrom)
+    return (entries[0][0], entries[0][1], end_chrom, end)
+
+
+def write_index(
+    handle: BinaryIO,
+    entries: Sequence[IndexEntry],
+    end_file_offset: int,
+    items_per_slot: int,
+    block_size: int,
+) -> None:
+    """ Writes an R-tree indexing the blocks of a data or zoom section. """
+
+    # Each level is a list of nodes, and each node is a list of
+    # (bounds, offset, size) for its items, starting from the leaves.
+    nodes: list[list[IndexEntry]] = [
+        list(entries[i:i + block_size])
+        for i in range(0, len(entries), block_size)
+    ] or [[]]
+
+    levels = [nodes]
+    while len(levels[-1]) > 1:
+        children = levels[-1]
+        parents = []
+        for i in range(0, len(children), block_size):
+            parents.append([
+                (*entry_bounds(c), 0, 0)
+                for c in children[i:i + block_size]
+            ])
+        levels.append(parents)
+
+    levels.reverse()
+
+    # Lay the nodes out from the root down, so that the parents know
+    # where their children are.
+    offset = handle.tell() + INDEX_HEADER.size
+    offsets = []
+    for depth, level in enumerate(levels):
+        is_leaf = depth == (len(levels) - 1)
+        item_size = LEAF_ITEM.size if is_leaf else BRANCH_ITEM.size
+
+        level_offsets = []
+        for node in level:
+            level_offsets.append(offset)
+            offset += NODE_HEADER.size + (len(node) * item_size)
+        offsets.append(level_offsets)
+
+    handle.write(INDEX_HEADER.pack(
+        INDEX_MAGIC,
+        block_size,
+        len(entries),
+        *entry_bounds(entries),
+        end_file_offset,
+        items_per_slot,
+        0
+    ))
+
+    for depth, level in enumerate(levels):
+        is_leaf = depth == (len(levels) - 1)
+
+        child = 0
+        for node in level:
+            handle.write(NODE_HEADER.pack(is_leaf, 0, len(node)))
+
+            for item in node:
+                if is_leaf:
+                    handle.write(LEAF_ITEM.pack(*item))
+                else:
+                    handle.write(BRANCH_ITEM.pack(
+                        *item[:4],
+                        offsets[depth + 1][child]
+                    ))
+                    child += 1
+    return
+
+
+def summarise(
+    chroms: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    values: np.ndarray,
+    sizes: np.ndarray,
+    reduction: int,
+) -> np.ndarray:
+    """ Summarises the values in bins of the reduction size along
+    each chromosome.
+    """
+
+    first = starts // reduction
+    counts = ((ends - 1) // reduction) - first + 1
+
+    items = np.repeat(np.arange(len(starts)), counts)
+    offsets = (
+        np.arange(counts.sum()) -
+        np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    bins = np.repeat(first, counts) + offsets
+
+    bin_starts = bins * reduction
+    overlap = (
+        np.minimum(ends[items], bin_starts + reduction) -
+        np.maximum(starts[items], bin_starts)
+    )
+
+    # Records are sorted and don't overlap, so the bins are sorted too.
+    bin_chroms = chroms[items]
+    is_new = np.ones(len(bins), dtype=bool)
+    is_new[1:] = (np.diff(bins) != 0) | (np.diff(bin_chroms) != 0)
+    group_starts = np.flatnonzero(is_new)
+
+    bin_values = values[items].astype(np.float64)
+    weighted = bin_values * overlap
+
+    out = np.zeros(len(group_starts), dtype=ZOOM_DTYPE)
+    out["chrom"] = bin_chroms[group_starts]
+    out["start"] = bin_starts[group_starts]
+    out["end"] = np.minimum(
+        bin_starts[group_starts] + reduction,
+        sizes[out["chrom"]]
+    )
+    out["valid_count"] = np.add.reduceat(overlap, group_starts)
+    out["min"] = np.minimum.reduceat(bin_values, group_starts)
+    out["max"] = np.maximum.reduceat(bin_values, group_starts)
+    out["sum"] = np.add.reduceat(weighted, group_starts)
+    out["sum_squares"] = np.add.reduceat(weighted * bin_values, group_starts)
+    return out
+
+
+def zoom_reductions(mean_length: float, max_size: int) -> list[int]:
+    """ The zoom levels to try, like the UCSC tools, starting at 10 times
+    the mean interval length and increasing by 4 times each level.
+    """
+
+    reduction = max(1, int(10 * mean_length))
+
+    reductions = []
+    while len(reductions) < MAX_ZOOM_LEVELS:
+        reductions.append(reduction)
+
+        if reduction > max_size:
+            break
+        reduction *= ZOOM_INCREMENT
+
+    return reductions
+
+
+def write_chrom_tree(
+    handle: BinaryIO,
+    names: Sequence[str],
+    sizes: Sequence[int],
+    block_size: int = CHROM_BLOCK_SIZE,
+) -> None:
+    """ Writes the chromosome names and sizes as a B+ tree.
+
+    The names must be sorted by their bytes.
+    """
+
+    keys = [n.encode() for n in names]
+    key_size = max((len(k) for k in keys), default=1)
+    block_size = max(1, min(block_size, len(keys)))
+
+    # Each level is a list of nodes, and each node is a list of the
+    # indices of the first chromosome under each item, from the leaves up.
+    levels = [[
+        list(range(i, min(i + block_size, len(keys))))
+        for i in range(0, len(keys), block_size)
+    ] or [[]]]
+
+    while len(levels[-1]) > 1:
+        children = levels[-1]
+        levels.append([
+            [c[0] for c in children[i:i + block_size]]
+            for i in range(0, len(children), block_size)
+        ])
+
+    levels.reverse()
+
+    handle.write(CHROM_TREE_HEADER.pack(
+        CHROM_TREE_MAGIC,
+        block_size,
+        key_size,
+        CHROM_ITEM.size,
+        len(keys),
+        0
+    ))
+
+    # Lay the nodes out from the root down, so that the parents know
+    # where their children are.
+    offset = handle.tell()
+    offsets = []
+    for depth, level in enumerate(levels):
+        is_leaf = depth == (len(levels) - 1)
+        item_size = key_size + (CHROM_ITEM.size if is_leaf else 8)
+
+        level_offsets = []
+        for node in level:
+            level_offsets.append(offset)
+            offset += NODE_HEADER.size + (len(node) * item_size)
+        offsets.append(level_offsets)
+
+    for depth, level in enumerate(levels):
+        is_leaf = depth == (len(levels) - 1)
+
+        child = 0
+        for node in level:
+            handle.write(NODE_HEADER.pack(is_leaf, 0, len(node)))
+
+            for i in node:
+                handle.write(keys[i].ljust(key_size, b"\0"))
+                if is_leaf:
+                    handle.write(CHROM_ITEM.pack(i, sizes[i]))
+                else:
+                    handle.write(struct.pack("<Q", offsets[depth + 1][child]))
+                    child += 1
+    return
+
+
+class BigWigWriter(object):
+
+    """ Writes non-overlapping intervals to a BigWig file as they are added.
+
+    Intervals must be added in order of chromosome name and start, but
+    they can be added in any number of pieces.
+    The data blocks are written straight away, and the zoom levels are
+    made from the written data when the file is closed, reading back a
+    batch of whole chromosomes at a time.
+    Like the UCSC tools, space is left for the most zoom levels in the
+    header.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chrom_sizes: Mapping[str, int],
+        items_per_slot: int = ITEMS_PER_SLOT,
+        block_size: int = BLOCK_SIZE,
+    ) -> None:
+        self.items_per_slot = items_per_slot
+        self.block_size = block_size
+
+        self.names = sorted(chrom_sizes.keys(), key=str.encode)
+        self.chrom_ids = {n: i for i, n in enumerate(self.names)}
+        self.sizes = np.array(
+            [chrom_sizes[n] for n in self.names],
+            dtype=np.int64
+        )
+
+        # The last chromosome and start written, to check the order.
+        self.last = (-1, -1)
+        self.index: list[IndexEntry] = []
+        self.buf_size = 0
+
+        self.nitems = 0
+        self.bases = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sum = 0.0
+        self.sum_squares = 0.0
+
+        self.handle = cast(BinaryIO, open(path, "w+b"))
+
+        # The header and summary are filled in once the offsets are known.
+        self.handle.write(
+            b"\0" * (HEADER.size + MAX_ZOOM_LEVELS * ZOOM_HEADER.size)
+        )
+
+        self.total_summary_offset = self.handle.tell()
+        self.handle.write(b"\0" * TOTAL_SUMMARY.size)
+
+        self.chrom_tree_offset = self.handle.tell()
+        write_chrom_tree(self.handle, self.names, self.sizes.tolist())
+
+        # The data starts with the number of blocks.
+        self.data_offset = self.handle.tell()
+        self.handle.write(struct.pack("<Q", 0))
+        return
+
+    def __enter__(self) -> "BigWigWriter":
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        # Don't try to finish the file if something went wrong.
+        if exc_type is None:
+            self.close()
+        else:
+            self.handle.close()
+        return
+
+    def add(
+        self,
+        chroms: Sequence[str],
+        starts: Sequence[int],
+        ends: Sequence[int],
+        values: Sequence[float],
+    ) -> None:
+        """ Adds intervals with 0-based starts.
+
+        Intervals with NaN values are skipped.
+        Every chromosome with an interval must be in chrom_sizes.
+        """
+
+        values_ = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values_)
+
+        try:
+            chroms_ = np.array(
+                [
+                    self.chrom_ids[c]
+                    for c
+                    in np.asarray(chroms, dtype=object)[keep]
+                ],
+                dtype=np.int64
+            )
+        except KeyError as e:
+            raise ValueError(f"The size of sequence {e} is unknown.")
+
+        if len(chroms_) == 0:
+            return
+
+        starts_ = np.asarray(starts, dtype=np.int64)[keep]
+        ends_ = np.asarray(ends, dtype=np.int64)[keep]
+        values_ = values_[keep]
+
+        if np.any(ends_ > self.sizes[chroms_]):
+            raise ValueError(
+                "Some intervals extend past the end of the sequence."
+            )
+
+        order = np.lexsort((starts_, chroms_))
+        chroms_ = chroms_[order]
+        starts_ = starts_[order]
+
+        first = (int(chroms_[0]), int(starts_[0]))
+        if first < self.last:
+            raise ValueError(
+                "The intervals must be added in order of sequence and start."
+            )
+        self.last = (int(chroms_[-1]), int(starts_[-1]))
+
+        items = np.zeros(len(starts_), dtype=ITEM_DTYPE)
+        items["start"] = starts_
+        items["end"] = ends_[order]
+        items["value"] = values_[order]
+
+        index, buf_size = write_blocks(
+            self.handle,
+            block_bounds(chroms_, self.items_per_slot),
+            chroms_,
+            items["start"],
+            items["end"],
+            items,
+            section_header=True
+        )
+        self.index.extend(index)
+        self.buf_size = max(self.buf_size, buf_size)
+
+        # Use the rounded values in the summaries, like the data.
+        lengths = ends_[order] - starts_
+        rounded = items["value"]
+        self.nitems += len(items)
+        self.bases += int(lengths.sum())
+        self.min = min(self.min, float(rounded.min()))
+        self.max = max(self.max, float(rounded.max()))
+        self.sum += float((rounded * lengths).sum())
+        self.sum_squares += float(
+            (rounded.astype(np.float64) ** 2 * lengths).sum()
+        )
+        return
+
+    def _read_batches(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """ Reads the written intervals back in batches of whole
+        chromosomes, yielding the chromosome ids and records.
+        """
+
+        chroms: list[np.ndarray] = []
+        blocks: list[np.ndarray] = []
+        nitems = 0
+        last_chrom = -1
+
+        for chrom, _, _, _, offset, size in sorted(self.index):
+            if (chrom != last_chrom) and (nitems >= READ_BATCH_SIZE):
+                yield np.concatenate(chroms), np.concatenate(blocks)
+                chroms = []
+                blocks = []
+                nitems = 0
+
+            self.handle.seek(offset)
+            data = zlib.decompress(self.handle.read(size))
+            block = np.frombuffer(
+                data,
+                dtype=ITEM_DTYPE,
+                offset=SECTION_HEADER.size
+            )
+
+            chroms.append(np.full(len(block), chrom, dtype=np.int64))
+            blocks.append(block)
+            nitems += len(block)
+            last_chrom = chrom
+
+        if nitems > 0:
+            yield np.concatenate(chroms), np.concatenate(blocks)
+        return
+
+    def _summarise_batches(self, reduction: int) -> Iterator[np.ndarray]:
+        for chroms, items in self._read_batches():
+            yield summarise(
+                chroms,
+                items["start"].astype(np.int64),
+                items["end"].astype(np.int64),
+                items["value"],
+                self.sizes,
+                reduction
+            )
+        return
+
+    def _zoom_levels(self) -> list[tuple[int, int]]:
+        """ Chooses the zoom levels, and the number of records in each.
+
+        Levels are only kept while they at least halve the number of
+        records.
+        """
+
+        if self.nitems == 0:
+            return []
+
+        reductions = zoom_reductions(
+            self.bases / self.nitems,
+            int(self.sizes.max())
+        )
+
+        counts = [0 for _ in reductions]
+        for chroms, items in self._read_batches():
+            starts = items["start"].astype(np.int64)
+            ends = items["end"].astype(np.int64)
+            for i, reduction in enumerate(reductions):
+                counts[i] += len(summarise(
+                    chroms, starts, ends, items["value"],
+                    self.sizes, reduction
+                ))
+
+        levels = []
+        last_count = self.nitems
+        for reduction, count in zip(reductions, counts):
+            if count > (last_count // 2):
+                break
+
+            levels.append((reduction, count))
+            last_count = count
+
+        return levels
+
+    def _write_zoom(self, reduction: int, count: int) -> bytes:
+        """ Writes the summaries and index for a zoom level,
+        returning its header.
+        """
+
+        # Zoom data starts with the number of records.
+        self.handle.seek(0, 2)
+        zoom_data_offset = self.handle.tell()
+        self.handle.write(struct.pack("<I", count))
+
+        zoom_index: list[IndexEntry] = []
+        for summary in self._summarise_batches(reduction):
+            # Reading the data moves the file position.
+            self.handle.seek(0, 2)
+            index, buf_size = write_blocks(
+                self.handle,
+                block_bounds(summary["chrom"], self.items_per_slot),
+                summary["chrom"],
+                summary["start"],
+                summary["end"],
+                summary,
+                section_header=False
+            )
+            zoom_index.extend(index)
+            self.buf_size = max(self.buf_size, buf_size)
+
+        self.handle.seek(0, 2)
+        zoom_index_offset = self.handle.tell()
+        write_index(
+            self.handle, zoom_index, zoom_index_offset,
+            self.items_per_slot, self.block_size
+        )
+        return ZOOM_HEADER.pack(
+            reduction, 0, zoom_data_offset, zoom_index_offset
+        )
+
+    def close(self) -> None:
+        """ Writes the index, zoom levels and header. """
+
+        if self.handle.closed:
+            return
+
+        index_offset = self.handle.tell()
+        write_index(
+            self.handle, self.index, index_offset,
+            self.items_per_slot, self.block_size
+        )
+
+        zoom_headers = [
+            self._write_zoom(reduction, count)
+            for reduction, count
+            in self._zoom_levels()
+        ]
+
+        self.handle.seek(0, 2)
+        self.handle.write(struct.pack("<I", BIGWIG_MAGIC))
+
+        self.handle.seek(0)
+        self.handle.write(HEADER.pack(
+            BIGWIG_MAGIC,
+            BIGWIG_VERSION,
+            len(zoom_headers),
+            self.chrom_tree_offset,
+            self.data_offset,
+            index_offset,
+            0,
+            0,
+            0,
+            self.total_summary_offset,
+            self.buf_size,
+            0
+        ))
+        for zoom_header in zoom_headers:
+            self.handle.write(zoom_header)
+
+        self.handle.seek(self.total_summary_offset)
+        self.handle.write(TOTAL_SUMMARY.pack(
+            self.bases,
+            self.min if self.nitems > 0 else 0.0,
+            self.max if self.nitems > 0 else 0.0,
+            self.sum,
+            self.sum_squares,
+        ))
+
+        self.handle.seek(self.data_offset)
+        self.handle.write(struct.pack("<Q", len(self.index)))
+        self.handle.close()
+        return
+
+
+def write_bigwig(
+    path: str,
+    chrom_sizes: Mapping[str, int],
+    chroms: Sequence[str],
+    starts: Sequence[int],
+    ends: Sequence[int],
+    values: Sequence[float],
+    items_per_slot: int = ITEMS_PER_SLOT,
+    block_size: int = BLOCK_SIZE,
+) -> None:
+    """ Writes non-overlapping intervals with 0-based starts to a BigWig file.
+
+    Intervals with NaN values are skipped.
+    Every chromosome with an interval must be in chrom_sizes.
+    """
+
+    with BigWigWriter(
+        path,
+        chrom_sizes,
+        items_per_slot=items_per_slot,
+        block_size=block_size
+    ) as writer:
+        writer.add(chroms, starts, ends, values)
+    return
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+""" A sidecar file storing the checksums of each sequence in a fasta file.
+
+The sidecar is a tab separated file next to the fasta file
+(e.g. `proteome.fasta.checksums`) with one `id<tab>checksum<tab>md5sum`
+line per sequence in file order.
+The first line records the size and modification time of the fasta file
+that it was computed from, and the cache is ignored if these don't match.
+"""
+
+import os
+import hashlib
+
+from typing import TextIO, Optional
+from collections.abc import Iterable, Iterator
+
+from Bio.SeqIO.FastaIO import SimpleFastaParser
+from Bio.SeqUtils.CheckSum import seguid
+
+CACHE_HEADER = "#predutils-checksums-v1"
+CACHE_SUFFIX = ".checksums"
+
+ChecksumRow = tuple[str, str, str]
+
+
+def cache_path(fasta_path: str) -> str:
+    return fasta_path + CACHE_SUFFIX
+
+
+def fasta_stamp(fasta_path: str) -> str:
+    """ Identifies a version of a file by its size and modification time. """
+    st = os.stat(fasta_path)
+    return f"{st.st_size}\t{st.st_mtime_ns}"
+
+
+def real_path(handle: TextIO) -> Optional[str]:
+    """ Gets the path of an open file, or None for stdin or pipes. """
+    name = getattr(handle, "name", None)
+
+    if not isinstance(name, str) or not os.path.isfile(name):
+        return None
+    return name
+
+
+def sequence_checksums(seq: str) -> tuple[str, str]:
+    md5sum = hashlib.md5(seq.encode()).hexdigest()
+    return seguid(seq), md5sum
+
+
+def parse_fasta(handle: TextIO) -> Iterator[tuple[str, str]]:
+    """ Yields the (id, sequence) pairs of a fasta file. """
+    for title, seq in SimpleFastaParser(handle):
+        id_ = title.split(None, 1)[0] if title.strip() else ""
+        yield id_, seq
+    return
+
+
+def compute_checksums(seqs: Iterable[tuple[str, str]]) -> list[ChecksumRow]:
+    return [(id_, *sequence_checksums(seq)) for id_, seq in seqs]
+
+
+def read_checksum_cache(fasta_path: str) -> Optional[list[ChecksumRow]]:
+    """ Reads the cached checksums, or returns None if missing or stale. """
+    path = cache_path(fasta_path)
+
+    try:
+        stamp = fasta_stamp(fasta_path)
+        with open(path, "r") as handle:
+            if handle.readline().rstrip("\n") != f"{CACHE_HEADER}\t{stamp}":
+                return None
+
+            out: list[ChecksumRow] = []
+            for line in handle:
+                id_, checksum, md5sum = line.rstrip("\n").split("\t")
+                out.append((id_, checksum, md5sum))
+    except (OSError, ValueError):
+        return None
+
+    return out
+
+
+def write_checksum_cache(
+    fasta_path: str,
+    rows: Iterable[ChecksumRow]
+) -> bool:
+    """ Writes the checksums for a fasta file.
+
+    The fasta file must not be modified after this, or the cache will be
+    considered stale.
+    Returns False if the cache couldn't be written, e.g. if the directory
+    is read-only.
+    """
+    path = cache_path(fasta_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        stamp = fasta_stamp(fasta_path)
+        with open(tmp_path, "w") as handle:
+            handle.write(f"{CACHE_HEADER}\t{stamp}\n")
+            for row in rows:
+                handle.write("\t".join(row) + "\n")
+
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    return True
+
+
+def fasta_checksums(
+    handle: TextIO,
+    use_cache: bool = True,
+    seqs: Optional[Iterable[tuple[str, str]]] = None
+) -> list[ChecksumRow]:
+    """ Gets the (id, checksum, md5sum) of each sequence in a fasta file.
+
+    If use_cache is True and the handle is a regular file, the checksums
+    are read from the sidecar if it is up to date, and it is
+    written if not.
+    If the sequences have already been read, they can be given as
+    (id, sequence) pairs in seqs to avoid parsing the file again.
+    """
+    path = real_path(handle) if use_cache else None
+
+    if path is not None:
+        rows = read_checksum_cache(path)
+        if rows is not None:
+            return rows
+
+    if seqs is None:
+        seqs = parse_fasta(handle)
+
+    rows = compute_checksums(seqs)
+
+    if path is not None:
+        write_checksum_cache(path, rows)
+
+    return rows
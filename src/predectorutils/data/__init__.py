@@ -4,18 +4,35 @@ Because dbCAN is an evolving database, we'll have to maintain several models
 for each database release. The latest version will always we the default one.
 """
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from functools import lru_cache
 from pkg_resources import resource_filename
 
 import json
-import xgboost as xgb
 
+# xgboost is slow to import and is only needed for the model.
+if TYPE_CHECKING:
+    import xgboost as xgb
 
-def get_interesting_pfam_ids(version: str = "latest") -> list[str]:
+
+@lru_cache(maxsize=None)
+def load_hmms_of_interest() -> dict:
+    """ Reads the HMM ids of interest for each database version.
+
+    This is cached, so the result is shared and must not be modified.
+    """
     fname = resource_filename(__name__, "hmms_of_interest.json")
     with open(fname, "r") as handle:
         d = json.load(handle)
 
     assert isinstance(d, dict)
+    return d
+
+
+def get_interesting_pfam_ids(version: str = "latest") -> list[str]:
+    d = load_hmms_of_interest()
 
     assert "Pfam" in d
 
@@ -33,15 +50,11 @@ def get_interesting_pfam_ids(version: str = "latest") -> list[str]:
 
     assert all([isinstance(x, str) for x in pfids]), pfids
 
-    return pfids
+    return list(pfids)
 
 
 def get_interesting_dbcan_ids(version: str = "latest") -> list[str]:
-    fname = resource_filename(__name__, "hmms_of_interest.json")
-    with open(fname, "r") as handle:
-        d = json.load(handle)
-
-    assert isinstance(d, dict)
+    d = load_hmms_of_interest()
 
     assert "dbCAN" in d
 
@@ -59,10 +72,18 @@ def get_interesting_dbcan_ids(version: str = "latest") -> list[str]:
 
     assert all([isinstance(x, str) for x in ids]), ids
 
-    return ids
+    return list(ids)
 
 
+@lru_cache(maxsize=None)
 def get_ltr_model(load_config=False) -> xgb.Booster:
+    """ Loads the learn to rank model.
+
+    The model is cached, so it is only read once per process
+    (e.g. rather than once per chunk in `predutils rank`).
+    """
+    import xgboost as xgb
+
     model_fname = resource_filename(__name__, "learn_to_rank-model.json")
     model = xgb.Booster(model_file=model_fname)
 
@@ -4,13 +4,16 @@ from typing import NamedTuple
 from typing import Any
 from typing import TextIO
 from typing import Optional
-from collections.abc import Iterator, Iterable
-from math import floor
+from collections.abc import Iterator, Iterable, Callable
+from math import floor, isfinite, copysign
 
 import json
 import sqlite3
 
 from .analyses import Analysis, Analyses
+from .checksum import checksum
+from .higher import or_else
+from . import ldjson
 
 
 def text_split(text: str, sep: str) -> str:
@@ -20,6 +23,146 @@ def text_split(text: str, sep: str) -> str:
     )
 
 
+def sql_type(type_: Callable[[Any], Any]) -> str:
+    """ Gets the SQLite column type to store an analysis field type in.
+
+    Anything that isn't a scalar (e.g. lists) is stored as JSON text.
+    """
+    from .analyses.base import int_or_none, float_or_none, str_or_none
+    types = {
+        int: "integer",
+        int_or_none: "integer",
+        float: "real",
+        float_or_none: "real",
+        str: "text",
+        str_or_none: "text",
+        bool: "boolean",
+    }
+    return types.get(type_, "json")
+
+
+def typed_columns(an: Analyses) -> list[tuple[str, str]]:
+    """ The names and SQLite types of the fields in an analysis. """
+    cls = an.get_analysis()
+    return [
+        (column, sql_type(type_))
+        for column, type_
+        in zip(cls.columns, cls.types)
+    ]
+
+
+def rebuilds_exactly(an: Analyses, d: dict[str, Any]) -> bool:
+    """ Checks if `typed_json_expr` gives back the same keys and values.
+
+    SQLite renders reals with 15 significant digits, drops null names,
+    and always puts the keys in column order.
+    """
+    cls = an.get_analysis()
+    columns = typed_columns(an)
+
+    keys = [c for c, _ in columns]
+    if cls.name_column not in d:
+        keys.remove(cls.name_column)
+    elif d[cls.name_column] is None:
+        return False
+
+    if list(d) != keys:
+        return False
+
+    for column, type_ in columns:
+        value = d.get(column, None)
+
+        if value is None:
+            continue
+        elif type_ == "boolean":
+            ok = type(value) is bool
+        elif type_ == "integer":
+            ok = (type(value) is int) and (-2 ** 63 <= value < 2 ** 63)
+        elif type_ == "real":
+            ok = (
+                (type(value) is float)
+                and isfinite(value)
+                and (float(f"{value:.15g}") == value)
+                and (copysign(1.0, value) > 0 or value != 0)
+            )
+        elif type_ == "text":
+            ok = type(value) is str
+        else:
+            ok = type(value) in (list, dict)
+
+        if not ok:
+            return False
+    return True
+
+
+def typed_values(an: Analyses, data: str) -> list[Any]:
+    """ Splits a JSON data string into values for the typed columns.
+
+    The first value is the original data if the typed columns can't
+    reproduce it exactly, otherwise None.
+    """
+    d = json.loads(data)
+
+    values: list[Any] = [None if rebuilds_exactly(an, d) else data]
+    for column, type_ in typed_columns(an):
+        value = d.get(column, None)
+        if (type_ == "json") and (value is not None):
+            value = json.dumps(value, separators=(',', ':'))
+        values.append(value)
+    return values
+
+
+def data_checksum(data: str) -> str:
+    return checksum(data.encode()).decode()
+
+
+def inexact_data(analysis: int, data: str) -> Optional[str]:
+    """ The data if the typed columns can't reproduce it, otherwise None.
+    """
+    an = Analyses(analysis)
+    return None if rebuilds_exactly(an, json.loads(data)) else data
+
+
+def typed_json_expr(an: Analyses) -> str:
+    """ An SQL expression that rebuilds the JSON data from typed columns.
+
+    SQLite limits the number of arguments to a function, so the object is
+    built by successive calls to json_insert. Rows that this can't
+    rebuild exactly keep their original data (see `rebuilds_exactly`).
+    """
+    pairs = []
+    for column, type_ in typed_columns(an):
+        if type_ == "boolean":
+            value = (
+                f'CASE WHEN "{column}" IS NULL THEN NULL '
+                f'WHEN "{column}" THEN json(\'true\') '
+                'ELSE json(\'false\') END'
+            )
+        elif type_ == "json":
+            value = f'json("{column}")'
+        else:
+            value = f'"{column}"'
+        pairs.append((column, value))
+
+    expr = "json_object()"
+    for i in range(0, len(pairs), 50):
+        chunk = ", ".join(
+            f"'$.{column}', {value}"
+            for column, value
+            in pairs[i: i + 50]
+        )
+        expr = f"json_insert({expr}, {chunk})"
+
+    # The name is left out of the data if results were loaded with
+    # drop_name, and merge patching with null removes the key.
+    name = an.get_analysis().name_column
+    expr = (
+        f"json_patch({expr}, CASE WHEN \"{name}\" IS NULL "
+        f"THEN '{{\"{name}\":null}}' ELSE '{{}}' END)"
+    )
+    return f"COALESCE(data, {expr})"
+
+
 def load_db(
     path: str,
     mem: int = 1
@@ -55,8 +198,19 @@ class ResultRow(NamedTuple):
     data: str
 
     @classmethod
-    def from_string(cls, s: str, drop_name: bool = False) -> "ResultRow":
-        d = json.loads(s.strip())
+    def from_string(
+        cls,
+        s: str,
+        drop_name: bool = False,
+        validate: bool = True,
+    ) -> "ResultRow":
+        """ Parses a line of the ldjson output by r2js.
+
+        The data is normalised so that identical results have identical
+        text. If validate is False, the data is assumed to already be
+        normalised, e.g. because it was written by r2js.
+        """
+        d = ldjson.loads(s.strip())
         assert isinstance(d["analysis"], str), d
         assert isinstance(d["software"], str), d
         assert isinstance(d["software_version"], str), d
@@ -71,20 +225,21 @@ class ResultRow(NamedTuple):
         assert isinstance(d["md5sum"], str), d
 
         an_enum = Analyses.from_string(d["analysis"])
-        # This ensures the types are all correct
-        an_obj = (
-            an_enum
-            .get_analysis()
-            .from_dict(d["data"])
-        )
-        data = an_obj.as_dict()
+        an_cls = an_enum.get_analysis()
+        data = d["data"]
+        assert isinstance(data, dict), d
+
+        # This ensures the types are all correct. Creating the object is
+        # slow, so it's only done if the data doesn't look right already.
+        if validate and not an_cls.is_normalised_dict(data):
+            data = an_cls.from_dict(data).as_dict()
 
         if drop_name:
-            if an_obj.name_column in data:
-                del data[an_obj.name_column]
+            if an_cls.name_column in data:
+                del data[an_cls.name_column]
             name = None
         else:
-            name = data.get(an_obj.name_column, None)
+            name = data.get(an_cls.name_column, None)
 
         if name is not None:
             assert isinstance(name, str)
@@ -106,6 +261,7 @@ class ResultRow(NamedTuple):
             database,
             database_version,
             pipeline_version,
+            # This is checksummed, so it must always be the same text.
             json.dumps(data, separators=(',', ':'))
         )
 
@@ -127,17 +283,22 @@ class ResultRow(NamedTuple):
     @classmethod
     def from_file(
         cls,
-        handle: TextIO,
+        handle: Iterable[str],
         drop_name: bool = False,
         drop_null_dbversion: bool = False,
-        target_analyses: Optional[set[Analyses]] = None
+        target_analyses: Optional[set[Analyses]] = None,
+        validate: bool = True,
     ) -> Iterator["ResultRow"]:
 
         for line in handle:
             sline = line.strip()
             if sline == "":
                 continue
-            record = cls.from_string(sline, drop_name=drop_name)
+            record = cls.from_string(
+                sline,
+                drop_name=drop_name,
+                validate=validate
+            )
 
             if target_analyses is not None:
                 if record.analysis not in target_analyses:
@@ -161,7 +322,7 @@ class ResultRow(NamedTuple):
             "software_version": self.software_version,
             "checksum": self.checksum,
             "md5sum": self.md5sum,
-            "data": json.loads(self.data),
+            "data": ldjson.loads(self.data),
         }
 
         d["data"][self.analysis.name_column()] = or_else(".", self.name)
@@ -180,7 +341,40 @@ class ResultRow(NamedTuple):
         return d
 
     def as_str(self) -> str:
-        return json.dumps(self.as_dict(), separators=(',', ':'))
+        """ Serialises the row like as_dict. """
+        head = {
+            "analysis": str(self.analysis),
+            "software": self.software,
+            "software_version": self.software_version,
+            "checksum": self.checksum,
+            "md5sum": self.md5sum,
+        }
+
+        tail: dict[str, str] = {}
+        if self.database is not None:
+            tail["database"] = self.database
+
+        if self.filename is not None:
+            tail["filename"] = self.filename
+
+        if self.database_version is not None:
+            tail["database_version"] = self.database_version
+
+        if self.pipeline_version is not None:
+            tail["pipeline_version"] = self.pipeline_version
+
+        data = ldjson.set_field(
+            self.data,
+            self.analysis.name_column(),
+            or_else(".", self.name)
+        )
+
+        out = [ldjson.dumps(head)[:-1], ',"data":', data]
+        if len(tail) > 0:
+            out.extend([",", ldjson.dumps(tail)[1:]])
+        else:
+            out.append("}")
+        return "".join(out)
 
     def as_analysis(self) -> "Analysis":
         an = (
@@ -308,11 +502,21 @@ class ResultsTable(object):
         self.cur = cur
         return
 
-    def create_result_tables(self):
+    def create_result_tables(self, typed: bool = False):
+        """ Creates the tables to store results in.
+
+        If typed is True, any new tables store the analysis fields in
+        their own typed columns (see `create_typed_table`) instead of
+        as JSON text. Existing tables are left as they are.
+        """
         from predectorutils import analyses
         for an in analyses.Analyses:
             ans = str(an)
 
+            if typed and not self.exists_table(f"results_{ans}"):
+                self.create_typed_table(an)
+                continue
+
             if an.needs_database():
                 db_cols = (
                     """
@@ -352,6 +556,277 @@ class ResultsTable(object):
         self.con.commit()
         return
 
+    def is_typed(self, an: Analyses) -> bool:
+        return self.exists_table(f"typed_{an}")
+
+    def _typed_table_columns(self, an: Analyses) -> list[str]:
+        """ The columns of a typed table, in the order they're stored. """
+        columns = ["software", "software_version"]
+
+        if an.needs_database():
+            columns.extend(["database", "database_version"])
+
+        columns.extend(["pipeline_version", "checksum", "md5sum"])
+
+        if an.multiple_ok():
+            columns.append("data_checksum")
+
+        columns.append("data")
+        columns.extend(f'"{c}"' for c, _ in typed_columns(an))
+        return columns
+
+    def _create_typed_table(
+        self,
+        an: Analyses,
+        table_name: str,
+        unique: bool = True
+    ) -> None:
+        if an.needs_database():
+            db_cols = (
+                """
+                database text NOT NULL,
+                database_version text NOT NULL,
+                """
+            )
+            db_index = "database_version,"
+        else:
+            db_cols = ""
+            db_index = ""
+
+        # NULLs are never equal in a UNIQUE constraint, so multiple
+        # rows are distinguished by a checksum of the JSON data instead.
+        if an.multiple_ok():
+            data_cols = "data_checksum text NOT NULL,"
+            unique_constraint = "checksum,md5sum,data_checksum"
+        else:
+            data_cols = ""
+            unique_constraint = "checksum,md5sum"
+
+        if unique:
+            unique_cols = f"""
+            ,
+            UNIQUE (
+                software_version,
+                {db_index}
+                {unique_constraint}
+            )
+            """
+        else:
+            unique_cols = ""
+
+        typed_cols = ",\n".join(
+            f'"{column}" {type_}'
+            for column, type_
+            in typed_columns(an)
+        )
+
+        self.cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                software text NOT NULL,
+                software_version text NOT NULL,
+                {db_cols}
+                pipeline_version text,
+                checksum text NOT NULL,
+                md5sum text NOT NULL,
+                {data_cols}
+                data json,
+                {typed_cols}
+                {unique_cols}
+            )
+            """
+        )
+        return
+
+    def create_typed_table(self, an: Analyses) -> None:
+        """ Creates a results table with typed columns for an analysis.
+
+        The rows are stored in `typed_{analysis}`, and `results_{analysis}`
+        is a view which reconstructs the JSON data column, so anything
+        reading results doesn't need to know which layout is used.
+        """
+        ans = str(an)
+        self._create_typed_table(an, f"typed_{ans}")
+
+        if an.needs_database():
+            db_cols = "database, database_version,"
+        else:
+            db_cols = ""
+
+        self.cur.execute(
+            f"""
+            CREATE VIEW IF NOT EXISTS results_{ans} AS
+            SELECT
+                rowid AS rowid,
+                software,
+                software_version,
+                {db_cols}
+                pipeline_version,
+                checksum,
+                md5sum,
+                {typed_json_expr(an)} AS data
+            FROM typed_{ans}
+            """
+        )
+        return
+
+    def migrate_to_typed(self) -> list[Analyses]:
+        """ Converts any JSON results tables into the typed layout.
+
+        Returns the analyses that were converted.
+        """
+        from predectorutils import analyses
+
+        self.con.create_function(
+            "data_checksum",
+            1,
+            data_checksum,
+            deterministic=True
+        )
+        self.con.create_function(
+            "inexact_data",
+            2,
+            inexact_data,
+            deterministic=True
+        )
+
+        migrated = []
+        for an in analyses.Analyses:
+            ans = str(an)
+
+            if self.is_typed(an) or not self.exists_table(f"results_{ans}"):
+                continue
+
+            self._create_typed_table(an, f"typed_{ans}")
+
+            selections = ["software", "software_version"]
+            if an.needs_database():
+                selections.extend(["database", "database_version"])
+
+            selections.extend(["pipeline_version", "checksum", "md5sum"])
+
+            if an.multiple_ok():
+                selections.append("data_checksum(data)")
+
+            selections.append(f"inexact_data({int(an)}, data)")
+            selections.extend(
+                f"json_extract(data, '$.{column}')"
+                for column, _
+                in typed_columns(an)
+            )
+
+            columns = ", ".join(self._typed_table_columns(an))
+            self.cur.execute(
+                f"""
+                INSERT OR IGNORE INTO typed_{ans} ({columns})
+                SELECT {", ".join(selections)}
+                FROM results_{ans}
+                """
+            )
+
+            self.cur.execute(f"DROP TABLE results_{ans}")
+            self.create_typed_table(an)
+            migrated.append(an)
+
+        self.create_result_index()
+        self.con.commit()
+        return migrated
+
+    def create_staging_tables(self):
+        """ Creates unconstrained copies of the results tables.
+
+        Rows are appended to these without any uniqueness checks, and
+        are moved into the real results tables in a single pass by
+        `merge_staging_tables`.
+        Staging tables left by an earlier load that failed are dropped.
+        """
+        from predectorutils import analyses
+        self.drop_staging_tables()
+
+        for an in analyses.Analyses:
+            ans = str(an)
+
+            if self.is_typed(an):
+                self._create_typed_table(an, f"staging_{ans}", unique=False)
+                continue
+
+            if an.needs_database():
+                db_cols = (
+                    """
+                    database text NOT NULL,
+                    database_version text NOT NULL,
+                    """
+                )
+            else:
+                db_cols = ""
+
+            self.cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS staging_{ans} (
+                    software text NOT NULL,
+                    software_version text NOT NULL,
+                    {db_cols}
+                    pipeline_version text,
+                    checksum text NOT NULL,
+                    md5sum text NOT NULL,
+                    data json NOT NULL
+                )
+                """
+            )
+
+        self.con.commit()
+        return
+
+    def merge_staging_tables(self):
+        """ Moves rows from the staging tables into the results tables.
+
+        Duplicates are resolved by the UNIQUE constraint on the results
+        tables, and the staging tables are dropped afterwards.
+        """
+        from predectorutils import analyses
+        for an in analyses.Analyses:
+            ans = str(an)
+
+            if not self.exists_table(f"staging_{ans}"):
+                continue
+
+            if self.is_typed(an):
+                table_name = f"typed_{ans}"
+                columns = ", ".join(self._typed_table_columns(an))
+            else:
+                if an.needs_database():
+                    db_cols = "database, database_version,"
+                else:
+                    db_cols = ""
+
+                table_name = f"results_{ans}"
+                columns = (
+                    "software, software_version, "
+                    f"{db_cols} "
+                    "pipeline_version, checksum, md5sum, data"
+                )
+
+            self.cur.execute(
+                f"""
+                INSERT OR IGNORE INTO {table_name} ({columns})
+                SELECT {columns}
+                FROM staging_{ans}
+                """
+            )
+            self.cur.execute(f"DROP TABLE staging_{ans}")
+
+        self.con.commit()
+        return
+
+    def drop_staging_tables(self):
+        from predectorutils import analyses
+        for an in analyses.Analyses:
+            ans = str(an)
+            self.cur.execute(f"DROP TABLE IF EXISTS staging_{ans}")
+
+        self.con.commit()
+        return
+
     def create_result_index(self):
         from predectorutils import analyses
         for an in analyses.Analyses:
@@ -362,10 +837,16 @@ class ResultsTable(object):
             else:
                 db_index = ""
 
+            # Views can't be indexed, so typed layouts index the table.
+            if self.is_typed(an):
+                table_name = f"typed_{ans}"
+            else:
+                table_name = f"results_{ans}"
+
             self.cur.execute(
                 f"""
                 CREATE INDEX IF NOT EXISTS results_index_{ans}
-                ON results_{ans} (
+                ON {table_name} (
                     software_version,
                     {db_index}
                     checksum,
@@ -434,8 +915,19 @@ class ResultsTable(object):
         self.con.commit()
         return
 
-    def _insert_results(self, an: Analyses, rows: Iterable[ResultRow]) -> None:
+    def _insert_results(
+        self,
+        an: Analyses,
+        rows: Iterable[ResultRow],
+        staging: bool = False
+    ) -> None:
         ans = str(an)
+
+        if self.is_typed(an):
+            self._insert_typed_results(an, rows, staging=staging)
+            return
+
+        table_name = f"staging_{ans}" if staging else f"results_{ans}"
         keys = ["software", "software_version",
                 "pipeline_version", "checksum", "md5sum", "data"]
 
@@ -452,7 +944,7 @@ class ResultsTable(object):
 
         self.cur.executemany(
             f"""
-            INSERT INTO results_{ans}
+            INSERT INTO {table_name}
             VALUES (
                 :software,
                 :software_version,
@@ -469,11 +961,55 @@ class ResultsTable(object):
         self.con.commit()
         return
 
+    def _insert_typed_results(
+        self,
+        an: Analyses,
+        rows: Iterable[ResultRow],
+        staging: bool = False
+    ) -> None:
+        ans = str(an)
+        table_name = f"staging_{ans}" if staging else f"typed_{ans}"
+
+        def to_values(r: ResultRow) -> list[Any]:
+            values: list[Any] = [r.software, r.software_version]
+
+            if an.needs_database():
+                values.extend([r.database, or_else("", r.database_version)])
+
+            values.extend([r.pipeline_version, r.checksum, r.md5sum])
+
+            if an.multiple_ok():
+                values.append(data_checksum(r.data))
+
+            values.extend(typed_values(an, r.data))
+            return values
+
+        columns = self._typed_table_columns(an)
+        placeholders = ", ".join("?" for _ in columns)
+
+        self.cur.executemany(
+            f"""
+            INSERT INTO {table_name} ({", ".join(columns)})
+            VALUES ({placeholders})
+            ON CONFLICT DO NOTHING
+            """,
+            map(to_values, rows)
+        )
+        self.con.commit()
+        return
+
     def insert_results(
         self,
         rows: Iterable[ResultRow],
-        insert_names: bool = False
+        insert_names: bool = False,
+        staging: bool = False
     ) -> None:
+        """ Inserts results into the tables for their analyses.
+
+        If staging is True, the rows are appended to the staging tables
+        (see `create_staging_tables`) and must be moved into the
+        results tables afterwards with `merge_staging_tables`.
+        """
         from collections import defaultdict
         cache = defaultdict(list)
 
@@ -484,6 +1020,7 @@ class ResultsTable(object):
 
         i = 0
         for row in rows:
+            i += 1
             an = row.analysis
             cache[an].append(row)
 
@@ -501,11 +1038,11 @@ class ResultsTable(object):
                 for an, an_rows in cache.items():
                     if len(an_rows) == 0:
                         continue
-                    self._insert_results(an, an_rows)
+                    self._insert_results(an, an_rows, staging=staging)
                     cache[an] = []
 
                 if len(decoder_rows) > 0:
-                    self.insert_decoder(decoder_rows)
+                    self._insert_decoder(decoder_rows)
                     decoder_rows = []
                 i = 0
 
@@ -513,16 +1050,19 @@ class ResultsTable(object):
             if len(an_rows) == 0:
                 continue
 
-            self._insert_results(an, an_rows)
+            self._insert_results(an, an_rows, staging=staging)
 
         if len(decoder_rows) > 0:
-            self.insert_decoder(decoder_rows)
+            self._insert_decoder(decoder_rows)
         return
 
     def insert_decoder(self, rows: Iterable[DecoderRow]) -> None:
         self.create_decoder_table()
         self.create_decoder_index()
+        self._insert_decoder(rows)
+        return
 
+    def _insert_decoder(self, rows: Iterable[DecoderRow]) -> None:
         self.cur.executemany(
             "INSERT INTO decoder VALUES "
             "(:checksum, :md5sum, IFNULL(:filename, ''), :name) "
@@ -770,6 +1310,160 @@ class ResultsTable(object):
             yield r["checksum"]
         return
 
+    def insert_targets(self, targets: Iterable[TargetRow]) -> None:
+        """ Loads the targets into a temporary table.
+
+        The rowid of the table preserves the order that targets were
+        given in, and duplicate targets are ignored.
+        """
+        self.cur.execute("DROP TABLE IF EXISTS targets")
+        self.cur.execute(
+            """
+            CREATE TEMP TABLE targets (
+                analysis integer NOT NULL,
+                software_version text NOT NULL,
+                database_version text NOT NULL,
+                UNIQUE (analysis, software_version, database_version)
+            )
+            """
+        )
+        self.cur.executemany(
+            """
+            INSERT OR IGNORE INTO targets
+            VALUES (:analysis, :software_version, IFNULL(:database_version, ''))
+            """,
+            (
+                {
+                    "analysis": t.analysis,
+                    "software_version": t.software_version,
+                    "database_version": t.database_version
+                }
+                for t
+                in targets
+            )
+        )
+        return
+
+    def _target_analyses(self) -> list[Analyses]:
+        assert self.exists_table("targets"), "no targets table"
+        result = self.cur.execute("SELECT DISTINCT analysis FROM targets")
+        analyses = {Analyses(int(r["analysis"])) for r in result}
+
+        return [
+            an
+            for an
+            in sorted(analyses)
+            if self.exists_table(f"results_{an}")
+        ]
+
+    def select_targets(self, checksums: bool = False) -> Iterator[ResultRow]:
+        """ Same as `select_target` but for all rows in the targets table.
+        """
+        if checksums:
+            assert self.exists_table("checksums"), "no checksums table"
+            chk_where = "AND r.checksum IN checksums"
+        else:
+            chk_where = ""
+
+        query = []
+        for an in self._target_analyses():
+            ans = str(an)
+            anv = an.value
+
+            if an.needs_database():
+                db_cols = (
+                    """
+                    r.database as database,
+                    r.database_version as database_version,
+                    """
+                )
+                db_where = "AND r.database_version = t.database_version"
+            else:
+                db_cols = (
+                    """
+                    '' as database,
+                    '' as database_version,
+                    """
+                )
+                db_where = ""
+
+            q = f"""
+            SELECT
+                CAST({anv} AS analyses) as analysis,
+                r.software as software,
+                r.software_version as software_version,
+                {db_cols}
+                r.pipeline_version as pipeline_version,
+                r.checksum as checksum,
+                r.md5sum as md5sum,
+                r.data as data
+            FROM targets t
+            INNER JOIN results_{ans} r
+                ON r.software_version = t.software_version
+                {db_where}
+            WHERE t.analysis = {anv}
+            {chk_where}
+            """
+            query.append(q)
+
+        if len(query) == 0:
+            return
+
+        result = self.cur.execute("\nUNION ALL\n".join(query))
+        for r in result:
+            yield ResultRow.from_rowfactory(r)
+
+        return
+
+    def find_remaining_targets(self) -> Iterator[tuple[TargetRow, str]]:
+        """ Same as `find_remaining` but for all rows in the targets table.
+
+        Yields pairs of targets and checksums that don't have results
+        for that target. Pairs are grouped by target, in the order that
+        the targets were inserted.
+        """
+        assert self.exists_table("checksums"), "no checksums table"
+
+        query = []
+        for an in self._target_analyses():
+            ans = str(an)
+            anv = an.value
+
+            if an.needs_database():
+                db_where = "AND r.database_version = t.database_version"
+            else:
+                db_where = ""
+
+            q = f"""
+            SELECT
+                t.rowid as target_order,
+                t.analysis as analysis,
+                t.software_version as software_version,
+                t.database_version as database_version,
+                c.checksum as checksum
+            FROM targets t
+            CROSS JOIN checksums c
+            WHERE t.analysis = {anv}
+            AND NOT EXISTS (
+                SELECT 1
+                FROM results_{ans} r
+                WHERE r.software_version = t.software_version
+                {db_where}
+                AND r.checksum = c.checksum
+            )
+            """
+            query.append(q)
+
+        if len(query) == 0:
+            return
+
+        qstring = "\nUNION ALL\n".join(query) + "\nORDER BY target_order"
+        result = self.cur.execute(qstring)
+
+        for r in result:
+            yield TargetRow.from_rowfactory(r), r["checksum"]
+        return
+
     def select_all(self, checksums: bool = False) -> Iterator[ResultRow]:
         from . import analyses
 
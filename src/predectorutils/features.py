@@ -0,0 +1,888 @@
+#!/usr/bin/env python3
+
+import sqlite3
+
+from statistics import median
+
+from typing import Optional
+from collections.abc import Iterable
+
+from .analyses import Analyses
+from .database import ResultsTable
+
+
+class AggBase(object):
+
+    nargs: int
+    analysis: Analyses
+    sql_fname: str
+
+    def __init__(self) -> None:
+        raise NotImplementedError("this is a baseclass")
+
+
+class AggPhobiusTMDomains(AggBase):
+
+    nargs = 1
+    analysis = Analyses.phobius
+    sql_fname = "agg_phobius_domains"
+
+    def __init__(self) -> None:
+        self.matches: list[tuple[int, int]] = []
+        return
+
+    def step(self, data: str) -> None:
+        from .analyses import GFFAble
+        an = (
+            Analyses(self.analysis)
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, GFFAble)
+
+        for gffrow in an.as_gff():
+            if gffrow.type != "transmembrane_polypeptide_region":
+                continue
+
+            self.matches.append((gffrow.start + 1, gffrow.end))
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+
+        return "tm:" + ",".join(
+            f"{s}-{e}"
+            for s, e
+            in sorted(self.matches, key=lambda t: t[0])
+        )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            f"{cls.sql_fname}(data)"
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+        )
+
+
+class AggTMHMMDomains(AggBase):
+
+    nargs = 1
+    analysis = Analyses.tmhmm
+    sql_fname = "agg_tmhmm_domains"
+
+    def __init__(self) -> None:
+        self.matches: list[tuple[int, int]] = []
+        return
+
+    def step(self, data: str) -> None:
+        from .analyses import GFFAble
+        an = (
+            Analyses(self.analysis)
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, GFFAble)
+
+        for gffrow in an.as_gff():
+            if gffrow.type != "transmembrane_polypeptide_region":
+                continue
+
+            self.matches.append((gffrow.start + 1, gffrow.end))
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+
+        return "tm:" + ",".join(
+            f"{s}-{e}"
+            for s, e
+            in sorted(self.matches, key=lambda t: t[0])
+        )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            f"{cls.sql_fname}(data)"
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+        )
+
+
+class AggTMSPCoverage(AggBase):
+
+    nargs = 2
+    analyses = [
+        Analyses.signalp3_hmm,
+        Analyses.signalp3_nn,
+        Analyses.signalp4,
+        Analyses.signalp5,
+        Analyses.signalp6,
+        Analyses.deepsig,
+        Analyses.phobius,
+        Analyses.tmhmm
+    ]
+    sql_fname = "agg_tmsp_coverage"
+
+    def __init__(self) -> None:
+        self.signals: list[int] = []
+        self.membranes: list[tuple[int, int]] = []
+        return
+
+    def step(self, analysis: int, data: str) -> None:
+        from .analyses import GFFAble
+        an = (
+            Analyses(analysis)
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, GFFAble)
+
+        for gffrow in an.as_gff():
+            if gffrow.type == "signal_peptide":
+                self.signals.append(gffrow.end)
+            elif gffrow.type == "transmembrane_polypeptide_region":
+                self.membranes.append((gffrow.start, gffrow.end))
+        return
+
+    def finalize(self) -> float:
+        if len(self.signals) == 0:
+            return 0.0
+
+        if len(self.membranes) == 0:
+            return 0.0
+
+        tm = sorted(self.membranes, key=lambda t: t[0])[0]
+        covs = [self.gff_coverage(sp, tm) for sp in self.signals]
+        return median(covs)
+
+    @classmethod
+    def sql_query(cls) -> str:
+        sources = ",".join(str(int(a)) for a in cls.analyses)
+
+        return (
+            f"{cls.sql_fname}(analysis, data)"
+            f"FILTER (WHERE analysis IN ({sources}))"
+        )
+
+    def gff_intersection(self, sp: int, tm: tuple[int, int]) -> int:
+        lstart = 0
+        lend = sp
+
+        rstart = min(tm)
+        rend = max(tm)
+
+        start = max([lstart, rstart])
+        end = min([lend, rend])
+
+        # This will be < 0 if they don't overlap
+        if start < end:
+            return end - start
+        else:
+            return 0
+
+    def gff_coverage(self, sp: int, tm: tuple[int, int]) -> float:
+        noverlap = self.gff_intersection(sp, tm)
+        rstart, rend = tm
+        return noverlap / (rend - rstart)
+
+
+class AggSPCutsite(AggBase):
+
+    nargs = 2
+    analyses = [
+        Analyses.signalp3_hmm,
+        Analyses.signalp3_nn,
+        Analyses.signalp4,
+        Analyses.signalp5,
+        Analyses.signalp6,
+        Analyses.deepsig,
+        Analyses.phobius
+    ]
+    sql_fname = "agg_sp_cutsite"
+
+    def __init__(self) -> None:
+        self.matches: list[tuple[str, int]] = []
+        return
+
+    def step(self, analysis: int, data: str) -> None:
+        from .analyses import GFFAble
+        an = (
+            Analyses(analysis)
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, GFFAble)
+
+        for gffrow in an.as_gff():
+            if gffrow.type != "signal_peptide":
+                continue
+
+            self.matches.append((an.__class__.__name__, gffrow.end))
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+
+        return ",".join(
+            f"{n}:{e}"
+            for n, e
+            in sorted(self.matches, key=lambda t: t[1])
+        )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        sources = ",".join(str(int(a)) for a in cls.analyses)
+
+        return (
+            f"{cls.sql_fname}(analysis, data)"
+            f"FILTER (WHERE analysis IN ({sources}))"
+        )
+
+
+class AggKex2(AggBase):
+    nargs = 4
+    analysis = Analyses.kex2_cutsite
+    sql_fname = "agg_kex2"
+
+    def __init__(self) -> None:
+        self.matches: dict[tuple[str, int, int], set[str]] = dict()
+        return
+
+    def step(
+        self,
+        pattern: str,
+        match: str,
+        start: int,
+        end: int
+    ) -> None:
+        pattern = pattern.replace("[A-Z]", "X")
+        tup = (match, start + 1, end)
+        if tup in self.matches:
+            self.matches[tup].add(pattern)
+        else:
+            self.matches[tup] = {pattern}
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+        else:
+            return ",".join(
+                f"{m}:{'&'.join(ps)}:{s}-{e}"
+                for (m, s, e), ps
+                in sorted(self.matches.items(), key=lambda t: t[0][1])
+            )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            f"{cls.sql_fname}("
+            "json_extract(data, '$.pattern'), "
+            "json_extract(data, '$.match'), "
+            "json_extract(data, '$.start'), "
+            "json_extract(data, '$.end')"
+            ") "
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+        )
+
+
+class AggRxLR(AggBase):
+    nargs = 3
+    analysis = Analyses.rxlr_like_motif
+    sql_fname = "agg_rxlr"
+
+    def __init__(self) -> None:
+        self.matches: list[tuple[str, int, int]] = []
+        return
+
+    def step(
+        self,
+        match: str,
+        start: int,
+        end: int
+    ) -> None:
+        self.matches.append((match, start + 1, end))
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+        else:
+            return ",".join(
+                f"{m}:{s}-{e}"
+                for (m, s, e)
+                in sorted(self.matches, key=lambda t: t[1])
+            )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            f"{cls.sql_fname}("
+            "json_extract(data, '$.match'), "
+            "json_extract(data, '$.start'), "
+            "json_extract(data, '$.end')"
+            ") "
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+        )
+
+
+class AggPHIMatches(AggBase):
+    nargs = 1
+    index: int
+
+    def __init__(self) -> None:
+        self.matches: dict[str, float] = dict()
+        return
+
+    def step(self, data: str) -> None:
+        from .analyses import MMSeqs
+        an = (
+            self.analysis
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, MMSeqs)
+
+        if an.decide_significant():
+            si = an.target.strip().split("#")
+            assert len(si) == 6
+            matches = set(si[self.index].split("__"))
+            for match in matches:
+                if match in self.matches:
+                    if an.evalue < self.matches[match]:
+                        self.matches[match] = an.evalue
+                else:
+                    self.matches[match] = an.evalue
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+        else:
+            return ",".join(
+                k
+                for k, _
+                in sorted(self.matches.items(), key=lambda t: t[1])
+            )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            f"{cls.sql_fname}(data) "
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+        )
+
+
+class AggPHIPhenos(AggPHIMatches):
+    nargs = 1
+    sql_fname = "agg_phi_phenos"
+    analysis = Analyses.phibase
+    index = 5
+
+
+class AggPHIIDs(AggPHIMatches):
+    nargs = 1
+    sql_fname = "agg_phi_ids"
+    analysis = Analyses.phibase
+    index = 1
+
+
+class AggPHIGenes(AggPHIMatches):
+    nargs = 1
+    sql_fname = "agg_phi_genes"
+    analysis = Analyses.phibase
+    index = 2
+
+
+class AggPHIHasMatch(AggBase):
+    nargs = 1
+    analysis = Analyses.phibase
+    index = 5
+    targets: set[str]
+
+    def __init__(self) -> None:
+        self.phenos: set[str] = set()
+        return
+
+    def step(self, data: str) -> None:
+        from .analyses import MMSeqs
+        an = (
+            self.analysis
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, MMSeqs)
+        if an.decide_significant():
+            si = an.target.strip().split("#")
+            assert len(si) == 6
+            phenos = set(si[self.index].lower().split("__"))
+            self.phenos.update(phenos)
+        return
+
+    def finalize(self) -> bool:
+        if len(self.phenos) == 0:
+            return False
+        return len(
+            self.phenos.intersection(self.targets)
+        ) > 0
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            "IFNULL("
+            f"{cls.sql_fname}(data) "
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+            ", 0)"
+        )
+
+
+class AggPHIEffectorMatch(AggPHIHasMatch):
+    sql_fname = "agg_phi_ematch"
+    targets = {
+        "loss_of_pathogenicity",
+        "increased_virulence_(hypervirulence)",
+        "effector_(plant_avirulence_determinant)"
+    }
+
+
+class AggPHIVirulenceMatch(AggPHIHasMatch):
+    sql_fname = "agg_phi_vmatch"
+    targets = {"reduced_virulence"}
+
+
+class AggPHILethalMatch(AggPHIHasMatch):
+    sql_fname = "agg_phi_lmatch"
+    targets = {"lethal"}
+
+
+class AggHMMER(AggBase):
+    nargs = 1
+
+    def __init__(self) -> None:
+        self.matches: dict[str, float] = {}
+        return
+
+    def step(self, data: str) -> None:
+        from .analyses import DomTbl
+        an = (
+            self.analysis
+            .get_analysis()
+            .from_json_str(data)
+        )
+
+        assert isinstance(an, DomTbl)
+
+        if an.decide_significant():
+            if an.hmm in self.matches:
+                if self.matches[an.hmm] > an.domain_i_evalue:
+                    self.matches[an.hmm] = an.domain_i_evalue
+            else:
+                self.matches[an.hmm] = an.domain_i_evalue
+
+        return
+
+    def finalize(self) -> Optional[str]:
+        if len(self.matches) == 0:
+            return None
+
+        return ",".join(
+            k
+            for k, _
+            in sorted(self.matches.items(), key=lambda t: t[1])
+        )
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (
+            f"{cls.sql_fname}(data) "
+            f"FILTER (WHERE analysis = {int(cls.analysis)})"
+        )
+
+
+class AggEffectorDB(AggHMMER):
+    analysis = Analyses.effectordb
+    sql_fname = "agg_effdb"
+
+
+class AggDBCAN(AggHMMER):
+    analysis = Analyses.dbcan
+    sql_fname = "agg_dbcan"
+
+
+class AggSperProb(AggBase):
+    nargs = 2
+    pred_col: str
+    prob_col: str
+    pos_values: list[str]
+
+    def __init__(self) -> None:
+        self.prob: Optional[float] = None
+        return
+
+    def step(self, prob: float, pred: str) -> None:
+        if (self.prob is not None) and (self.prob != prob):
+            raise ValueError("This shouldn't happen!")
+
+        if pred in self.pos_values:
+            self.prob = prob
+        else:
+            self.prob = 1 - prob
+        return
+
+    def finalize(self) -> Optional[float]:
+        return self.prob
+
+    @classmethod
+    def sql_query(cls) -> str:
+        return (  # noqa
+            f"{cls.sql_fname}("
+                f"json_extract(data, '$.{cls.prob_col}'), "
+                f"json_extract(data, '$.{cls.pred_col}')"
+            f') FILTER (WHERE analysis = {int(cls.analysis)})'
+        )
+
+
+class AggEP1(AggSperProb):
+
+    sql_fname = "agg_ep1"
+    prob_col = "prob"
+    pred_col = "prediction"
+    analysis = Analyses.effectorp1
+
+    pos_values = ["Effector"]
+
+
+class AggEP2(AggSperProb):
+
+    sql_fname = "agg_ep2"
+    prob_col = "prob"
+    pred_col = "prediction"
+    analysis = Analyses.effectorp2
+
+    pos_values = ["Effector", "Unlikely effector"]
+
+
+class AggApoplastP(AggSperProb):
+
+    sql_fname = "agg_apoplastp"
+    prob_col = "prob"
+    pred_col = "prediction"
+    analysis = Analyses.apoplastp
+
+    pos_values = ["Apoplastic"]
+
+
+def agg_json(field: str, analysis: str) -> str:
+    an = Analyses.from_string(analysis)
+    return (
+        f"MAX(json_extract(data, '$.{field}')) "
+        f"FILTER (WHERE analysis = {int(an)})"
+    )
+
+
+# This variant makes sure it's between 0 and 1
+def agg_json_prob(field: str, analysis: str) -> str:
+    an = Analyses.from_string(analysis)
+
+    filtered = (
+        f"(MAX(json_extract(data, '$.{field}')) "
+        f"FILTER (WHERE analysis = {int(an)}))"
+    )
+
+    return f"MAX(MIN(({filtered}), 1.0), 0.0)"
+
+
+# Checks if it is a value
+def agg_json_eq_str(field: str, value: str, analysis: str) -> str:
+    an = Analyses.from_string(analysis)
+
+    return (
+        f"MAX(json_extract(data, '$.{field}') == '{value}') "
+        f"FILTER (WHERE analysis = {int(an)})"
+    )
+
+
+def agg_deepsig(pred: str) -> str:
+    an = Analyses.deepsig
+
+    filtered = (  # noqa
+        "MAX(json_extract(data, '$.prob'))"
+        "FILTER ("
+            f"WHERE analysis = {int(an)} "
+            f"AND json_extract(data, '$.prediction') == '{pred}'"
+        ")"
+    )
+
+    return f"MAX(MIN(({filtered}), 1.0), 0.0)"
+
+
+def agg_fkyin_gap() -> str:
+    an = Analyses.pepstats
+
+    template = (
+        "(MAX(json_extract(data, '$.{field}')) "
+        f"FILTER (WHERE analysis = {int(an)}))"
+    )
+
+    col_template = "residue_{}_number"
+
+    numerator = "+".join([
+        template.format(field=col_template.format(b))
+        for b
+        in "fkyin"
+    ])
+
+    denominator = " + ".join([
+        template.format(field=col_template.format(b))
+        for b
+        in "gap"
+    ])
+
+    return f"((1.0 * {numerator} + 1) / (1.0 * {denominator} + 1))"
+
+
+AGGREGATES: list[type[AggBase]] = [
+    AggEP1, AggEP2, AggApoplastP, AggEffectorDB, AggDBCAN,
+    AggPHIPhenos, AggPHIIDs, AggPHIGenes,
+    AggPHIEffectorMatch, AggPHIVirulenceMatch, AggPHILethalMatch,
+    AggKex2, AggRxLR,
+    AggSPCutsite, AggTMSPCoverage, AggTMHMMDomains, AggPhobiusTMDomains
+]
+
+
+def register_aggregates(con: sqlite3.Connection) -> None:
+    for c in AGGREGATES:
+        con.create_aggregate(c.sql_fname, c.nargs, c)  # type: ignore
+    return
+
+
+# The per-protein features used by rank.
+# These only depend on the results themselves, so they can be computed
+# once when results are loaded rather than every time we rank.
+# Tuples are (column name, SQL type, SQL aggregate expression).
+FEATURE_COLUMNS: list[tuple[str, str, str]] = [  # noqa
+    ("effector_matches", "text", AggEffectorDB.sql_query()),
+    ("phibase_genes", "text", AggPHIGenes.sql_query()),
+    ("phibase_phenotypes", "text", AggPHIPhenos.sql_query()),
+    ("phibase_ids", "text", AggPHIIDs.sql_query()),
+    ("has_phibase_effector_match", "integer", AggPHIEffectorMatch.sql_query()),
+    ("has_phibase_virulence_match", "integer", AggPHIVirulenceMatch.sql_query()),
+    ("has_phibase_lethal_match", "integer", AggPHILethalMatch.sql_query()),
+    ("dbcan_matches", "text", AggDBCAN.sql_query()),
+    ("effectorp1", "real", AggEP1.sql_query()),
+    ("effectorp2", "real", AggEP2.sql_query()),
+    ("effectorp3_cytoplasmic", "real", agg_json('cytoplasmic_prob', 'effectorp3')),
+    ("effectorp3_apoplastic", "real", agg_json('apoplastic_prob', 'effectorp3')),
+    ("effectorp3_noneffector", "real", agg_json('noneffector_prob', 'effectorp3')),
+    ("deepredeff_fungi", "real", agg_json('s_score', 'deepredeff_fungi')),
+    ("deepredeff_oomycete", "real", agg_json('s_score', 'deepredeff_oomycete')),
+    ("apoplastp", "real", AggApoplastP.sql_query()),
+    ("molecular_weight", "real", agg_json('molecular_weight', 'pepstats')),
+    ("residue_number", "integer", agg_json('residues', 'pepstats')),
+    ("charge", "real", agg_json('charge', 'pepstats')),
+    ("isoelectric_point", "real", agg_json('isoelectric_point', 'pepstats')),
+    ("aa_c_number", "integer", agg_json('residue_c_number', 'pepstats')),
+    ("aa_tiny_number", "integer", agg_json('property_tiny_number', 'pepstats')),
+    ("aa_small_number", "integer", agg_json('property_small_number', 'pepstats')),
+    ("aa_aliphatic_number", "integer", agg_json('property_aliphatic_number', 'pepstats')),
+    ("aa_aromatic_number", "integer", agg_json('property_aromatic_number', 'pepstats')),
+    ("aa_nonpolar_number", "integer", agg_json('property_nonpolar_number', 'pepstats')),
+    ("aa_charged_number", "integer", agg_json('property_charged_number', 'pepstats')),
+    ("aa_basic_number", "integer", agg_json('property_basic_number', 'pepstats')),
+    ("aa_acidic_number", "integer", agg_json('property_acidic_number', 'pepstats')),
+    ("fykin_gap", "real", agg_fkyin_gap()),
+    ("kex2_cutsites", "text", AggKex2.sql_query()),
+    ("rxlr_like_motifs", "text", AggRxLR.sql_query()),
+    ("localizer_nucleus", "integer", agg_json('nucleus_decision', 'localizer')),
+    ("localizer_chloro", "integer", agg_json('chloroplast_decision', 'localizer')),
+    ("localizer_mito", "integer", agg_json('mitochondria_decision', 'localizer')),
+    ("signal_peptide_cutsites", "text", AggSPCutsite.sql_query()),
+    ("signalp3_nn", "integer", agg_json('d_decision', 'signalp3_nn')),
+    ("signalp3_hmm", "integer", agg_json('is_secreted', 'signalp3_hmm')),
+    ("signalp4", "integer", agg_json('decision', 'signalp4')),
+    ("signalp5", "integer", agg_json_eq_str("prediction", "SP(Sec/SPI)", "signalp5")),
+    ("signalp6", "integer", agg_json_eq_str("prediction", "SP", "signalp6")),
+    ("deepsig", "integer", agg_json_eq_str("prediction", "SignalPeptide", "deepsig")),
+    ("phobius_sp", "integer", agg_json('sp', 'phobius')),
+    ("phobius_tmcount", "integer", agg_json('tm', 'phobius')),
+    ("phobius_tm_domains", "text", AggPhobiusTMDomains.sql_query()),
+    ("tmhmm_tmcount", "integer", agg_json('pred_hel', 'tmhmm')),
+    ("tmhmm_first_60", "real", agg_json('first_60', 'tmhmm')),
+    ("tmhmm_exp_aa", "real", agg_json('exp_aa', 'tmhmm')),
+    ("tmhmm_first_tm_sp_coverage", "real", AggTMSPCoverage.sql_query()),
+    ("tmhmm_domains", "text", AggTMHMMDomains.sql_query()),
+    ("targetp_secreted", "integer", agg_json_eq_str('prediction', 'SP', 'targetp_non_plant')),
+    ("targetp_secreted_prob", "real", agg_json_prob('sp', 'targetp_non_plant')),
+    ("targetp_mitochondrial_prob", "real", agg_json_prob('mtp', 'targetp_non_plant')),
+    ("deeploc_membrane", "real", agg_json_prob('membrane', 'deeploc')),
+    ("deeploc_nucleus", "real", agg_json_prob('nucleus', 'deeploc')),
+    ("deeploc_cytoplasm", "real", agg_json_prob('cytoplasm', 'deeploc')),
+    ("deeploc_extracellular", "real", agg_json_prob('extracellular', 'deeploc')),
+    ("deeploc_mitochondrion", "real", agg_json_prob('mitochondrion', 'deeploc')),
+    ("deeploc_cell_membrane", "real", agg_json_prob('cell_membrane', 'deeploc')),
+    ("deeploc_endoplasmic_reticulum", "real", agg_json_prob('endoplasmic_reticulum', 'deeploc')),
+    ("deeploc_plastid", "real", agg_json_prob('plastid', 'deeploc')),
+    ("deeploc_golgi", "real", agg_json_prob('golgi_apparatus', 'deeploc')),
+    ("deeploc_lysosome", "real", agg_json_prob('lysosome_vacuole', 'deeploc')),
+    ("deeploc_peroxisome", "real", agg_json_prob('peroxisome', 'deeploc')),
+    ("signalp3_nn_d", "real", agg_json('d', 'signalp3_nn')),
+    ("signalp3_hmm_s", "real", agg_json('sprob', 'signalp3_hmm')),
+    ("signalp4_d", "real", agg_json('d', 'signalp4')),
+    ("signalp5_prob", "real", agg_json_prob('prob_signal', 'signalp5')),
+    ("signalp6_prob", "real", agg_json_prob('prob_signal', 'signalp6')),
+    ("deepsig_signal_prob", "real", agg_deepsig("SignalPeptide")),
+    ("deepsig_transmembrane_prob", "real", agg_deepsig("Transmembrane")),
+    ("deepsig_other_prob", "real", agg_deepsig("Other")),
+]
+
+
+class FeatureTable(object):
+
+    """ A table of rank features with one row per checksum.
+
+    The aggregates in `FEATURE_COLUMNS` are expensive because many of
+    them are python functions that parse the JSON data for every result.
+    This table stores the output of those aggregates, and is updated
+    for the checksums that are touched whenever new results are loaded.
+    """
+
+    def __init__(self, con: sqlite3.Connection, cur: sqlite3.Cursor) -> None:
+        self.con = con
+        self.cur = cur
+        self.tab = ResultsTable(con, cur)
+        return
+
+    def exists(self) -> bool:
+        return self.tab.exists_table("features")
+
+    def create_table(self) -> None:
+        columns = ",\n".join(
+            f"{name} {type_}"
+            for name, type_, _
+            in FEATURE_COLUMNS
+        )
+
+        self.cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS features (
+                checksum text NOT NULL PRIMARY KEY,
+                {columns}
+            )
+            """
+        )
+        self.con.commit()
+        return
+
+    def insert_pending(self, checksums: Iterable[str]) -> None:
+        """ Marks checksums as needing their features to be recomputed. """
+        self.cur.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS pending_features (
+                checksum text NOT NULL PRIMARY KEY
+            )
+            """
+        )
+        self.cur.executemany(
+            "INSERT OR IGNORE INTO pending_features VALUES (?)",
+            ((c,) for c in checksums)
+        )
+        return
+
+    def create_source_view(self) -> None:
+        query = []
+        for an in Analyses:
+            ans = str(an)
+            anv = an.value
+
+            if not self.tab.exists_table(f"results_{ans}"):
+                continue
+
+            if an.needs_database():
+                db_cols = (
+                    """
+                    database,
+                    database_version,
+                    """
+                )
+            else:
+                db_cols = (
+                    """
+                    '' as database,
+                    '' as database_version,
+                    """
+                )
+
+            q = f"""
+            SELECT
+                CAST({anv} AS analyses) as analysis,
+                software,
+                software_version,
+                {db_cols}
+                pipeline_version,
+                checksum,
+                data
+            FROM results_{ans}
+            """
+            query.append(q)
+
+        self.cur.execute("DROP VIEW IF EXISTS feature_source")
+        self.cur.execute(
+            "CREATE TEMP VIEW feature_source AS \n" +
+            "\nUNION\n".join(query)
+        )
+        return
+
+    def update(self, all_checksums: bool = False) -> None:
+        """ Recomputes the features for the pending checksums.
+
+        If all_checksums is True, all features are recomputed from
+        scratch, regardless of what is pending.
+        """
+
+        register_aggregates(self.con)
+        self.create_table()
+
+        if all_checksums:
+            self.cur.execute("DELETE FROM features")
+            where = ""
+        elif self.tab.exists_table("pending_features"):
+            self.cur.execute(
+                "DELETE FROM features WHERE checksum IN pending_features"
+            )
+            where = "WHERE checksum IN pending_features"
+        else:
+            return
+
+        self.create_source_view()
+
+        names = ", ".join(name for name, _, _ in FEATURE_COLUMNS)
+        exprs = ",\n".join(
+            f"{expr} as {name}"
+            for name, _, expr
+            in FEATURE_COLUMNS
+        )
+
+        self.cur.execute(
+            f"""
+            INSERT INTO features (checksum, {names})
+            SELECT
+                checksum,
+                {exprs}
+            FROM feature_source
+            {where}
+            GROUP BY checksum
+            """
+        )
+
+        self.cur.execute("DROP VIEW IF EXISTS feature_source")
+        self.cur.execute("DROP TABLE IF EXISTS pending_features")
+        self.con.commit()
+        return
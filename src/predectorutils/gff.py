@@ -2,13 +2,16 @@
 
 from collections.abc import Sequence, Mapping
 from collections.abc import Iterable, Iterator
+from collections.abc import KeysView
 from typing import TypeVar
 from typing import cast
 from typing import TextIO
 from typing import Union, Optional
 
+from sys import intern
 from enum import Enum
 from collections import deque
+from operator import itemgetter
 
 from .higher import fmap
 from .parsers import (
@@ -43,6 +46,16 @@ GFF3_KEY_TO_ATTR: dict[str, str] = {
 
 GFF3_ATTR_TO_KEY: dict[str, str] = {v: k for k, v in GFF3_KEY_TO_ATTR.items()}
 
+# List attributes that are stored as None until they're used.
+LAZY_ATTRS: frozenset[str] = frozenset([
+    "alias",
+    "parent",
+    "derives_from",
+    "note",
+    "dbxref",
+    "ontology_term",
+])
+
 GFF3_WRITE_ORDER: list[str] = [
     "ID",
     "Name",
@@ -119,6 +132,10 @@ def attr_escape(string: str) -> str:
 
 
 def attr_unescape(string: str) -> str:
+    # Most values don't have any escaped characters.
+    if "%" not in string:
+        return string
+
     return (
         string
         .replace("%3B", ";")
@@ -146,20 +163,21 @@ class Strand(Enum):
 
     @classmethod
     def parse(cls, string: str) -> "Strand":
-        from_str_map: dict[str, Strand] = {
-            "+": cls.PLUS,
-            "-": cls.MINUS,
-            ".": cls.UNSTRANDED,
-            "?": cls.UNKNOWN,
-        }
-
         try:
-            return from_str_map[string]
+            return STRAND_FROM_STR[string]
         except KeyError:
-            valid = list(from_str_map.keys())
+            valid = list(STRAND_FROM_STR.keys())
             raise ValueError(f"Invalid option. Must be one of {valid}")
 
 
+STRAND_FROM_STR: dict[str, Strand] = {
+    "+": Strand.PLUS,
+    "-": Strand.MINUS,
+    ".": Strand.UNSTRANDED,
+    "?": Strand.UNKNOWN,
+}
+
+
 class Phase(Enum):
     FIRST = 0
     SECOND = 1
@@ -175,20 +193,21 @@ class Phase(Enum):
 
     @classmethod
     def parse(cls, string: str) -> "Phase":
-        from_str_map: dict[str, Phase] = {
-            "0": cls.FIRST,
-            "1": cls.SECOND,
-            "2": cls.THIRD,
-            ".": cls.NOT_CDS,
-        }
-
         try:
-            return from_str_map[string]
+            return PHASE_FROM_STR[string]
         except KeyError:
-            valid = list(from_str_map.keys())
+            valid = list(PHASE_FROM_STR.keys())
             raise ValueError(f"Invalid option. Must be one of {valid}")
 
 
+PHASE_FROM_STR: dict[str, Phase] = {
+    "0": Phase.FIRST,
+    "1": Phase.SECOND,
+    "2": Phase.THIRD,
+    ".": Phase.NOT_CDS,
+}
+
+
 class TargetStrand(Enum):
     PLUS = 0
     MINUS = 1
@@ -384,8 +403,54 @@ class Gap(object):
         return cls(elements)
 
 
+def lazy_list(slot: str) -> property:
+    """ A list attribute that is only allocated when it is first used.
+
+    Empty lists are stored as None, which saves a lot of memory when
+    there are millions of records that don't use most attributes.
+    """
+
+    def getter(self) -> list[str]:
+        value = getattr(self, slot)
+        if value is None:
+            value = []
+            setattr(self, slot, value)
+        return value
+
+    def setter(self, value: Optional[Sequence[str]]) -> None:
+        if value is None or len(value) == 0:
+            setattr(self, slot, None)
+        else:
+            setattr(self, slot, list(value))
+        return
+
+    return property(getter, setter)
+
+
 class GFFAttributes(object):
 
+    __slots__ = [
+        "id",
+        "name",
+        "_alias",
+        "_parent",
+        "target",
+        "gap",
+        "_derives_from",
+        "_note",
+        "_dbxref",
+        "_ontology_term",
+        "is_circular",
+        "_custom",
+    ]
+
+    alias = lazy_list("_alias")
+    parent = lazy_list("_parent")
+    derives_from = lazy_list("_derives_from")
+    note = lazy_list("_note")
+    dbxref = lazy_list("_dbxref")
+    ontology_term = lazy_list("_ontology_term")
+
     def __init__(
         self,
         id: Optional[str] = None,
@@ -403,51 +468,84 @@ class GFFAttributes(object):
     ) -> None:
         self.id = id
         self.name = name
+        self._alias = list(alias) if alias else None
+        self._parent = list(parent) if parent else None
+        self.target = target
+        self.gap = gap
+        self._derives_from = list(derives_from) if derives_from else None
+        self._note = list(note) if note else None
+        self._dbxref = list(dbxref) if dbxref else None
+        self._ontology_term = list(ontology_term) if ontology_term else None
+        self.is_circular = is_circular
 
-        if alias is not None:
-            self.alias: list[str] = list(alias)
-        else:
-            self.alias = []
+        self._custom: Optional[dict[str, Union[str, list[str]]]] = None
+        if custom is not None and len(custom) > 0:
+            self._custom = {}
+            for k, v in custom.items():
+                if isinstance(v, str):
+                    self._custom[k] = v
+                else:
+                    self._custom[k] = list(v)
 
-        if parent is not None:
-            self.parent: list[str] = list(parent)
-        else:
-            self.parent = []
+        return
 
-        self.target = target
-        self.gap = gap
+    @property
+    def custom(self) -> dict[str, Union[str, list[str]]]:
+        if self._custom is None:
+            self._custom = {}
+        return self._custom
 
-        if derives_from is not None:
-            self.derives_from: list[str] = list(derives_from)
-        else:
-            self.derives_from = []
+    @custom.setter
+    def custom(self, value: Optional[dict[str, Union[str, list[str]]]]):
+        self._custom = value if value else None
+        return
 
-        if note is not None:
-            self.note: list[str] = list(note)
-        else:
-            self.note = []
+    def copy(self) -> "GFFAttributes":
+        """ A much faster alternative to deepcopy.
 
-        if dbxref is not None:
-            self.dbxref: list[str] = list(dbxref)
-        else:
-            self.dbxref = []
+        The lists are copied, but the Target and Gap are shared because
+        they're never modified in place.
+        """
 
-        if ontology_term is not None:
-            self.ontology_term: list[str] = list(ontology_term)
+        cls = type(self)
+        new = cls.__new__(cls)
+        new.id = self.id
+        new.name = self.name
+        new._alias = fmap(list, self._alias)
+        new._parent = fmap(list, self._parent)
+        new.target = self.target
+        new.gap = self.gap
+        new._derives_from = fmap(list, self._derives_from)
+        new._note = fmap(list, self._note)
+        new._dbxref = fmap(list, self._dbxref)
+        new._ontology_term = fmap(list, self._ontology_term)
+        new.is_circular = self.is_circular
+
+        if self._custom is None:
+            new._custom = None
         else:
-            self.ontology_term = []
-
-        self.is_circular = is_circular
+            new._custom = {
+                k: (v if isinstance(v, str) else list(v))
+                for k, v
+                in self._custom.items()
+            }
+        return new
 
-        self.custom: dict[str, Union[str, list[str]]] = {}
-        if custom is not None:
-            for k, v in custom.items():
-                if isinstance(v, str):
-                    self.custom[k] = v
-                else:
-                    self.custom[k] = list(v)
+    def _peek(
+        self,
+        key: str
+    ) -> Union[str, Sequence[str], Target, Gap, bool, None]:
+        """ Like __getitem__ but doesn't allocate unused lists.
 
-        return
+        Unused list attributes are returned as None rather than [].
+        """
+        attr = GFF3_KEY_TO_ATTR.get(key, None)
+        if attr is None:
+            return None if self._custom is None else self._custom[key]
+        elif attr in LAZY_ATTRS:
+            return getattr(self, "_" + attr)
+        else:
+            return getattr(self, attr)
 
     @classmethod
     def _parse_list_of_strings(
@@ -513,17 +611,16 @@ class GFFAttributes(object):
         if name == "":
             name = None
 
-        alias = cls._parse_list_of_strings(
-            kvpairs.pop("Alias", ""),
-            strip_quote,
-            unescape
-        )
+        # Most records only use a few attributes, so skip parsing
+        # any that aren't there.
+        def parse_list(key: str) -> Optional[list[str]]:
+            value = kvpairs.pop(key, None)
+            if value is None:
+                return None
+            return cls._parse_list_of_strings(value, strip_quote, unescape)
 
-        parent = cls._parse_list_of_strings(
-            kvpairs.pop("Parent", ""),
-            strip_quote,
-            unescape
-        )
+        alias = parse_list("Alias")
+        parent = parse_list("Parent")
 
         target: Optional[Target] = fmap(
             lambda x: Target.parse(x, unescape),
@@ -532,32 +629,17 @@ class GFFAttributes(object):
 
         gap = fmap(Gap.parse, kvpairs.pop("Gap", None))
 
-        derives_from = cls._parse_list_of_strings(
-            kvpairs.pop("Derives_from", ""),
-            strip_quote,
-            unescape
-        )
-
-        note = cls._parse_list_of_strings(
-            kvpairs.pop("Note", ""),
-            strip_quote,
-            unescape
-        )
+        derives_from = parse_list("Derives_from")
+        note = parse_list("Note")
+        dbxref = parse_list("Dbxref")
+        ontology_term = parse_list("Ontology_term")
 
-        dbxref = cls._parse_list_of_strings(
-            kvpairs.pop("Dbxref", ""),
-            strip_quote,
-            unescape
+        is_circular_str = kvpairs.pop("Is_circular", None)
+        is_circular = (
+            False if is_circular_str is None
+            else attr_is_circular(is_circular_str)
         )
 
-        ontology_term = cls._parse_list_of_strings(
-            kvpairs.pop("Ontology_term", ""),
-            strip_quote,
-            unescape
-        )
-
-        is_circular = attr_is_circular(kvpairs.pop("Is_circular", "false"))
-
         custom: dict[str, Union[str, list[str]]] = dict()
         for k, v in kvpairs.items():
             if "," in v:
@@ -584,27 +666,28 @@ class GFFAttributes(object):
     def is_empty(self) -> bool:  # noqa
         # Yes, this could be written as single boolean comparison.
         # But it gets so long that it's hard to understand.
-        if len(self.custom) > 0:
+        # The private attributes are used to avoid allocating empty lists.
+        if self._custom:
             return False
         elif self.id is not None:
             return False
         elif self.name is not None:
             return False
-        elif len(self.alias) > 0:
+        elif self._alias:
             return False
-        elif len(self.parent) > 0:
+        elif self._parent:
             return False
         elif self.target is not None:
             return False
         elif self.gap is not None:
             return False
-        elif len(self.derives_from) > 0:
+        elif self._derives_from:
             return False
-        elif len(self.note) > 0:
+        elif self._note:
             return False
-        elif len(self.dbxref) > 0:
+        elif self._dbxref:
             return False
-        elif len(self.ontology_term) > 0:
+        elif self._ontology_term:
             return False
         elif self.is_circular:
             return False
@@ -621,11 +704,12 @@ class GFFAttributes(object):
 
         keys = []
         keys.extend(GFF3_WRITE_ORDER)
-        keys.extend(self.custom.keys())
+        if self._custom is not None:
+            keys.extend(self._custom.keys())
 
         kvpairs = []
         for key in keys:
-            value = self[key]
+            value = self._peek(key)
             if value is None or value == []:
                 continue
             elif key == "Is_circular" and not value:
@@ -659,7 +743,10 @@ class GFFAttributes(object):
 
         parameters = []
         for param in param_names:
-            value = getattr(self, param)
+            if param == "custom":
+                value = {} if self._custom is None else self._custom
+            else:
+                value = self._peek(GFF3_ATTR_TO_KEY[param])
 
             if value is None or value == []:
                 continue
@@ -747,8 +834,66 @@ class GFFAttributes(object):
             return self.custom.pop(key, default)
 
 
+# Shared by all records without any relations of a given kind.
+NO_RECORDS: dict["GFFRecord", None] = {}
+
+
+def related_records(slot: str) -> property:
+    """ A set of related records that keeps the insertion order.
+
+    The records are stored as the keys of a dict, so that adding and
+    checking for a record are constant time. The dict is only allocated
+    when the first record is added.
+    The getter returns a read-only view, use the add_* methods
+    to link records.
+    """
+
+    def getter(self) -> KeysView["GFFRecord"]:
+        value = getattr(self, slot)
+        if value is None:
+            return NO_RECORDS.keys()
+        return value.keys()
+
+    def setter(self, value: Optional[Iterable["GFFRecord"]]) -> None:
+        if value is None:
+            setattr(self, slot, None)
+        else:
+            setattr(self, slot, dict.fromkeys(value) or None)
+        return
+
+    return property(getter, setter)
+
+
+# The columns of a GFFRecord, without any links to other records.
+RecordFields = tuple[
+    str, str, str, int, int,
+    Optional[float], Strand, Phase, GFFAttributes
+]
+
+
 class GFFRecord(object):
 
+    __slots__ = [
+        "seqid",
+        "source",
+        "type",
+        "start",
+        "end",
+        "score",
+        "strand",
+        "phase",
+        "attributes",
+        "_parents",
+        "_children",
+        "_derives_from",
+        "_derivatives",
+    ]
+
+    parents = related_records("_parents")
+    children = related_records("_children")
+    derives_from = related_records("_derives_from")
+    derivatives = related_records("_derivatives")
+
     columns: list[str] = [
         "seqid",
         "source",
@@ -794,19 +939,19 @@ class GFFRecord(object):
         else:
             self.attributes = attributes
 
-        self.parents: list[GFFRecord] = []
+        self._parents: Optional[dict[GFFRecord, None]] = None
         if parents is not None:
             self.add_parents(parents)
 
-        self.children: list[GFFRecord] = []
+        self._children: Optional[dict[GFFRecord, None]] = None
         if children is not None:
             self.add_children(children)
 
-        self.derives_from: list[GFFRecord] = []
+        self._derives_from: Optional[dict[GFFRecord, None]] = None
         if derives_froms is not None:
             self.add_derives_froms(derives_froms)
 
-        self.derivatives: list[GFFRecord] = []
+        self._derivatives: Optional[dict[GFFRecord, None]] = None
         if derivatives is not None:
             self.add_derivatives(derivatives)
         return
@@ -851,18 +996,17 @@ class GFFRecord(object):
         return self.length()
 
     def add_child(self, child: "GFFRecord") -> None:
-        if child not in self.children:
-            self.children.append(child)
-        if self not in child.parents:
-            child.parents.append(self)
+        if self._children is None:
+            self._children = {}
+        self._children[child] = None
+
+        if child._parents is None:
+            child._parents = {}
+        child._parents[self] = None
         return
 
     def add_parent(self, parent: "GFFRecord") -> None:
-        if parent not in self.parents:
-            self.parents.append(parent)
-
-        if self not in parent.children:
-            parent.children.append(self)
+        parent.add_child(self)
         return
 
     def add_children(self, children: Sequence["GFFRecord"]) -> None:
@@ -876,18 +1020,17 @@ class GFFRecord(object):
         return
 
     def add_derivative(self, derivative: "GFFRecord") -> None:
-        if derivative not in self.derivatives:
-            self.derivatives.append(derivative)
-        if self not in derivative.parents:
-            derivative.derives_from.append(self)
+        if self._derivatives is None:
+            self._derivatives = {}
+        self._derivatives[derivative] = None
+
+        if derivative._derives_from is None:
+            derivative._derives_from = {}
+        derivative._derives_from[self] = None
         return
 
     def add_derives_from(self, derives_from: "GFFRecord") -> None:
-        if derives_from not in self.derives_from:
-            self.derives_from.append(derives_from)
-
-        if self not in derives_from.derivatives:
-            derives_from.derivatives.append(self)
+        derives_from.add_derivative(self)
         return
 
     def add_derivatives(self, derivatives: Sequence["GFFRecord"]) -> None:
@@ -956,11 +1099,11 @@ class GFFRecord(object):
                 seen.add(node)
 
             children = list(node.children)
-            if sort:
-                children.sort(
-                    key=lambda f: (f.seqid, f.start, f.end, f.type),
-                    reverse=should_reverse
-                )
+            # Most features have at most one child, so there's nothing to
+            # sort. Sorting children that are already in order only takes
+            # one pass.
+            if sort and (len(children) > 1):
+                children.sort(key=block_key, reverse=should_reverse)
 
             to_visit.extend(children)
             yield node
@@ -1021,6 +1164,91 @@ class GFFRecord(object):
     ) -> "GFFRecord":
         """ Parse a gff line string as a `GFFRecord`.
 
+        This tries a fast parser first, and only uses the slower
+        validating parser to raise a helpful error if that fails.
+
+        Keyword arguments:
+        string -- The gff line to parse.
+        strip_quote -- Strip quotes from attributes values. The specification
+            says that they should not be stripped, so we don't by default.
+        unescape -- Unescape reserved characters in the attributes to their
+            original values. I.E. some commas, semicolons, newlines etc.
+
+        Returns:
+        A `GFFRecord`
+        """
+
+        try:
+            return cls.parse_fast(string, strip_quote, unescape)
+        except (ValueError, KeyError, LineParseError, FieldParseError):
+            return cls.parse_validated(string, strip_quote, unescape)
+
+    @classmethod
+    def parse_fast(
+        cls,
+        string: str,
+        strip_quote: bool = False,
+        unescape: bool = True,
+    ) -> "GFFRecord":
+        """ Parse a gff line that is expected to be valid.
+
+        Raises some exception for invalid lines, but the error messages
+        are less helpful than `parse_validated`.
+        """
+
+        sline = string.strip().split("\t")
+
+        if len(sline) >= 9:
+            (seqid, source, type_, start_str, end_str,
+             score_str, strand, phase, attributes) = sline[:9]
+        elif len(sline) == 8:
+            (seqid, source, type_, start_str, end_str,
+             score_str, strand, phase) = sline
+            attributes = ""
+        else:
+            raise ValueError("Line has too few columns.")
+
+        if (
+            (seqid.strip() == "") or
+            (source.strip() == "") or
+            (type_.strip() == "")
+        ):
+            raise ValueError("Empty string in a required column.")
+
+        # 0-based indexing exclusive
+        start = int(start_str) - 1
+        end = int(end_str)
+
+        if start > end:
+            start, end = end, start
+
+        score = None if score_str == "." else float(score_str)
+
+        return cls(
+            intern(seqid),
+            intern(source),
+            intern(type_),
+            start,
+            end,
+            score,
+            STRAND_FROM_STR[strand],
+            PHASE_FROM_STR[phase],
+            GFFAttributes.parse(
+                attributes,
+                strip_quote=strip_quote,
+                unescape=unescape
+            )
+        )
+
+    @classmethod
+    def parse_validated(
+        cls,
+        string: str,
+        strip_quote: bool = False,
+        unescape: bool = True,
+    ) -> "GFFRecord":
+        """ Parse a gff line string as a `GFFRecord`, checking each field.
+
         Keyword arguments:
         string -- The gff line to parse.
         format -- What format the gff file is in.
@@ -1068,10 +1296,11 @@ class GFFRecord(object):
             unescape=unescape,
         )
 
+        # These are repeated for many records, so share one copy.
         return cls(
-            rec_seqid(fields["seqid"]),
-            rec_source(fields["source"]),
-            rec_type(fields["type"]),
+            intern(rec_seqid(fields["seqid"])),
+            intern(rec_source(fields["source"])),
+            intern(rec_type(fields["type"])),
             start,
             end,
             score,
@@ -1135,12 +1364,36 @@ class GFFRecord(object):
             self.end = max_
         return
 
+    def __copy__(self) -> "GFFRecord":
+        """ A shallow copy, sharing the attributes and relations.
+
+        This is several times faster than the default copy of
+        a slotted object.
+        """
+
+        cls = type(self)
+        new = cls.__new__(cls)
+        new.seqid = self.seqid
+        new.source = self.source
+        new.type = self.type
+        new.start = self.start
+        new.end = self.end
+        new.score = self.score
+        new.strand = self.strand
+        new.phase = self.phase
+        new.attributes = self.attributes
+        new._parents = self._parents
+        new._children = self._children
+        new._derives_from = self._derives_from
+        new._derivatives = self._derivatives
+        return new
+
     def copy(self) -> "GFFRecord":
         """ You'll still need to update the ID """
-        from copy import copy, deepcopy
+        from copy import copy
 
         node_copy = copy(self)
-        node_copy.attributes = deepcopy(self.attributes)
+        node_copy.attributes = self.attributes.copy()
 
         if node_copy.attributes is not None:
             node_copy.attributes.parent = []
@@ -1149,15 +1402,127 @@ class GFFRecord(object):
         node_copy.parents = []
         return node_copy
 
-    @classmethod  # noqa
+    def as_fields(self) -> RecordFields:
+        """ Gets the columns of the record without any of its relations.
+
+        This is much cheaper to send to another process than the
+        record itself, which would pickle every record that it is linked to.
+        Unlike the GFF line, it can be converted back without
+        escaping the attributes.
+        """
+
+        return (
+            self.seqid,
+            self.source,
+            self.type,
+            self.start,
+            self.end,
+            self.score,
+            self.strand,
+            self.phase,
+            self.attributes
+        )
+
+    @classmethod
+    def from_fields(cls, fields: RecordFields) -> "GFFRecord":
+        return cls(*fields)
+
+    @classmethod
     def from_file(
         cls,
         handle: TextIO,
         strip_quote: bool = False,
         unescape: bool = True,
+        stream: bool = False,
     ) -> Iterator["GFFRecord"]:
+        """ Parses all of the records in a GFF3 file.
+
+        Records are yielded once all of their parents have been seen,
+        and they are linked to their parents, children etc.
+
+        Keyword arguments:
+        stream -- Forget about previous records at each `###` directive
+            and whenever the seqid changes, rather than keeping every
+            record until the end of the file. This keeps memory usage low
+            for large files, but all references must be resolved before
+            each of these points.
+        """
+
+        for record in cls._records_from_file(
+            handle,
+            strip_quote,
+            unescape,
+            stream
+        ):
+            if record is not None:
+                yield record
+        return
+
+    @classmethod
+    def blocks_from_file(
+        cls,
+        handle: TextIO,
+        strip_quote: bool = False,
+        unescape: bool = True,
+    ) -> Iterator[list["GFFRecord"]]:
+        """ Parses a GFF3 file in streaming mode, yielding the records
+        between each `###` directive or change of seqid.
+
+        Each block contains complete feature graphs (e.g. genes with all
+        of their mRNAs, exons and CDSs).
+        Only one block is held in memory at a time.
+        """
+
+        block: list[GFFRecord] = []
+        for record in cls._records_from_file(
+            handle,
+            strip_quote,
+            unescape,
+            stream=True
+        ):
+            if record is not None:
+                block.append(record)
+            elif len(block) > 0:
+                yield block
+                block = []
+
+        if len(block) > 0:
+            yield block
+        return
+
+    @staticmethod
+    def _undefined_references_error(
+        undefined_parents: Mapping[str, Sequence["GFFRecord"]],
+        undefined_derives_froms: Mapping[str, Sequence["GFFRecord"]],
+        where: str,
+        line: int,
+    ) -> ParseError:
+        upar = set(undefined_parents.keys())
+        uder = set(undefined_derives_froms.keys())
+
+        message = [f"Reached {where} with undefined references."]
+
+        if len(upar) > 0:
+            message.append(f"Expected to find parent: {repr(upar)}.")
+
+        if len(uder) > 0:
+            message.append(f"Expected to find derives_from: {repr(uder)}.")
+
+        return ParseError(filename=None, line=line, message=" ".join(message))
+
+    @classmethod  # noqa
+    def _records_from_file(
+        cls,
+        handle: TextIO,
+        strip_quote: bool = False,
+        unescape: bool = True,
+        stream: bool = False,
+    ) -> Iterator[Optional["GFFRecord"]]:
         """
         Yes yes I need to make this more modular... not time right now.
+
+        In stream mode, yields None at each point where the previous
+        records are forgotten.
         """
 
         from collections import defaultdict
@@ -1174,19 +1539,57 @@ class GFFRecord(object):
         # derivatives encountered before their parents.
         undefined_derives_froms: dict[str, list[GFFRecord]] = defaultdict(list)
 
+        last_seqid: Optional[str] = None
+
         # Avoid possible case of unbound i
         i: int = 0
         for i, line in enumerate(handle):
-            if line.startswith("#"):
+            if stream and line.startswith("###"):
+                where = "a '###' directive"
+                is_boundary = True
+            elif line.startswith("#"):
                 continue
             elif line.strip() == "":
                 continue
+            else:
+                where = "a new seqid"
+                is_boundary = False
 
             try:
-                record = GFFRecord.parse(line, strip_quote, unescape)
+                record = None if is_boundary else GFFRecord.parse(
+                    line,
+                    strip_quote,
+                    unescape
+                )
             except (LineParseError, FieldParseError) as e:
                 raise e.as_parse_error(line=i).add_filename_from_handle(handle)
 
+            if stream and (
+                is_boundary or
+                ((last_seqid is not None) and (record.seqid != last_seqid))
+            ):
+                if (
+                    (len(undefined_parents) > 0) or
+                    (len(undefined_derives_froms) > 0)
+                ):
+                    raise (
+                        cls._undefined_references_error(
+                            undefined_parents,
+                            undefined_derives_froms,
+                            where,
+                            i
+                        )
+                        .add_filename_from_handle(handle)
+                    )
+
+                id_to_record.clear()
+                last_seqid = None
+                yield None
+
+            if record is None:
+                continue
+
+            last_seqid = record.seqid
             id_ = record.attributes.id
 
             if id_ is not None:
@@ -1207,8 +1610,9 @@ class GFFRecord(object):
                     if r not in lonely_children:
                         to_yield.append(r)
 
+            # _peek avoids allocating empty lists for every record.
             is_missing_parent = False
-            for parent in record.attributes.parent:
+            for parent in record.attributes._peek("Parent") or []:
                 if parent not in id_to_record:
                     undefined_parents[parent].append(record)
                     lonely_children.add(record)
@@ -1217,7 +1621,7 @@ class GFFRecord(object):
                     record.add_parents(id_to_record.get(parent, []))
 
             is_missing_derives_from = False
-            for derives_from in record.attributes.derives_from:
+            for derives_from in record.attributes._peek("Derives_from") or []:
                 if derives_from not in id_to_record:
                     undefined_derives_froms[derives_from].append(record)
                     lonely_derivatives.add(record)
@@ -1233,21 +1637,217 @@ class GFFRecord(object):
                 yield to_yield.pop()
 
         if (len(undefined_parents) > 0) or (len(undefined_derives_froms) > 0):
-            upar = set(undefined_parents.keys())
-            uder = set(undefined_derives_froms.keys())
+            raise (
+                cls._undefined_references_error(
+                    undefined_parents,
+                    undefined_derives_froms,
+                    "the end of GFF file",
+                    i
+                )
+                .add_filename_from_handle(handle)
+            )
+        return
 
-            message = [
-                "Reached the end of GFF file with undefined references."
-            ]
 
-            if len(upar) > 0:
-                message.append(f"Expected to find parent: {repr(upar)}.")
+def copy_records(records: Sequence[GFFRecord]) -> list[GFFRecord]:
+    """ Copies records and the links between them.
 
-            if len(uder) > 0:
-                message.append(f"Expected to find derives_from: {repr(uder)}.")
+    This is like deepcopy(records) but links to records that aren't in
+    the sequence are dropped, rather than copying everything that they
+    are linked to.
+    """
 
-            raise (
-                ParseError(filename=None, line=i, message=" ".join(message))
-                .add_filename_from_handle(handle)
-            )
+    from copy import copy
+
+    clones = {r: copy(r) for r in records}
+
+    def relink(
+        related: Optional[dict[GFFRecord, None]]
+    ) -> Optional[dict[GFFRecord, None]]:
+        if related is None:
+            return None
+        return {clones[r]: None for r in related if r in clones} or None
+
+    for record, clone in clones.items():
+        clone.attributes = record.attributes.copy()
+        clone._parents = relink(record._parents)
+        clone._children = relink(record._children)
+        clone._derives_from = relink(record._derives_from)
+        clone._derivatives = relink(record._derivatives)
+
+    return [clones[r] for r in records]
+
+
+# The columns of each record, followed by the (parent, child) and
+# (derives_from, derivative) links between them as list indices.
+PackedRecords = tuple[
+    list[RecordFields],
+    list[tuple[int, int]],
+    list[tuple[int, int]]
+]
+
+
+def pack_records(records: Sequence[GFFRecord]) -> PackedRecords:
+    """ Converts records into a form that is cheap to send to
+    another process.
+
+    Links between the records are kept, but links to records that
+    aren't in the sequence are dropped.
+    """
+
+    index = {r: i for i, r in enumerate(records)}
+    fields = [r.as_fields() for r in records]
+
+    parents = [
+        (index[p], i)
+        for i, r in enumerate(records)
+        for p in r.parents
+        if p in index
+    ]
+
+    derives_froms = [
+        (index[d], i)
+        for i, r in enumerate(records)
+        for d in r.derives_from
+        if d in index
+    ]
+    return fields, parents, derives_froms
+
+
+def unpack_records(packed: PackedRecords) -> list[GFFRecord]:
+    """ Rebuilds the linked records from pack_records. """
+
+    fields, parents, derives_froms = packed
+    records = [GFFRecord.from_fields(f) for f in fields]
+
+    for i, j in parents:
+        records[i].add_child(records[j])
+
+    for i, j in derives_froms:
+        records[i].add_derivative(records[j])
+
+    return records
+
+
+BlockKey = tuple[str, int, int, str]
+
+
+def block_key(record: GFFRecord) -> BlockKey:
+    """ The order that top-level features are written in. """
+    return (record.seqid, record.start, record.end, record.type)
+
+
+def write_blocks(
+    blocks: Iterable[str],
+    handle: TextIO,
+    buffer_size: int = 1 << 20,
+) -> None:
+    """ Writes blocks of GFF lines, joining them into large writes.
+
+    buffer_size is the approximate number of characters to write at once.
+    """
+
+    buf: list[str] = []
+    size = 0
+    for block in blocks:
+        buf.append(block)
+        size += len(block) + 1
+
+        if size >= buffer_size:
+            buf.append("")
+            handle.write("\n".join(buf))
+            buf = []
+            size = 0
+
+    if len(buf) > 0:
+        buf.append("")
+        handle.write("\n".join(buf))
+    return
+
+
+class BlockSorter(object):
+
+    """ Sorts blocks of formatted GFF lines using temporary files.
+
+    Blocks are held in memory until there are chunk_size of them,
+    and then they are sorted and written to a temporary file.
+    Iterating over the sorter merges the files, so only one line from
+    each file needs to be in memory at a time.
+    Blocks with the same key keep the order that they were added in.
+    """
+
+    def __init__(self, chunk_size: int = 50000) -> None:
+        self.chunk_size = chunk_size
+        self.buffer: list[tuple[BlockKey, str]] = []
+        self.runs: list[TextIO] = []
+        return
+
+    def __enter__(self) -> "BlockSorter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+        return
+
+    def close(self) -> None:
+        for run in self.runs:
+            run.close()
+
+        self.runs = []
+        self.buffer = []
+        return
+
+    def add(self, key: BlockKey, block: str) -> None:
+        self.buffer.append((key, block))
+
+        if len(self.buffer) >= self.chunk_size:
+            self._spill()
+        return
+
+    def _spill(self) -> None:
+        from tempfile import TemporaryFile
+
+        run = cast(TextIO, TemporaryFile(mode="w+"))
+        self.buffer.sort(key=itemgetter(0))
+
+        # Blocks have multiple lines, so the number of lines is stored
+        # alongside the key.
+        for (seqid, start, end, type_), block in self.buffer:
+            nlines = block.count("\n") + 1
+            run.write(f"{seqid}\t{start}\t{end}\t{type_}\t{nlines}\n")
+            run.write(block + "\n")
+
+        run.seek(0)
+        self.runs.append(run)
+        self.buffer = []
+        return
+
+    @staticmethod
+    def _read_run(run: TextIO) -> Iterator[tuple[BlockKey, str]]:
+        for header in run:
+            seqid, start, end, type_, nlines = header.rstrip("\n").split("\t")
+            block = "".join(run.readline() for _ in range(int(nlines)))
+            yield (seqid, int(start), int(end), type_), block[:-1]
+        return
+
+    def __iter__(self) -> Iterator[str]:
+        """ Yields the blocks in order. """
+
+        if len(self.runs) == 0:
+            self.buffer.sort(key=itemgetter(0))
+            for _, block in self.buffer:
+                yield block
+            return
+
+        if len(self.buffer) > 0:
+            self._spill()
+
+        from heapq import merge
+        merged = merge(
+            *(self._read_run(run) for run in self.runs),
+            key=itemgetter(0)
+        )
+
+        for _, block in merged:
+            yield block
         return
@@ -3,6 +3,8 @@
 from typing import TypeVar
 from typing import Callable
 from typing import Optional, Union
+from collections.abc import Iterable, Iterator
+from itertools import islice
 
 
 T = TypeVar("T")
@@ -34,3 +36,14 @@ def or_else(default: U, option: Optional[T]) -> Union[T, U]:
         return default
     else:
         return option
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """ Splits an iterable into lists of at most size elements. """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if len(chunk) == 0:
+            break
+        yield chunk
+    return
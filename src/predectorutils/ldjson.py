@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+""" Reading and writing line delimited JSON.
+
+If orjson is installed it is used instead of the json module, because it
+is much faster.
+Set the PREDUTILS_JSON environment variable to "json" to always use the
+json module.
+
+The two don't write exactly the same text for the same object, e.g. orjson
+doesn't escape non-ASCII characters and is always compact.
+So anything that gets checksummed must use the json module directly.
+"""
+
+import os
+import json
+
+from math import isfinite
+from typing import Any, TextIO
+from collections.abc import Iterable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKEND_ENV = "PREDUTILS_JSON"
+USE_ORJSON = (orjson is not None) and (os.environ.get(BACKEND_ENV) != "json")
+
+
+def has_nonfinite(obj: Any) -> bool:
+    """ Checks if an object contains any NaN or infinite floats. """
+    if type(obj) is float:
+        return not isfinite(obj)
+    elif type(obj) is dict:
+        return any(has_nonfinite(v) for v in obj.values())
+    elif type(obj) in (list, tuple):
+        return any(has_nonfinite(v) for v in obj)
+    else:
+        return False
+
+
+def dumps(obj: Any, compact: bool = True) -> str:
+    """ Serialises an object to JSON.
+
+    If compact is False and the json module is used, the default
+    separators with spaces are used.
+    """
+
+    if USE_ORJSON:
+        try:
+            out = orjson.dumps(obj).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers that don't fit in 64 bits.
+            pass
+        else:
+            # orjson writes NaN and infinity as null, but the json module
+            # keeps them.
+            if ("null" not in out) or not has_nonfinite(obj):
+                return out
+
+        # Keep the same layout as the rest of the orjson output.
+        compact = True
+
+    if compact:
+        return json.dumps(obj, separators=(',', ':'))
+    else:
+        return json.dumps(obj)
+
+
+def loads(s: str) -> Any:
+    if USE_ORJSON:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # The json module also accepts NaN and Infinity, and gives
+            # the usual error messages otherwise.
+            pass
+
+    return json.loads(s)
+
+
+def set_field(obj: str, key: str, value: Any) -> str:
+    """ Sets a key at the top level of a serialised JSON object. """
+    decoded = loads(obj)
+    decoded[key] = value
+    return dumps(decoded)
+
+
+def write_lines(
+    lines: Iterable[str],
+    handle: TextIO,
+    buffer_size: int = 1 << 20,
+) -> int:
+    """ Writes JSON lines, joining them into large writes.
+
+    buffer_size is the approximate number of characters to write at once.
+    Returns the number of lines written.
+    """
+
+    buf: list[str] = []
+    size = 0
+    nlines = 0
+    for line in lines:
+        buf.append(line)
+        nlines += 1
+        size += len(line) + 1
+
+        if size >= buffer_size:
+            buf.append("")
+            handle.write("\n".join(buf))
+            buf = []
+            size = 0
+
+    if len(buf) > 0:
+        buf.append("")
+        handle.write("\n".join(buf))
+    return nlines
@@ -1,59 +1,15 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import traceback
 import argparse
 from os.path import realpath
+from types import ModuleType
+from typing import NamedTuple, Optional
+from importlib import import_module
 
 from predectorutils import __version__, __email__
-from predectorutils.subcommands.r2js import cli as r2js_cli
-from predectorutils.subcommands.r2js import runner as r2js_runner
-
-from predectorutils.subcommands.encode import cli as encode_cli
-from predectorutils.subcommands.encode import runner as encode_runner
-
-from predectorutils.subcommands.split_fasta import cli as split_fasta_cli
-from predectorutils.subcommands.split_fasta import runner as split_fasta_runner
-
-from predectorutils.subcommands.analysis_tables import cli as tables_cli
-from predectorutils.subcommands.analysis_tables import runner as tables_runner
-
-from predectorutils.subcommands.gff import cli as gff_cli
-from predectorutils.subcommands.gff import runner as gff_runner
-
-from predectorutils.subcommands.rank import cli as rank_cli
-from predectorutils.subcommands.rank import runner as rank_runner
-
-from predectorutils.subcommands.decode import cli as decode_cli
-from predectorutils.subcommands.decode import runner as decode_runner
-
-from predectorutils.subcommands.regex import cli as regex_cli
-from predectorutils.subcommands.regex import runner as regex_runner
-
-from predectorutils.subcommands.precomputed import cli as precomp_cli
-from predectorutils.subcommands.precomputed import runner as precomp_runner
-
-from predectorutils.subcommands.load_db import cli as load_db_cli
-from predectorutils.subcommands.load_db import runner as load_db_runner
-
-from predectorutils.subcommands.dump_db import cli as dump_db_cli
-from predectorutils.subcommands.dump_db import runner as dump_db_runner
-
-from predectorutils.subcommands.map_to_genome import cli as mtg_cli
-from predectorutils.subcommands.map_to_genome import runner as mtg_runner
-
-from predectorutils.subcommands.scores_to_genome import cli as stg_cli
-from predectorutils.subcommands.scores_to_genome import runner as stg_runner
-
-from predectorutils.subcommands.ipr_to_gff import cli as ipr_cli
-from predectorutils.subcommands.ipr_to_gff import runner as ipr_runner
-
-from predectorutils.subcommands.prot_to_genome import cli as ptg_cli
-from predectorutils.subcommands.prot_to_genome import runner as ptg_runner
-
-from predectorutils.subcommands.getorf_to_gff import cli as getorf_cli
-from predectorutils.subcommands.getorf_to_gff import runner as getorf_runner
-
 from predectorutils.parsers import ParseError
 from predectorutils.exceptions import (
     EXIT_VALID, EXIT_KEYBOARD, EXIT_UNKNOWN, EXIT_CLI, EXIT_INPUT_FORMAT,
@@ -84,6 +40,117 @@ class MyArgumentError(Exception):
         return
 
 
+class Subcommand(NamedTuple):
+
+    module: str
+    help: str
+
+
+SUBCOMMANDS: dict[str, Subcommand] = {
+    "r2js": Subcommand(
+        "r2js",
+        "Parse the result of some analysis as a common line-delimited "
+        "json format."
+    ),
+    "r2js_batch": Subcommand(
+        "r2js_batch",
+        "Parse the results of many analyses of the same fasta file as "
+        "line-delimited json."
+    ),
+    "encode": Subcommand(
+        "encode",
+        "Remove duplicate sequences and give them new names."
+    ),
+    "split_fasta": Subcommand(
+        "split_fasta",
+        "Split a fasta file into chunks."
+    ),
+    "tables": Subcommand(
+        "analysis_tables",
+        "Split line-delimited json into tsvs for each analysis."
+    ),
+    "gff": Subcommand(
+        "gff",
+        "Write analyses with location information as a GFF3 file."
+    ),
+    "rank": Subcommand(
+        "rank",
+        "Rank effector candidates."
+    ),
+    "decode": Subcommand(
+        "decode",
+        "Decode and reduplicate encoded names."
+    ),
+    "regex": Subcommand(
+        "regex",
+        "Search for a regular expression in sequences."
+    ),
+    "precomputed": Subcommand(
+        "precomputed",
+        "Fetch precomputed results and output remaining sequences."
+    ),
+    "load_db": Subcommand(
+        "load_db",
+        "Load ldjson results into an SQlite database."
+    ),
+    "dump_db": Subcommand(
+        "dump_db",
+        "Dump an SQLite database into ldjson results."
+    ),
+    "migrate_db": Subcommand(
+        "migrate_db",
+        "Convert an SQLite database to store results in typed columns."
+    ),
+    "map_to_genome": Subcommand(
+        "map_to_genome",
+        "Map predector GFF3 results to genome coordinates."
+    ),
+    "scores_to_genome": Subcommand(
+        "scores_to_genome",
+        "Map predector scores results to a genome bedgraph."
+    ),
+    "ipr_to_gff": Subcommand(
+        "ipr_to_gff",
+        "Get a protein GFF3 file from InterProscan XML results."
+    ),
+    "prot_to_genome": Subcommand(
+        "prot_to_genome",
+        "Get a protein GFF3 file into genomic coordinates."
+    ),
+    "getorf_to_gff": Subcommand(
+        "getorf_to_gff",
+        "Map predector scores results to a genome bedgraph."
+    ),
+    "serve": Subcommand(
+        "serve",
+        "Run commands in a long-running process to avoid startup costs."
+    ),
+}
+
+# If this is set, commands are run by the `predutils serve` process
+# listening on this socket.
+SOCKET_ENV = "PREDUTILS_SOCKET"
+
+
+def import_subcommand(name: str) -> ModuleType:
+    """ Imports the module with the cli and runner for a subcommand. """
+    module = SUBCOMMANDS[name].module
+    return import_module(f"predectorutils.subcommands.{module}")
+
+
+def selected_subcommand(args: list[str]) -> Optional[str]:
+    """ Finds the subcommand in the arguments without parsing them.
+
+    The main parser only has flags that don't take values, so the
+    subcommand is the first argument that isn't a flag.
+    """
+
+    for arg in args:
+        if not arg.startswith("-"):
+            return arg if arg in SUBCOMMANDS else None
+    return None
+
+
 def cli(prog: str, args: list[str]) -> argparse.Namespace:
     parser = MyArgumentParser(
         prog=prog,
@@ -111,161 +178,49 @@ def cli(prog: str, args: list[str]) -> argparse.Namespace:
     )
 
     subparsers = parser.add_subparsers(dest="subparser_name")
-    r2js_subparser = subparsers.add_parser(
-        "r2js",
-        help=(
-            "Parse the result of some analysis as a common line-delimited "
-            "json format."
-        )
-    )
-
-    r2js_cli(r2js_subparser)
-
-    encode_subparser = subparsers.add_parser(
-        "encode",
-        help=(
-            "Remove duplicate sequences and give them new names."
-        )
-    )
-
-    encode_cli(encode_subparser)
-
-    split_fasta_subparser = subparsers.add_parser(
-        "split_fasta",
-        help=(
-            "Split a fasta file into chunks."
-        )
-    )
-
-    split_fasta_cli(split_fasta_subparser)
-
-    tables_subparser = subparsers.add_parser(
-        "tables",
-        help=(
-            "Split line-delimited json into tsvs for each analysis."
-        )
-    )
-
-    tables_cli(tables_subparser)
-
-    gff_subparser = subparsers.add_parser(
-        "gff",
-        help=(
-            "Write analyses with location information as a GFF3 file."
-        )
-    )
-
-    gff_cli(gff_subparser)
-
-    rank_subparser = subparsers.add_parser(
-        "rank",
-        help=(
-            "Rank effector candidates."
-        )
-    )
-
-    rank_cli(rank_subparser)
-
-    decode_subparser = subparsers.add_parser(
-        "decode",
-        help=(
-            "Decode and reduplicate encoded names."
-        )
-    )
-
-    decode_cli(decode_subparser)
-
-    regex_subparser = subparsers.add_parser(
-        "regex",
-        help=(
-            "Search for a regular expression in sequences."
-        )
-    )
-
-    regex_cli(regex_subparser)
-
-    precomp_subparser = subparsers.add_parser(
-        "precomputed",
-        help=(
-            "Fetch precomputed results and output remaining sequences."
-        )
-    )
-
-    precomp_cli(precomp_subparser)
-
-    load_db_subparser = subparsers.add_parser(
-        "load_db",
-        help=(
-            "Load ldjson results into an SQlite database."
-        )
-    )
-
-    load_db_cli(load_db_subparser)
 
-    dump_db_subparser = subparsers.add_parser(
-        "dump_db",
-        help=(
-            "Dump an SQLite database into ldjson results."
-        )
-    )
+    # Only the selected subcommand is imported, because some of them
+    # take a long time to import (e.g. pandas and xgboost).
+    selected = selected_subcommand(args)
+    for name, subcommand in SUBCOMMANDS.items():
+        subparser = subparsers.add_parser(name, help=subcommand.help)
 
-    dump_db_cli(dump_db_subparser)
+        if name == selected:
+            import_subcommand(name).cli(subparser)
 
-    mtg_subparser = subparsers.add_parser(
-        "map_to_genome",
-        help=(
-            "Map predector GFF3 results to genome coordinates."
-        )
-    )
+    parsed = parser.parse_args(args)
 
-    mtg_cli(mtg_subparser)
+    if parsed.subparser_name is None:
+        parser.print_help()
+        sys.exit(0)
 
-    stg_subparser = subparsers.add_parser(
-        "scores_to_genome",
-        help=(
-            "Map predector scores results to a genome bedgraph."
-        )
-    )
+    return parsed
 
-    stg_cli(stg_subparser)
 
-    ipr_subparser = subparsers.add_parser(
-        "ipr_to_gff",
-        help=(
-            "Get a protein GFF3 file from InterProscan XML results."
-        )
-    )
+def forward_to_server(argv: list[str]) -> None:
+    """ Runs the command in a `predutils serve` process if there is one.
 
-    ipr_cli(ipr_subparser)
+    This exits with the exit code of the command if the server ran it.
+    """
 
-    ptg_subparser = subparsers.add_parser(
-        "prot_to_genome",
-        help=(
-            "Get a protein GFF3 file into genomic coordinates."
-        )
-    )
-
-    ptg_cli(ptg_subparser)
-
-    getorf_subparser = subparsers.add_parser(
-        "getorf_to_gff",
-        help=(
-            "Map predector scores results to a genome bedgraph."
-        )
-    )
-
-    getorf_cli(getorf_subparser)
+    path = os.environ.get(SOCKET_ENV)
+    if (path is None) or (path == ""):
+        return
 
-    parsed = parser.parse_args(args)
+    if selected_subcommand(argv[1:]) in (None, "serve"):
+        return
 
-    if parsed.subparser_name is None:
-        parser.print_help()
-        sys.exit(0)
+    from predectorutils.subcommands.serve import forward
+    code = forward(path, argv)
 
-    return parsed
+    if code is not None:
+        sys.exit(code)
+    return
 
 
 def main():  # noqa
+    forward_to_server(sys.argv)
+
     try:
         args = cli(prog=sys.argv[0], args=sys.argv[1:])
     except MyArgumentError as e:
@@ -273,38 +228,7 @@ def main():  # noqa
         sys.exit(e.errno)
 
     try:
-        if args.subparser_name == "r2js":
-            r2js_runner(args)
-        elif args.subparser_name == "encode":
-            encode_runner(args)
-        elif args.subparser_name == "split_fasta":
-            split_fasta_runner(args)
-        elif args.subparser_name == "tables":
-            tables_runner(args)
-        elif args.subparser_name == "gff":
-            gff_runner(args)
-        elif args.subparser_name == "rank":
-            rank_runner(args)
-        elif args.subparser_name == "decode":
-            decode_runner(args)
-        elif args.subparser_name == "regex":
-            regex_runner(args)
-        elif args.subparser_name == "precomputed":
-            precomp_runner(args)
-        elif args.subparser_name == "load_db":
-            load_db_runner(args)
-        elif args.subparser_name == "dump_db":
-            dump_db_runner(args)
-        elif args.subparser_name == "map_to_genome":
-            mtg_runner(args)
-        elif args.subparser_name == "scores_to_genome":
-            stg_runner(args)
-        elif args.subparser_name == "ipr_to_gff":
-            ipr_runner(args)
-        elif args.subparser_name == "prot_to_genome":
-            ptg_runner(args)
-        elif args.subparser_name == "getorf_to_gff":
-            getorf_runner(args)
+        import_subcommand(args.subparser_name).runner(args)
 
     except ParseError as e:
         if e.line is not None:
@@ -7,8 +7,7 @@ from collections.abc import Iterator
 
 import sqlite3
 
-import pandas as pd
-
+from ..higher import chunked
 from ..database import (
     load_db,
     ResultsTable,
@@ -35,6 +34,13 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="The number of records to convert and write at a time."
+    )
+
     parser.add_argument(
         "--mem",
         type=float,
@@ -132,14 +138,37 @@ def inner(
             seen.add(target.analysis)
 
         records = select_target(tab, target, checksums=False)
-        df = pd.DataFrame(map(lambda x: x.as_analysis().as_series(), records))
 
         fname = args.template.format(analysis=str(target.analysis))
         dname = os.path.dirname(fname)
         if dname != '':
             os.makedirs(dname, exist_ok=True)
 
-        df.to_csv(fname, sep="\t", index=False, na_rep=".")
+        analysis = target.analysis.get_analysis()
+        with open(fname, "w") as handle:
+            header = True
+            for chunk in chunked(records, args.batch_size):
+                df = analysis.batch_from_dicts(
+                    r.as_dict()["data"]
+                    for r
+                    in chunk
+                )
+                df.to_csv(
+                    handle,
+                    sep="\t",
+                    index=False,
+                    header=header,
+                    na_rep="."
+                )
+                header = False
+
+            if header:
+                analysis.batch_from_dicts([]).to_csv(
+                    handle,
+                    sep="\t",
+                    index=False,
+                    na_rep="."
+                )
 
 
 def runner(args: argparse.Namespace) -> None:
@@ -15,6 +15,7 @@ from ..database import (
     ResultRow,
     DecoderRow
 )
+from .. import ldjson
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -62,15 +63,7 @@ def write_results(
     handle: TextIO,
     results: Iterator[ResultRow],
 ) -> None:
-    buf = []
-    for line in results:
-        buf.append(line.as_str())
-        if len(buf) > 10000:
-            print("\n".join(buf), file=handle)
-            buf = []
-
-    if len(buf) > 0:
-        print("\n".join(buf), file=handle)
+    ldjson.write_lines((r.as_str() for r in results), handle)
     return
 
 
@@ -5,6 +5,7 @@ import sqlite3
 import sys
 
 from ..database import load_db, ResultsTable
+from .. import ldjson
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -41,8 +42,10 @@ def inner(
 ) -> None:
     tab = ResultsTable(con, cur)
 
-    for row in tab.select_all():
-        print(row.as_str(), file=args.outfile)
+    ldjson.write_lines(
+        (row.as_str() for row in tab.select_all()),
+        args.outfile
+    )
     return
 
 
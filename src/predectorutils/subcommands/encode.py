@@ -1,19 +1,25 @@
 #!/usr/bin/env python3
 
+import os
 from os.path import split as psplit
 
 import re
 import argparse
-import hashlib
 
 from typing import NamedTuple
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, Future
 
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
-from Bio.SeqUtils.CheckSum import seguid
+from Bio.SeqIO.FastaIO import SimpleFastaParser
 
 from ..baseconv import IdConverter
+from ..checksum_cache import (
+    ChecksumRow,
+    sequence_checksums,
+    write_checksum_cache,
+    real_path
+)
 
 
 INVALID_CHARS = re.compile(r"[^A-Z]", flags=re.ASCII | re.IGNORECASE)
@@ -54,6 +60,55 @@ def cli(parser: argparse.ArgumentParser) -> None:
         help="The prefix to add to the beginning of the ids.",
     )
 
+    parser.add_argument(
+        "-j", "--jobs",
+        default=1,
+        type=int,
+        help=(
+            "The number of processes to use for cleaning and "
+            "checksumming sequences. Default: 1"
+        )
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        default=10000,
+        type=int,
+        help="The number of sequences to send to each process at a time."
+    )
+
+    parser.add_argument(
+        "--shard-size",
+        default=None,
+        type=int,
+        help=(
+            "Also split the deduplicated sequences into fasta files with "
+            "at most this many sequences each."
+        )
+    )
+
+    parser.add_argument(
+        "--shard-template",
+        default="{fname}.split/chunk{index:0>4}.fasta",
+        type=str,
+        help=(
+            "Where to put the sharded fasta files. "
+            "Can use the variables fname (the output fasta filename) and "
+            "index (the shard number starting at 1). Will create directories."
+        )
+    )
+
+    parser.add_argument(
+        "--no-checksum-cache",
+        dest="checksum_cache",
+        action="store_false",
+        default=True,
+        help=(
+            "Don't write the checksums of the output fasta to a "
+            "'.checksums' file alongside it."
+        )
+    )
+
     return
 
 
@@ -66,20 +121,128 @@ class TableLine(NamedTuple):
     md5sum: str
 
 
-def get_checksum(seq: SeqRecord) -> tuple[str, str]:
-    checksum = seguid(str(seq.seq))
-    return seq.id, checksum
+# Uppercases sequences, removes gaps, and replaces stop codons and
+# redundant/non-standard amino acids with X.
+TRANSLATION = str.maketrans(
+    {
+        **{c: c.upper() for c in "abcdefghijklmnopqrstuvwxyz"},
+        **{c: "X" for c in "*JBZUOjbzuo"},
+        "-": None,
+        ".": None,
+    }
+)
 
 
-def get_md5sum(seq: SeqRecord) -> tuple[str, str]:
-    md = hashlib.md5(str(seq.seq).encode()).hexdigest()
-    return seq.id, md
+def fix_sequence(seq: str) -> str:
+    # Gaps are deleted by the translation, so they're stripped along with
+    # trailing stops to remove stops that were followed by gaps.
+    return seq.rstrip("*-.").translate(TRANSLATION)
 
 
 def format_table_line(t: TableLine) -> str:
     return f"{t.encoded}\t{t.filename}\t{t.id}\t{t.checksum}\t{t.md5sum}"
 
 
+def format_fasta(id_: str, seq: str, width: int = 60) -> str:
+    lines = [f">{id_}"]
+    lines.extend(seq[i: i + width] for i in range(0, len(seq), width))
+    return "\n".join(lines)
+
+
+def normalise_chunk(
+    chunk: list[tuple[str, str]]
+) -> list[tuple[str, str, str, str]]:
+    """ Fixes and hashes a chunk of (id, sequence) pairs.
+
+    Returns tuples of (id, fixed sequence, checksum, md5sum).
+    """
+    out = []
+    for id_, seq in chunk:
+        fixed_seq = fix_sequence(seq)
+
+        if INVALID_CHARS.match(fixed_seq) is not None:
+            raise ValueError(
+                f"The sequence {id_} contains invalid characters."
+            )
+
+        checksum, md5sum = sequence_checksums(fixed_seq)
+        out.append((id_, fixed_seq, checksum, md5sum))
+    return out
+
+
+def chunk_fasta(
+    infiles: list[str],
+    chunk_size: int
+) -> Iterator[tuple[str, list[tuple[str, str]]]]:
+    """ Reads (id, sequence) pairs in chunks, with the chunk filename. """
+    for infile in infiles:
+        filename = psplit(infile)[1]
+        chunk: list[tuple[str, str]] = []
+
+        with open(infile, "r") as handle:
+            for title, seq in SimpleFastaParser(handle):
+                id_ = title.split(None, 1)[0] if title.strip() else ""
+                chunk.append((id_, seq))
+
+                if len(chunk) >= chunk_size:
+                    yield filename, chunk
+                    chunk = []
+
+        if len(chunk) > 0:
+            yield filename, chunk
+    return
+
+
+def normalised_records(
+    infiles: list[str],
+    jobs: int = 1,
+    chunk_size: int = 10000
+) -> Iterator[tuple[str, str, str, str, str]]:
+    """ Yields (filename, id, fixed sequence, checksum, md5sum) tuples.
+
+    Records are yielded in the same order as the input files.
+    If jobs is greater than 1 the chunks are processed by a pool of
+    processes, with only a few chunks per process held in memory.
+    """
+
+    if jobs <= 1:
+        for filename, chunk in chunk_fasta(infiles, chunk_size):
+            for record in normalise_chunk(chunk):
+                yield (filename, *record)
+        return
+
+    pending: deque[tuple[str, Future[list[tuple[str, str, str, str]]]]] = (
+        deque()
+    )
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for filename, chunk in chunk_fasta(infiles, chunk_size):
+            pending.append((filename, executor.submit(normalise_chunk, chunk)))
+
+            if len(pending) >= (2 * jobs):
+                filename, future = pending.popleft()
+                for record in future.result():
+                    yield (filename, *record)
+
+        while len(pending) > 0:
+            filename, future = pending.popleft()
+            for record in future.result():
+                yield (filename, *record)
+    return
+
+
+def write_shard(chunk: list[str], template: str, fname: str, index: int):
+    shard = template.format(fname=fname, index=index)
+    dname = os.path.dirname(shard)
+
+    if dname not in ('', '.'):
+        os.makedirs(dname, exist_ok=True)
+
+    with open(shard, "w") as handle:
+        handle.write('\n'.join(chunk) + '\n')
+    return
+
+
 def runner(args: argparse.Namespace) -> None:
     checksums: dict[str, str] = dict()
     id_conv = IdConverter(prefix=args.prefix, length=args.length)
@@ -88,60 +251,60 @@ def runner(args: argparse.Namespace) -> None:
     j = 1
     seq_chunk = list()
     tab_chunk = list()
-    for infile in args.infiles:
-
-        seqs = SeqIO.parse(infile, "fasta")
-        for seq in seqs:
-            fixed_seq = (
-                str(seq.seq)
-                .replace("-", "")
-                .replace(".", "")
-                .rstrip("*")
-                .upper()
-                .replace("*", "X")
-                .replace("J", "X")
-                .replace("B", "X")
-                .replace("Z", "X")
-                .replace("U", "X")
-                .replace("O", "X")
-            )
 
-            if INVALID_CHARS.match(fixed_seq) is not None:
-                raise ValueError(
-                    f"The sequence {seq.id} contains invalid characters."
-                )
+    shard_index = 1
+    shard_chunk = list()
 
-            seq.seq = Seq(fixed_seq)
+    # The checksums of the output fasta, so that other subcommands
+    # don't need to recompute them.
+    cache_rows: list[ChecksumRow] = []
 
-            id_, checksum = get_checksum(seq)
-            if checksum in checksums:
-                encoded = checksums[checksum]
-                new_seq = False
-            else:
-                encoded = id_conv.encode(i)
-                checksums[checksum] = encoded
-                i += 1
-                new_seq = True
-
-            _, md5sum = get_md5sum(seq)
-
-            line = TableLine(encoded, psplit(infile)[1], id_, checksum, md5sum)
-            tab_chunk.append(format_table_line(line))
-
-            if new_seq:
-                seq.id = encoded
-                seq.name = encoded
-                seq.description = encoded
-
-                seq_chunk.append(seq.format("fasta").strip())
-
-            if j % 10000 == 0:
-                args.outfasta.write('\n'.join(seq_chunk) + '\n')
-                args.outmap.write('\n'.join(tab_chunk) + '\n')
-                seq_chunk = list()
-                tab_chunk = list()
+    records = normalised_records(
+        args.infiles,
+        jobs=args.jobs,
+        chunk_size=args.chunk_size
+    )
 
-            j += 1
+    for filename, id_, fixed_seq, checksum, md5sum in records:
+        if checksum in checksums:
+            encoded = checksums[checksum]
+            new_seq = False
+        else:
+            encoded = id_conv.encode(i)
+            checksums[checksum] = encoded
+            i += 1
+            new_seq = True
+
+        line = TableLine(encoded, filename, id_, checksum, md5sum)
+        tab_chunk.append(format_table_line(line))
+
+        if new_seq:
+            if args.checksum_cache:
+                cache_rows.append((encoded, checksum, md5sum))
+
+            formatted = format_fasta(encoded, fixed_seq)
+            seq_chunk.append(formatted)
+
+            if args.shard_size is not None:
+                shard_chunk.append(formatted)
+
+                if len(shard_chunk) >= args.shard_size:
+                    write_shard(
+                        shard_chunk,
+                        args.shard_template,
+                        args.outfasta.name,
+                        shard_index
+                    )
+                    shard_index += 1
+                    shard_chunk = list()
+
+        if j % 10000 == 0:
+            args.outfasta.write('\n'.join(seq_chunk) + '\n')
+            args.outmap.write('\n'.join(tab_chunk) + '\n')
+            seq_chunk = list()
+            tab_chunk = list()
+
+        j += 1
 
     if len(seq_chunk) > 0:
         args.outfasta.write('\n'.join(seq_chunk) + '\n')
@@ -149,5 +312,18 @@ def runner(args: argparse.Namespace) -> None:
     if len(tab_chunk) > 0:
         args.outmap.write('\n'.join(tab_chunk) + '\n')
 
+    if len(shard_chunk) > 0:
+        write_shard(
+            shard_chunk,
+            args.shard_template,
+            args.outfasta.name,
+            shard_index
+        )
+
+    args.outfasta.flush()
+    outfasta_path = real_path(args.outfasta)
+    if args.checksum_cache and (outfasta_path is not None):
+        write_checksum_cache(outfasta_path, cache_rows)
+
     print(len(checksums))
     return
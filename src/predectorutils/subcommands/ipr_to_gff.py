@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import re
 import sys
 import argparse
+from io import StringIO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
 from typing import NamedTuple
 from typing import TextIO
 from typing import Callable
@@ -22,6 +26,11 @@ from ..gff import (
 from ..higher import fmap
 
 NAMESPACE = "{http://www.ebi.ac.uk/interpro/resources/schemas/interproscan5}"
+CHUNK_SIZE = 1000
+
+PROTEIN_START_REGEX = re.compile(r"<(?:[\w.-]+:)?protein[\s>]")
+PROTEIN_END_REGEX = re.compile(r"</(?:[\w.-]+:)?protein\s*>")
+START_TAG_REGEX = re.compile(r"<([A-Za-z_][\w:.-]*)(?:\s[^>]*)?(?<!/)>")
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -47,6 +56,26 @@ def cli(parser: argparse.ArgumentParser) -> None:
         default=NAMESPACE,
         help="The XML dom namespace. This is mostly included for developers."
     )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "The number of processes to use for converting the proteins. "
+            "Default: 1"
+        )
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help=(
+            "With --jobs, the number of proteins to send to each process "
+            f"at a time. Default: {CHUNK_SIZE}"
+        )
+    )
     return
 
 
@@ -1354,7 +1383,7 @@ def printit(
     return inner
 
 
-def inner(  # noqa: C901
+def convert(  # noqa: C901
     infile: TextIO,
     outfile: TextIO,
     namespace: str,
@@ -1365,6 +1394,7 @@ def inner(  # noqa: C901
     )
     ips_version = None
     query_id = None
+    root = None
     printer = printit(outfile)
 
     while True:
@@ -1373,12 +1403,20 @@ def inner(  # noqa: C901
         except StopIteration:
             break
 
+        if root is None:
+            root = element
+
         tag = get_tag(element, namespace)
 
         if (event == "start") and (tag == "protein-matches"):
             ips_version = element.attrib["interproscan-version"]
         elif (tag == "protein"):
             query_id = None
+
+            # Everything in the protein has been handled by now, so we drop
+            # it to avoid keeping the whole document in memory.
+            if event == "end":
+                root.clear()
         elif (event == "start") and (tag == "xref"):
             query_id = element.attrib["id"]
         elif (event == "start") and (tag == "coils-match"):
@@ -1439,12 +1477,113 @@ def inner(  # noqa: C901
     return
 
 
+def split_proteins(
+    infile: TextIO,
+    chunk_size: int = CHUNK_SIZE,
+    read_size: int = 1 << 20,
+) -> Iterator[str]:
+    """ Splits the XML into documents with up to chunk_size proteins each.
+
+    Each document gets the text before the first protein (e.g. the
+    protein-matches element with the interproscan version), so that
+    they can be converted independently.
+    This just searches the text for the protein tags, so it doesn't need
+    to parse the whole file.
+    """
+
+    buf = ""
+    match = None
+    while match is None:
+        text = infile.read(read_size)
+        buf += text
+        match = PROTEIN_START_REGEX.search(buf)
+
+        if (match is None) and (text == ""):
+            return
+
+    assert match is not None
+    header = buf[:match.start()]
+    buf = buf[match.start():]
+
+    # Close the elements that were opened before the first protein.
+    footer = "".join(
+        f"</{tag}>"
+        for tag
+        in reversed(START_TAG_REGEX.findall(header))
+    )
+
+    pos = 0
+    nproteins = 0
+    while True:
+        match = PROTEIN_END_REGEX.search(buf, pos)
+
+        if match is None:
+            text = infile.read(read_size)
+            if text == "":
+                break
+
+            buf += text
+            continue
+
+        pos = match.end()
+        nproteins += 1
+
+        if nproteins >= chunk_size:
+            yield header + buf[:pos] + footer
+            buf = buf[pos:]
+            pos = 0
+            nproteins = 0
+
+    if nproteins > 0:
+        yield header + buf[:pos] + footer
+    return
+
+
+def convert_chunk(text: str, namespace: str) -> str:
+    outfile = StringIO()
+    convert(StringIO(text), outfile, namespace)
+    return outfile.getvalue()
+
+
+def inner(
+    infile: TextIO,
+    outfile: TextIO,
+    namespace: str,
+    jobs: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+):
+    """ Converts the XML to GFF.
+
+    If jobs is greater than 1, chunks of proteins are converted by a pool
+    of processes, and the output is written in the same order as the input.
+    """
+
+    if jobs <= 1:
+        convert(infile, outfile, namespace)
+        return
+
+    pending: deque[Future[str]] = deque()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for chunk in split_proteins(infile, chunk_size):
+            pending.append(executor.submit(convert_chunk, chunk, namespace))
+
+            if len(pending) >= (2 * jobs):
+                outfile.write(pending.popleft().result())
+
+        while len(pending) > 0:
+            outfile.write(pending.popleft().result())
+    return
+
+
 def runner(args: argparse.Namespace) -> None:
     try:
         inner(
             infile=args.xml,
             outfile=args.outfile,
             namespace=args.namespace,
+            jobs=args.jobs,
+            chunk_size=args.chunk_size,
         )
     except Exception as e:
         raise e
@@ -4,8 +4,15 @@ import argparse
 import sqlite3
 import sys
 
+from typing import Optional
+from typing import TextIO
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, Future
+
 from ..analyses import Analyses
 from ..database import load_db, ResultsTable, ResultRow
+from ..features import FeatureTable
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -50,6 +57,17 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "--trusted", "--no-validate",
+        dest="validate",
+        action="store_false",
+        default=True,
+        help=(
+            "Don't check the types of the results before loading them. "
+            "Only use this for unmodified output from `predutils r2js`."
+        )
+    )
+
     parser.add_argument(
         "--mem",
         type=float,
@@ -60,6 +78,61 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "The number of processes to use for parsing and validating "
+            "the input records. The database is always written to by a "
+            "single process."
+        )
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        dest="chunk_size",
+        type=int,
+        default=50000,
+        help="The number of lines to send to each parsing process at a time."
+    )
+
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        default=False,
+        help=(
+            "Load records into unconstrained staging tables and remove "
+            "duplicates in a single step at the end. "
+            "This is much faster for large inputs, but uses more disk "
+            "space while loading."
+        )
+    )
+
+    parser.add_argument(
+        "--features",
+        action="store_true",
+        default=False,
+        help=(
+            "Compute the per-protein features used by `predutils rank` "
+            "and store them in the database, so that ranking doesn't "
+            "need to aggregate the raw results. If the database already "
+            "has a features table, it is always updated."
+        )
+    )
+
+    parser.add_argument(
+        "--typed",
+        action="store_true",
+        default=False,
+        help=(
+            "Store the results for any new analyses in typed columns "
+            "rather than as JSON text. This makes the database smaller. "
+            "Existing tables are not changed, use `predutils migrate_db` "
+            "to convert them."
+        )
+    )
+
     parser.add_argument(
         "db",
         type=str,
@@ -76,29 +149,158 @@ def cli(parser: argparse.ArgumentParser) -> None:
     return
 
 
+def chunk_lines(handle: TextIO, chunk_size: int) -> Iterator[list[str]]:
+    chunk: list[str] = []
+    for line in handle:
+        chunk.append(line)
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if len(chunk) > 0:
+        yield chunk
+    return
+
+
+def parse_chunk(
+    lines: list[str],
+    drop_name: bool = False,
+    drop_null_dbversion: bool = False,
+    target_analyses: Optional[set[Analyses]] = None,
+    validate: bool = True,
+) -> list[ResultRow]:
+    return list(ResultRow.from_file(
+        lines,
+        drop_name=drop_name,
+        drop_null_dbversion=drop_null_dbversion,
+        target_analyses=target_analyses,
+        validate=validate
+    ))
+
+
+def parallel_from_file(
+    handle: TextIO,
+    jobs: int,
+    chunk_size: int,
+    drop_name: bool = False,
+    drop_null_dbversion: bool = False,
+    target_analyses: Optional[set[Analyses]] = None,
+    validate: bool = True,
+) -> Iterator[ResultRow]:
+    """ Parses records in chunks using a pool of processes.
+
+    Records are yielded in the same order as the input file.
+    Only a few chunks per process are held in memory at any time.
+    """
+
+    pending: deque[Future[list[ResultRow]]] = deque()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for chunk in chunk_lines(handle, chunk_size):
+            pending.append(executor.submit(
+                parse_chunk,
+                chunk,
+                drop_name,
+                drop_null_dbversion,
+                target_analyses,
+                validate
+            ))
+
+            if len(pending) >= (2 * jobs):
+                yield from pending.popleft().result()
+
+        while len(pending) > 0:
+            yield from pending.popleft().result()
+    return
+
+
+def track_checksums(
+    results: Iterator[ResultRow],
+    features: FeatureTable,
+    chunk_size: int = 100000
+) -> Iterator[ResultRow]:
+    """ Marks the checksums of results as needing new features. """
+    chunk: list[str] = []
+    for result in results:
+        chunk.append(result.checksum)
+
+        if len(chunk) >= chunk_size:
+            features.insert_pending(chunk)
+            chunk = []
+
+        yield result
+
+    if len(chunk) > 0:
+        features.insert_pending(chunk)
+    return
+
+
 def inner(
     con: sqlite3.Connection,
     cur: sqlite3.Cursor,
     args: argparse.Namespace
 ) -> None:
     tab = ResultsTable(con, cur)
-    tab.create_result_tables()
+    tab.create_result_tables(typed=args.typed)
     if not args.drop_name:
         tab.create_decoder_table()
 
     target_analyses = set(args.include).difference(args.exclude)
 
-    tab.insert_results(
-        ResultRow.from_file(
+    if args.jobs > 1:
+        results = parallel_from_file(
             args.results,
+            jobs=args.jobs,
+            chunk_size=args.chunk_size,
             drop_name=args.drop_name,
             drop_null_dbversion=args.drop_null_dbversion,
-            target_analyses=target_analyses
-        ),
-        insert_names=not args.drop_name
-    )
+            target_analyses=target_analyses,
+            validate=args.validate
+        )
+    else:
+        results = ResultRow.from_file(
+            args.results,
+            drop_name=args.drop_name,
+            drop_null_dbversion=args.drop_null_dbversion,
+            target_analyses=target_analyses,
+            validate=args.validate
+        )
+
+    # If the features table is new, we need to compute features for
+    # everything, not just the results that we're loading now.
+    features = FeatureTable(con, cur)
+    rebuild_features = args.features and not features.exists()
+    update_features = args.features or features.exists()
+
+    if update_features and not rebuild_features:
+        results = track_checksums(results, features)
+
+    if args.bulk:
+        tab.drop_result_index()
+
+    try:
+        if args.bulk:
+            tab.create_staging_tables()
+
+        tab.insert_results(
+            results,
+            insert_names=not args.drop_name,
+            staging=args.bulk
+        )
+
+        if args.bulk:
+            tab.merge_staging_tables()
+    finally:
+        # Don't leave half loaded staging tables or missing indices
+        # if the load fails.
+        if args.bulk:
+            tab.drop_staging_tables()
+
+        tab.create_result_index()
 
-    tab.create_result_index()
+    if update_features:
+        features.update(all_checksums=rebuild_features)
 
     if not args.drop_name:
         tab.create_decoder_index()
@@ -3,7 +3,10 @@ from __future__ import annotations
 
 import sys
 import argparse
-from collections import defaultdict
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, Future
+from operator import itemgetter
 
 from typing import TextIO
 from typing import Any, Literal
@@ -19,7 +22,16 @@ from ..gff import (
     Strand,
     Phase,
     GFFRecord,
+    PackedRecords,
+    copy_records,
+    pack_records,
+    unpack_records,
+    BlockKey,
+    BlockSorter,
+    write_blocks,
+    block_key,
 )
+from ..parsers import ParseError, LineParseError, FieldParseError
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -87,6 +99,39 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "--sorted",
+        action="store_true",
+        default=False,
+        help=(
+            "The CDSs in the genes GFF and the features in the annotation "
+            "GFF are both sorted by protein ID. "
+            "Proteins are projected one at a time, which uses much less "
+            "memory for large genomes."
+        )
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=50000,
+        help=(
+            "With --sorted, the number of output features to sort in "
+            "memory before writing them to a temporary file. "
+            "Default: 50000"
+        )
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "The number of processes to use for projecting the protein "
+            "features. Default: 1"
+        )
+    )
+
     return
 
 
@@ -317,7 +362,6 @@ def create_match(
     Intended to create "match" features from many "match_part"s.
     """
 
-    from copy import deepcopy
     start = min(p.start for p in parts)
     end = max(p.end for p in parts)
 
@@ -330,7 +374,7 @@ def create_match(
     source = source_.pop()
     del source_
 
-    attributes = deepcopy(parts[0].attributes)
+    attributes = parts[0].attributes.copy()
     attributes.id = prot_id + "-" + type_ + "-" + str(index)
 
     parent = GFFRecord(
@@ -356,8 +400,7 @@ def split_protein_features(  # noqa: W0611
     separate_peps: bool = False,
     regions: bool = False
 ):
-    from copy import deepcopy
-    prots = deepcopy(prots)
+    prots = copy_records(prots)
 
     if len(cdss) == 0:
         return None
@@ -447,7 +490,7 @@ def split_protein_features(  # noqa: W0611
         else:
             # parent_type = "polypeptide"
             if separate_peps:
-                parents = deepcopy(peps)
+                parents = copy_records(peps)
                 for p in parents:
                     p.attributes.id = f"{p.attributes.id}-{index}"
                     p.source = source
@@ -501,18 +544,19 @@ def get_id(
     return id_
 
 
-def write_gff(
+def format_gff_blocks(
     gff: Iterable[GFFRecord],
-    handle: TextIO
-):
+) -> Iterator[tuple[BlockKey, str]]:
+    """ Formats each top-level feature and its children as a block of
+    GFF lines, in sorted order.
+    """
+
     seen: set[GFFRecord] = set()
-    for feature in sorted(
-        gff,
-        key=lambda g: (g.seqid, g.start, g.end, g.type)
-    ):
+    for feature in sorted(gff, key=block_key):
         if len(feature.parents) > 0:
             continue
 
+        lines = []
         for child in feature.traverse_children(sort=True):
             if child in seen:
                 continue
@@ -526,8 +570,19 @@ def write_gff(
 
             seen.add(child)
             child.update_parents()
-            print(child, file=handle)
-        print("###", file=handle)
+            lines.append(str(child))
+
+        lines.append("###")
+        yield block_key(feature), "\n".join(lines)
+    return
+
+
+def write_gff(
+    gff: Iterable[GFFRecord],
+    handle: TextIO
+):
+    write_blocks((b for _, b in format_gff_blocks(gff)), handle)
+    return
 
 
 def split_on_type(
@@ -586,6 +641,323 @@ def split_on_source(
     return out
 
 
+def preprocess_annotation(prot: GFFRecord) -> bool:
+    """ Tidies up a protein feature before it is projected.
+
+    Returns False if the feature shouldn't be projected.
+    """
+
+    if prot.type in (
+        "n_terminal_region",
+        "c_terminal_region",
+        "central_hydrophobic_region_of_signal_peptide"
+    ):
+        return False
+    elif (
+        (prot.attributes.id is not None) and
+        (prot.type == "signal_peptide")
+    ):
+        prot.attributes.id = None
+        prot.children = []
+
+    if (
+        (prot.source == "SignalP:3.0b") and
+        ("d_decision" in prot.attributes.custom)
+    ):
+        prot.source = "SignalPNN:3.0b"
+    elif (prot.source == "SignalP:3.0b"):
+        prot.source = "SignalPHMM:3.0b"
+
+    return True
+
+
+def group_sorted(
+    records: Iterable[tuple[str, GFFRecord]],
+    handle: TextIO,
+) -> Iterator[tuple[str, list[GFFRecord]]]:
+    """ Groups consecutive records with the same protein ID.
+
+    Raises an error if the IDs aren't sorted.
+    """
+
+    last_id: Optional[str] = None
+    group: list[GFFRecord] = []
+
+    for id_, record in records:
+        if id_ != last_id:
+            if last_id is not None:
+                if id_ < last_id:
+                    raise ParseError(
+                        filename=None,
+                        line=None,
+                        message=(
+                            "The file is not sorted by protein ID. "
+                            f"Encountered '{id_}' after '{last_id}'."
+                        )
+                    ).add_filename_from_handle(handle)
+
+                yield last_id, group
+
+            last_id = id_
+            group = []
+
+        group.append(record)
+
+    if last_id is not None:
+        yield last_id, group
+    return
+
+
+def iter_sorted_cdss(
+    genes: TextIO,
+    id_field: str
+) -> Iterator[tuple[str, list[GFFRecord]]]:
+    """ Reads the CDSs of each protein from a GFF sorted by protein ID.
+
+    Lines are parsed individually, so the file only needs to contain
+    the CDS features.
+    """
+
+    def cdss() -> Iterator[tuple[str, GFFRecord]]:
+        for i, line in enumerate(genes):
+            if line.startswith("#") or (line.strip() == ""):
+                continue
+
+            try:
+                record = GFFRecord.parse(line)
+            except (LineParseError, FieldParseError) as e:
+                raise (
+                    e.as_parse_error(line=i)
+                    .add_filename_from_handle(genes)
+                )
+
+            if record.type != "CDS":
+                continue
+
+            id_ = get_id(record, id_field)
+            if id_ is None:
+                continue
+
+            # This avoids problems later on in make_polypeptide
+            record.attributes.id = id_
+            yield id_, record
+        return
+
+    return group_sorted(cdss(), genes)
+
+
+def iter_sorted_annotations(
+    annotations: TextIO
+) -> Iterator[tuple[str, list[GFFRecord]]]:
+    """ Reads the features of each protein from a GFF sorted by seqid. """
+
+    prots = (
+        (prot.seqid, prot)
+        for prot
+        in GFFRecord.from_file(annotations, stream=True)
+        if preprocess_annotation(prot)
+    )
+    return group_sorted(prots, annotations)
+
+
+def merge_join(
+    cdss: Iterable[tuple[str, list[GFFRecord]]],
+    prots: Iterable[tuple[str, list[GFFRecord]]],
+) -> Iterator[tuple[list[GFFRecord], list[GFFRecord]]]:
+    """ Pairs up the CDSs and features for each protein.
+
+    Both inputs must be sorted by protein ID.
+    Proteins missing from either input are skipped.
+    """
+
+    cds_iter = iter(cdss)
+    current = next(cds_iter, None)
+
+    for prot_id, these_prots in prots:
+        while (current is not None) and (current[0] < prot_id):
+            current = next(cds_iter, None)
+
+        if current is None:
+            break
+        elif current[0] == prot_id:
+            yield current[1], these_prots
+    return
+
+
+GFFBlocks = dict[str, list[tuple[BlockKey, str]]]
+
+# The number of proteins sent to a worker process at a time.
+BATCH_SIZE = 200
+
+
+def project_protein(
+    prots: Sequence[GFFRecord],
+    cdss: Sequence[GFFRecord],
+    filter_kex2: bool,
+    split: Literal['source', 'type', None],
+) -> GFFBlocks:
+    """ Projects the features of a single protein, and formats them as
+    GFF blocks for each output file.
+    """
+
+    feats = split_protein_features(
+        prots,
+        cdss,
+        separate_peps=True,
+        filter_kex2=filter_kex2,
+        regions=True
+    )
+
+    if feats is None:
+        return {}
+    elif split is None:
+        groups = {"": feats}
+    elif split == "type":
+        groups = split_on_type(feats)
+    elif split == "source":
+        groups = split_on_source(feats)
+
+    return {
+        name: list(format_gff_blocks(group))
+        for name, group
+        in groups.items()
+    }
+
+
+def project_batch(
+    batch: list[tuple[PackedRecords, PackedRecords]],
+    filter_kex2: bool,
+    split: Literal['source', 'type', None],
+) -> list[GFFBlocks]:
+    """ Projects a batch of proteins in a worker process.
+
+    The features and CDSs of each protein are sent without their links
+    to other records, which would otherwise pickle the whole gene.
+    """
+
+    out = []
+    for packed_prots, packed_cdss in batch:
+        prots = unpack_records(packed_prots)
+        cdss = unpack_records(packed_cdss)
+        out.append(project_protein(prots, cdss, filter_kex2, split))
+
+    return out
+
+
+def project_proteins(
+    pairs: Iterable[tuple[Sequence[GFFRecord], Sequence[GFFRecord]]],
+    filter_kex2: bool,
+    split: Literal['source', 'type', None],
+    jobs: int = 1,
+) -> Iterator[GFFBlocks]:
+    """ Projects the (features, CDSs) of each protein.
+
+    The results are yielded in the same order as the input.
+    If jobs is greater than 1 batches of proteins are projected by a
+    pool of processes, with only a few batches per process held in memory.
+    Feature IDs only depend on the protein, so the output is the
+    same regardless of the number of jobs.
+    """
+
+    if jobs <= 1:
+        for prots, cdss in pairs:
+            yield project_protein(prots, cdss, filter_kex2, split)
+        return
+
+    pending: deque[Future[list[GFFBlocks]]] = deque()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        batch: list[tuple[PackedRecords, PackedRecords]] = []
+        for prots, cdss in pairs:
+            batch.append((pack_records(prots), pack_records(cdss)))
+
+            if len(batch) < BATCH_SIZE:
+                continue
+
+            pending.append(
+                executor.submit(project_batch, batch, filter_kex2, split)
+            )
+            batch = []
+
+            if len(pending) >= (2 * jobs):
+                for blocks in pending.popleft().result():
+                    yield blocks
+
+        if len(batch) > 0:
+            pending.append(
+                executor.submit(project_batch, batch, filter_kex2, split)
+            )
+
+        while len(pending) > 0:
+            for blocks in pending.popleft().result():
+                yield blocks
+    return
+
+
+def open_output(
+    stack: ExitStack,
+    outfile: str,
+    split: Literal['source', 'type', None],
+    name: str,
+) -> TextIO:
+    if (split is None) and (outfile in ("stdout", "-")):
+        return sys.stdout
+    elif split is None:
+        return stack.enter_context(open(outfile, "w"))
+    else:
+        return stack.enter_context(open(f"{outfile}{name}.gff3", "w"))
+
+
+def sorted_inner(  # noqa: C901
+    genes: TextIO,
+    annotations: TextIO,
+    outfile: str,
+    id_field: str,
+    filter_kex2: bool,
+    split: Literal['source', 'type', None],
+    chunk_size: int,
+    jobs: int = 1,
+):
+    """ Projects and writes the features one protein at a time.
+
+    Both the genes and annotations must be sorted by protein ID.
+    The output is sorted using temporary files.
+    """
+
+    with ExitStack() as stack:
+        sorters: dict[str, BlockSorter] = {}
+
+        # Like the unsorted mode, always create the output file
+        # even if there aren't any features.
+        if split is None:
+            sorters[""] = stack.enter_context(BlockSorter(chunk_size))
+
+        pairs = (
+            (these_prots, these_cdss)
+            for these_cdss, these_prots
+            in merge_join(
+                iter_sorted_cdss(genes, id_field),
+                iter_sorted_annotations(annotations)
+            )
+        )
+
+        for groups in project_proteins(pairs, filter_kex2, split, jobs):
+            for name, blocks in groups.items():
+                if name not in sorters:
+                    sorters[name] = stack.enter_context(
+                        BlockSorter(chunk_size)
+                    )
+
+                sorter = sorters[name]
+                for key, block in blocks:
+                    sorter.add(key, block)
+
+        for name, sorter in sorters.items():
+            handle = open_output(stack, outfile, split, name)
+            write_blocks(sorter, handle)
+    return
+
+
 def inner(  # noqa: C901
     genes: TextIO,
     annotations: TextIO,
@@ -593,6 +965,7 @@ def inner(  # noqa: C901
     id_field: str,
     filter_kex2: bool,
     split: Literal['source', 'type', None],
+    jobs: int = 1,
 ):
     genes_gff = list(GFFRecord.from_file(genes))
 
@@ -614,70 +987,56 @@ def inner(  # noqa: C901
         if prot.seqid not in cdss:
             continue
 
-        if prot.type in (
-            "n_terminal_region",
-            "c_terminal_region",
-            "central_hydrophobic_region_of_signal_peptide"
-        ):
-            continue
-        elif (
-            (prot.attributes.id is not None) and
-            (prot.type == "signal_peptide")
-        ):
-            prot.attributes.id = None
-            prot.children = []
+        if preprocess_annotation(prot):
+            prots[prot.seqid].append(prot)
 
-        if (
-            (prot.source == "SignalP:3.0b") and
-            ("d_decision" in prot.attributes.custom)
-        ):
-            prot.source = "SignalPNN:3.0b"
-        elif (prot.source == "SignalP:3.0b"):
-            prot.source = "SignalPHMM:3.0b"
-
-        prots[prot.seqid].append(prot)
-
-    mapped: list[GFFRecord] = []
-    for id_, these_prots in prots.items():
-        these_cdss = cdss[id_]
-
-        feats = split_protein_features(
-            these_prots,
-            these_cdss,
-            separate_peps=True,
-            filter_kex2=filter_kex2,
-            regions=True
-        )
-        mapped.extend(feats)
+    pairs = (
+        (these_prots, cdss[id_])
+        for id_, these_prots
+        in prots.items()
+    )
 
-    if (split is None) and (outfile in ("stdout", "-")):
-        write_gff(mapped, sys.stdout)
-    elif (split is None):
-        with open(outfile, "w") as handle:
-            write_gff(mapped, handle)
-    elif split == "type":
-        for type_, split_mapped in split_on_type(mapped).items():
-            with open(f"{outfile}{type_}.gff3", "w") as handle:
-                write_gff(split_mapped, handle)
-    elif split == "source":
-        for source, split_mapped in split_on_source(mapped).items():
-            with open(f"{outfile}{source}.gff3", "w") as handle:
-                write_gff(split_mapped, handle)
-    else:
-        print(split, outfile)
+    mapped: defaultdict[str, list[tuple[BlockKey, str]]] = defaultdict(list)
+    if split is None:
+        mapped[""] = []
+
+    for groups in project_proteins(pairs, filter_kex2, split, jobs):
+        for name, blocks in groups.items():
+            mapped[name].extend(blocks)
+
+    with ExitStack() as stack:
+        for name, blocks in mapped.items():
+            handle = open_output(stack, outfile, split, name)
+
+            # The sort is stable, so ties stay in the input order.
+            blocks.sort(key=itemgetter(0))
+            write_blocks((b for _, b in blocks), handle)
     return
 
 
 def runner(args: argparse.Namespace) -> None:
     try:
-        inner(
-            genes=args.genes,
-            annotations=args.annotations,
-            outfile=args.outfile,
-            id_field=args.id_field,
-            filter_kex2=args.filter_kex2,
-            split=args.split,
-        )
+        if args.sorted:
+            sorted_inner(
+                genes=args.genes,
+                annotations=args.annotations,
+                outfile=args.outfile,
+                id_field=args.id_field,
+                filter_kex2=args.filter_kex2,
+                split=args.split,
+                chunk_size=args.chunk_size,
+                jobs=args.jobs,
+            )
+        else:
+            inner(
+                genes=args.genes,
+                annotations=args.annotations,
+                outfile=args.outfile,
+                id_field=args.id_field,
+                filter_kex2=args.filter_kex2,
+                split=args.split,
+                jobs=args.jobs,
+            )
     except Exception as e:
         raise e
     return
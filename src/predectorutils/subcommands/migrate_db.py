@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+import sqlite3
+
+from ..database import load_db, ResultsTable
+
+
+def cli(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "db",
+        type=str,
+        help="The database to convert."
+    )
+
+    parser.add_argument(
+        "--mem",
+        type=float,
+        default=1.0,
+        help=(
+            "The amount of RAM in gibibytes to let "
+            "SQLite use for cache."
+        )
+    )
+
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        default=False,
+        help=(
+            "Rebuild the database file after converting, to reclaim "
+            "the space used by the old tables."
+        )
+    )
+
+    return
+
+
+def inner(
+    con: sqlite3.Connection,
+    cur: sqlite3.Cursor,
+    args: argparse.Namespace
+) -> None:
+    tab = ResultsTable(con, cur)
+    migrated = tab.migrate_to_typed()
+
+    for an in migrated:
+        print(f"Converted {an} to typed columns.", file=sys.stderr)
+
+    if args.vacuum:
+        cur.execute("VACUUM")
+    return
+
+
+def runner(args: argparse.Namespace) -> None:
+    try:
+        con, cur = load_db(args.db, args.mem)
+        inner(con, cur, args)
+    except Exception as e:
+        raise e
+    finally:
+        con.commit()
+        con.close()
+    return
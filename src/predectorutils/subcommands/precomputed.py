@@ -4,14 +4,26 @@ import os
 import argparse
 import sqlite3
 
-from typing import TextIO
-from collections.abc import Iterator
+from typing import TextIO, BinaryIO, Optional
+from contextlib import ExitStack
+from itertools import groupby
+from operator import itemgetter
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
 
 from Bio import SeqIO
 from Bio.SeqRecord import SeqRecord
-from Bio.SeqUtils.CheckSum import seguid
 
 from ..database import load_db, TargetRow, ResultsTable, ResultRow
+from ..checksum_cache import (
+    ChecksumRow,
+    fasta_checksums,
+    read_checksum_cache,
+    real_path,
+    sequence_checksums,
+    write_checksum_cache
+)
+from .. import ldjson
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -43,6 +55,29 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=False,
+        help=(
+            "Don't hold the input sequences in memory. "
+            "Only the checksums and file offsets of each sequence are kept, "
+            "and the remaining sequences are copied from the input file "
+            "to all output files in a single pass."
+        )
+    )
+
+    parser.add_argument(
+        "--no-checksum-cache",
+        dest="checksum_cache",
+        action="store_false",
+        default=True,
+        help=(
+            "Don't read or write the checksums of the fasta file to a "
+            "'.checksums' file alongside it."
+        )
+    )
+
     parser.add_argument(
         "db",
         type=str,
@@ -68,16 +103,25 @@ def cli(parser: argparse.ArgumentParser) -> None:
     return
 
 
-def get_checksum(seq: SeqRecord) -> tuple[str, str]:
-    checksum = seguid(str(seq.seq))
-    return seq.id, checksum
+def get_targets(handle: TextIO) -> Iterator[TargetRow]:
+    """ Reads the targets, skipping any that need a database version
+    but don't have one.
+    """
+    for target in TargetRow.from_file(handle):
+        if (
+            target.analysis.needs_database() and
+            (target.database_version is None)
+        ):
+            continue
+
+        yield target
+    return
 
 
-def get_checksum_to_ids(seqs: dict[str, SeqRecord]) -> dict[str, set[str]]:
+def get_checksum_to_ids(seqs: Iterable[ChecksumRow]) -> dict[str, set[str]]:
     d: dict[str, set[str]] = dict()
 
-    for seq in seqs.values():
-        id_, chk = get_checksum(seq)
+    for id_, chk, _ in seqs:
         if chk in d:
             d[chk].add(id_)
         else:
@@ -118,20 +162,121 @@ def write_remaining_seqs(
     return
 
 
+def index_fasta(
+    handle: BinaryIO,
+    cached: Optional[Sequence[ChecksumRow]] = None
+) -> list[tuple[int, int, ChecksumRow]]:
+    """ Finds the position of each record in a fasta file.
+
+    Returns the byte offset of the start of each record, the length of
+    the record in bytes, and the id, checksum and md5sum of the sequence.
+    If the checksums of the records are already known (in file order),
+    they're used instead of checksumming the sequences again.
+    Raises a ValueError if they don't match the ids of the records.
+    """
+
+    records: list[tuple[int, int, ChecksumRow]] = []
+    positions: list[tuple[int, int, str]] = []
+
+    def add(start: int, end: int, id_: str, seq: list[bytes]) -> None:
+        if cached is None:
+            row = (id_, *sequence_checksums(b"".join(seq).decode()))
+            records.append((start, end - start, row))
+        else:
+            positions.append((start, end - start, id_))
+        return
+
+    start = None
+    id_ = ""
+    seq: list[bytes] = []
+    offset = 0
+
+    for line in handle:
+        if line.startswith(b">"):
+            if start is not None:
+                add(start, offset, id_, seq)
+
+            start = offset
+            title = line[1:].decode().split(None, 1)
+            id_ = title[0] if len(title) > 0 else ""
+            seq = []
+        elif (start is not None) and (cached is None):
+            seq.append(line.strip().replace(b" ", b""))
+
+        offset += len(line)
+
+    if start is not None:
+        add(start, offset, id_, seq)
+
+    if cached is None:
+        return records
+
+    if [p[2] for p in positions] != [row[0] for row in cached]:
+        raise ValueError("The cached checksums don't match the fasta file.")
+
+    return [
+        (start, length, row)
+        for (start, length, _), row
+        in zip(positions, cached)
+    ]
+
+
+def open_remaining_handle(
+    target: TargetRow,
+    template: str,
+    stack: ExitStack
+) -> BinaryIO:
+    fname = template.format(**target.as_dict())
+
+    dname = os.path.dirname(fname)
+    if dname != '':
+        os.makedirs(dname, exist_ok=True)
+
+    return stack.enter_context(open(fname, "wb"))
+
+
+def stream_remaining_seqs(
+    handle: BinaryIO,
+    records: list[tuple[int, int, ChecksumRow]],
+    remaining: dict[str, list[int]],
+    targets: list[TargetRow],
+    template: str
+) -> None:
+    """ Copies the remaining sequences for all targets from the input.
+
+    Output files are only created for targets with at least one remaining
+    sequence, and all of them are written to in a single pass over the
+    input file.
+    """
+
+    wanted = {i for indices in remaining.values() for i in indices}
+
+    with ExitStack() as stack:
+        outhandles = {
+            i: open_remaining_handle(targets[i], template, stack)
+            for i in sorted(wanted)
+        }
+
+        for start, length, (_, checksum, _) in records:
+            indices = remaining.get(checksum, None)
+            if indices is None:
+                continue
+
+            handle.seek(start)
+            record = handle.read(length)
+            if not record.endswith(b"\n"):
+                record += b"\n"
+
+            for i in indices:
+                outhandles[i].write(record)
+    return
+
+
 def write_results(
     results: Iterator[ResultRow],
     outfile: TextIO
 ) -> None:
-    buf: list[str] = []
-    for result in results:
-        buf.append(result.as_str())
-
-        if len(buf) > 50000:
-            print("\n".join(buf), file=outfile)
-            buf = []
-
-    if len(buf) > 0:
-        print("\n".join(buf), file=outfile)
+    ldjson.write_lines((r.as_str() for r in results), outfile)
     return
 
 
@@ -143,27 +288,27 @@ def inner(
     seqs: dict[str, SeqRecord] = SeqIO.to_dict(
         SeqIO.parse(args.infasta, "fasta")
     )
-    checksum_to_ids = get_checksum_to_ids(seqs)
+    checksum_to_ids = get_checksum_to_ids(fasta_checksums(
+        args.infasta,
+        use_cache=args.checksum_cache,
+        seqs=((id_, str(seq.seq)) for id_, seq in seqs.items())
+    ))
     checksums = set(checksum_to_ids.keys())
 
     tab = ResultsTable(con, cur)
     tab.insert_checksums(checksums)
+    tab.insert_targets(get_targets(args.analyses))
 
-    for target in TargetRow.from_file(args.analyses):
-        if (
-            target.analysis.needs_database() and
-            (target.database_version is None)
-        ):
-            continue
-
-        if args.outfile is not None:
-            local_results = tab.select_target(target, checksums=True)
-            write_results(local_results, args.outfile)
-
-        remaining_checksums = list(tab.find_remaining(target))
+    if args.outfile is not None:
+        local_results = tab.select_targets(checksums=True)
+        write_results(local_results, args.outfile)
 
+    for target, pairs in groupby(
+        tab.find_remaining_targets(),
+        key=itemgetter(0)
+    ):
         write_remaining_seqs(
-            remaining_checksums,
+            [checksum for _, checksum in pairs],
             seqs,
             target,
             checksum_to_ids,
@@ -172,10 +317,66 @@ def inner(
     return
 
 
+def stream_inner(
+    con: sqlite3.Connection,
+    cur: sqlite3.Cursor,
+    args: argparse.Namespace
+) -> None:
+    path = real_path(args.infasta) if args.checksum_cache else None
+    cached = None if path is None else read_checksum_cache(path)
+
+    with open(args.infasta.name, "rb") as handle:
+        records = None
+        if cached is not None:
+            try:
+                records = index_fasta(handle, cached)
+            except ValueError:
+                handle.seek(0)
+
+        if records is None:
+            records = index_fasta(handle)
+            if path is not None:
+                write_checksum_cache(path, [row for _, _, row in records])
+
+        checksums = {checksum for _, _, (_, checksum, _) in records}
+
+        tab = ResultsTable(con, cur)
+        tab.insert_checksums(checksums)
+        tab.insert_targets(get_targets(args.analyses))
+
+        if args.outfile is not None:
+            local_results = tab.select_targets(checksums=True)
+            write_results(local_results, args.outfile)
+
+        targets: list[TargetRow] = []
+        remaining: dict[str, list[int]] = defaultdict(list)
+
+        for target, pairs in groupby(
+            tab.find_remaining_targets(),
+            key=itemgetter(0)
+        ):
+            for _, checksum in pairs:
+                remaining[checksum].append(len(targets))
+
+            targets.append(target)
+
+        stream_remaining_seqs(
+            handle,
+            records,
+            remaining,
+            targets,
+            args.template
+        )
+    return
+
+
 def runner(args: argparse.Namespace) -> None:
     try:
         con, cur = load_db(args.db, args.mem)
-        inner(con, cur, args)
+        if args.stream:
+            stream_inner(con, cur, args)
+        else:
+            inner(con, cur, args)
     except Exception as e:
         raise e
     finally:
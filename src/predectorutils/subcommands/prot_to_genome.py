@@ -3,7 +3,10 @@ from __future__ import annotations
 
 import sys
 import argparse
-from collections import defaultdict
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, Future
+from operator import itemgetter
 
 from typing import TextIO
 from typing import Union, Optional
@@ -16,6 +19,13 @@ from ..gff import (
     Strand,
     Phase,
     GFFRecord,
+    PackedRecords,
+    copy_records,
+    pack_records,
+    unpack_records,
+    BlockKey,
+    block_key,
+    write_blocks,
 )
 
 
@@ -63,6 +73,16 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "The number of processes to use for projecting the protein "
+            "features. Default: 1"
+        )
+    )
+
     return
 
 
@@ -292,7 +312,6 @@ def create_match(
     Intended to create "match" features from many "match_part"s.
     """
 
-    from copy import deepcopy
     start = min(p.start for p in parts)
     end = max(p.end for p in parts)
 
@@ -305,7 +324,7 @@ def create_match(
     source = source_.pop()
     del source_
 
-    attributes = deepcopy(parts[0].attributes)
+    attributes = parts[0].attributes.copy()
     attributes.id = prot_id + "-" + type_ + "-" + str(index)
 
     parent = GFFRecord(
@@ -330,8 +349,7 @@ def split_protein_features(  # noqa: W0611
     separate_peps: bool = True,
     regions: bool = False
 ):
-    from copy import deepcopy
-    prots = deepcopy(prots)
+    prots = copy_records(prots)
 
     if len(cdss) == 0:
         return None
@@ -375,7 +393,7 @@ def split_protein_features(  # noqa: W0611
         else:
             # parent_type = "polypeptide"
             if separate_peps:
-                parents = deepcopy(peps)
+                parents = copy_records(peps)
                 for p in parents:
                     p.attributes.id = f"{p.attributes.id}-{index}"
                     p.source = source
@@ -429,26 +447,38 @@ def get_id(
     return id_
 
 
-def write_gff(
+def format_gff_blocks(
     gff: Iterable[GFFRecord],
-    handle: TextIO
-):
+) -> Iterator[tuple[BlockKey, str]]:
+    """ Formats each top-level feature and its children as a block of
+    GFF lines, in sorted order.
+    """
+
     seen: set[GFFRecord] = set()
-    for feature in sorted(
-        gff,
-        key=lambda g: (g.seqid, g.start, g.end, g.type)
-    ):
+    for feature in sorted(gff, key=block_key):
         if len(feature.parents) > 0:
             continue
 
+        lines = []
         for child in feature.traverse_children(sort=True):
             if child in seen:
                 continue
 
             seen.add(child)
             child.update_parents()
-            print(child, file=handle)
-        print("###", file=handle)
+            lines.append(str(child))
+
+        lines.append("###")
+        yield block_key(feature), "\n".join(lines)
+    return
+
+
+def write_gff(
+    gff: Iterable[GFFRecord],
+    handle: TextIO
+):
+    write_blocks((b for _, b in format_gff_blocks(gff)), handle)
+    return
 
 
 def split_on_source(
@@ -461,12 +491,111 @@ def split_on_source(
     return out
 
 
+GFFBlocks = dict[str, list[tuple[BlockKey, str]]]
+
+# The number of proteins sent to a worker process at a time.
+BATCH_SIZE = 200
+
+
+def project_protein(
+    prots: Sequence[GFFRecord],
+    cdss: Sequence[GFFRecord],
+    split: bool,
+) -> GFFBlocks:
+    """ Projects the features of a single protein, and formats them as
+    GFF blocks for each output file.
+    """
+
+    feats = split_protein_features(
+        prots,
+        cdss,
+        separate_peps=True,
+        regions=True
+    )
+
+    if feats is None:
+        return {}
+    elif split:
+        groups = split_on_source(feats)
+    else:
+        groups = {"": feats}
+
+    return {
+        name: list(format_gff_blocks(group))
+        for name, group
+        in groups.items()
+    }
+
+
+def project_batch(
+    batch: list[tuple[PackedRecords, PackedRecords]],
+    split: bool,
+) -> list[GFFBlocks]:
+    """ Projects a batch of proteins in a worker process.
+
+    The features and CDSs of each protein are sent without their links
+    to other records, which would otherwise pickle the whole gene.
+    """
+
+    out = []
+    for packed_prots, packed_cdss in batch:
+        prots = unpack_records(packed_prots)
+        cdss = unpack_records(packed_cdss)
+        out.append(project_protein(prots, cdss, split))
+
+    return out
+
+
+def project_proteins(
+    pairs: Iterable[tuple[Sequence[GFFRecord], Sequence[GFFRecord]]],
+    split: bool,
+    jobs: int = 1,
+) -> Iterator[GFFBlocks]:
+    """ Projects the (features, CDSs) of each protein.
+
+    The results are yielded in the same order as the input.
+    If jobs is greater than 1 batches of proteins are projected by a
+    pool of processes, with only a few batches per process held in memory.
+    """
+
+    if jobs <= 1:
+        for prots, cdss in pairs:
+            yield project_protein(prots, cdss, split)
+        return
+
+    pending: deque[Future[list[GFFBlocks]]] = deque()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        batch: list[tuple[PackedRecords, PackedRecords]] = []
+        for prots, cdss in pairs:
+            batch.append((pack_records(prots), pack_records(cdss)))
+
+            if len(batch) < BATCH_SIZE:
+                continue
+
+            pending.append(executor.submit(project_batch, batch, split))
+            batch = []
+
+            if len(pending) >= (2 * jobs):
+                for blocks in pending.popleft().result():
+                    yield blocks
+
+        if len(batch) > 0:
+            pending.append(executor.submit(project_batch, batch, split))
+
+        while len(pending) > 0:
+            for blocks in pending.popleft().result():
+                yield blocks
+    return
+
+
 def inner(  # noqa: C901
     genes: TextIO,
     annotations: TextIO,
     outfile: str,
     id_field: str,
     split: bool,
+    jobs: int = 1,
 ):
     genes_gff = list(GFFRecord.from_file(genes, unescape=True))
 
@@ -486,27 +615,34 @@ def inner(  # noqa: C901
             continue
         prots[prot.seqid].append(prot)
 
-    mapped: list[GFFRecord] = []
-    for id_, these_prots in prots.items():
-        these_cdss = cdss[id_]
-        feats = split_protein_features(
-            these_prots,
-            these_cdss,
-            separate_peps=True,
-            regions=True
-        )
-        mapped.extend(feats)
+    pairs = (
+        (these_prots, cdss[id_])
+        for id_, these_prots
+        in prots.items()
+    )
 
-    if (not split) and (outfile in ("stdout", "-")):
-        write_gff(mapped, sys.stdout)
-    elif not split:
-        with open(outfile, "w") as handle:
-            write_gff(mapped, handle)
-    else:
-        assert split
-        for source, split_mapped in split_on_source(mapped).items():
-            with open(f"{outfile}{source}.gff3", "w") as handle:
-                write_gff(split_mapped, handle)
+    mapped: defaultdict[str, list[tuple[BlockKey, str]]] = defaultdict(list)
+    if not split:
+        mapped[""] = []
+
+    for groups in project_proteins(pairs, split, jobs):
+        for name, blocks in groups.items():
+            mapped[name].extend(blocks)
+
+    with ExitStack() as stack:
+        for name, blocks in mapped.items():
+            if (not split) and (outfile in ("stdout", "-")):
+                handle = sys.stdout
+            elif not split:
+                handle = stack.enter_context(open(outfile, "w"))
+            else:
+                handle = stack.enter_context(
+                    open(f"{outfile}{name}.gff3", "w")
+                )
+
+            # The sort is stable, so ties stay in the input order.
+            blocks.sort(key=itemgetter(0))
+            write_blocks((b for _, b in blocks), handle)
     return
 
 
@@ -518,6 +654,7 @@ def runner(args: argparse.Namespace) -> None:
             outfile=args.outfile,
             id_field=args.id_field,
             split=args.split,
+            jobs=args.jobs,
         )
     except Exception as e:
         raise e
@@ -1,19 +1,22 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
 import sys
 import argparse
-import json
-import hashlib
-
-from typing import Any, Optional
-
-from Bio import SeqIO
-from Bio.SeqRecord import SeqRecord
-from Bio.SeqUtils.CheckSum import seguid
 
+from typing import TYPE_CHECKING
+from typing import Any, Optional, TextIO
+from collections.abc import Iterator
 
-from ..analyses import Analysis, Analyses
+from ..analyses import Analyses
+from ..analyses.base import int_or_none, float_or_none, str_or_none
+from ..checksum_cache import fasta_checksums
 from ..parsers import ParseError
+from .. import ldjson
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def cli(parser: argparse.ArgumentParser) -> None:
@@ -74,96 +77,121 @@ def cli(parser: argparse.ArgumentParser) -> None:
         ),
     )
 
+    parser.add_argument(
+        "--no-checksum-cache",
+        dest="checksum_cache",
+        action="store_false",
+        default=True,
+        help=(
+            "Don't read or write the checksums of the fasta file to a "
+            "'.checksums' file alongside it."
+        ),
+    )
+
     return
 
 
-def get_line(
+def get_lines(
     pipeline_version: Optional[str],
     software_version: Optional[str],
     database_version: Optional[str],
     analysis_type: Analyses,
-    analysis: Analysis,
+    batch: pd.DataFrame,
     checksums: dict[str, str],
     md5sums: dict[str, str],
-) -> dict[Any, Any]:
-    name = getattr(analysis, analysis.name_column)
-    out = {
-        "software": analysis.software,
-        "database": analysis.database,
-        "analysis": str(analysis_type),
-        "checksum": checksums.get(name, None),
-        "md5sum": md5sums.get(name, None),
-        "data": analysis.as_dict()
-    }
-
-    if pipeline_version is not None:
-        out["pipeline_version"] = pipeline_version
-
-    if software_version is not None:
-        out["software_version"] = software_version
-
-    if database_version is not None:
-        out["database_version"] = database_version
-
-    return out
-
-
-def get_checksum(seq: SeqRecord) -> tuple[str, str]:
-    checksum = seguid(str(seq.seq))
-    return seq.id, checksum
-
-
-def get_md5sum(seq: SeqRecord) -> tuple[str, str]:
-    md = hashlib.md5(str(seq.seq).encode()).hexdigest()
-    return seq.id, md
-
-
-def get_checksums(seqs: list[SeqRecord]) -> dict[str, str]:
-    out: dict[str, str] = {}
+) -> Iterator[dict[Any, Any]]:
+    """ Converts a batch of parsed records into the output dictionaries. """
+    analysis = analysis_type.get_analysis()
+    names = batch[analysis.name_column].tolist()
+
+    # Missing values of the optional fields are NaN or NA in the batch,
+    # but should be null in JSON. Other NaNs are real values.
+    data = batch.astype(object)
+    nullable = [
+        column
+        for column, type_
+        in zip(analysis.columns, analysis.types)
+        if type_ in (int_or_none, float_or_none, str_or_none)
+    ]
+    data[nullable] = data[nullable].where(data[nullable].notna(), None)
+
+    for name, row in zip(names, data.itertuples(index=False, name=None)):
+        out = {
+            "software": analysis.software,
+            "database": analysis.database,
+            "analysis": str(analysis_type),
+            "checksum": checksums.get(name, None),
+            "md5sum": md5sums.get(name, None),
+            "data": dict(zip(analysis.columns, row))
+        }
+
+        if pipeline_version is not None:
+            out["pipeline_version"] = pipeline_version
+
+        if software_version is not None:
+            out["software_version"] = software_version
+
+        if database_version is not None:
+            out["database_version"] = database_version
+
+        yield out
+    return
 
-    for seq in seqs:
-        id_, checksum = get_checksum(seq)
-        out[id_] = checksum
-    return out
 
+def convert_file(
+    infile: TextIO,
+    analysis_type: Analyses,
+    checksums: dict[str, str],
+    md5sums: dict[str, str],
+    pipeline_version: Optional[str] = None,
+    software_version: Optional[str] = None,
+    database_version: Optional[str] = None,
+) -> Iterator[str]:
+    """ Yields the line delimited JSON for each record in a results file. """
+    analysis = analysis_type.get_analysis()
+    for batch in analysis.from_file_batches(infile):
+        for dline in get_lines(
+            pipeline_version,
+            software_version,
+            database_version,
+            analysis_type,
+            batch,
+            checksums,
+            md5sums
+        ):
+            yield ldjson.dumps(dline, compact=False)
+    return
 
-def get_md5sums(seqs: list[SeqRecord]) -> dict[str, str]:
-    out: dict[str, str] = {}
 
-    for seq in seqs:
-        id_, checksum = get_md5sum(seq)
-        out[id_] = checksum
-    return out
+def no_records_error(filename: Optional[str]) -> ParseError:
+    return ParseError(
+        filename = filename,
+        line = None,
+        message = (
+            "We could not parse any records from the input file.\n"
+            "It's possible that the input is empty, or that it is in the wrong format.\n"
+            "This can happen if an analysis fails but doesn't tell us that it failed.\n"
+            "Please check the input file indicated above and contact us for help if you need it."
+        )
+    )
 
 
 def runner(args: argparse.Namespace) -> None:
-    seqs = list(SeqIO.parse(args.infasta, "fasta"))
-    checksums = get_checksums(seqs)
-    md5sums = get_md5sums(seqs)
-    analysis = args.format.get_analysis()
-    nrecords = 0
-    for line in analysis.from_file(args.infile):
-        dline = get_line(
-            args.pipeline_version,
-            args.software_version,
-            args.database_version,
-            args.format,
-            line,
-            checksums,
-            md5sums
-        )
-        nrecords += 1
-        print(json.dumps(dline), file=args.outfile)
+    seqs = fasta_checksums(args.infasta, use_cache=args.checksum_cache)
+    checksums = {id_: checksum for id_, checksum, _ in seqs}
+    md5sums = {id_: md5sum for id_, _, md5sum in seqs}
+    lines = convert_file(
+        args.infile,
+        args.format,
+        checksums,
+        md5sums,
+        args.pipeline_version,
+        args.software_version,
+        args.database_version,
+    )
+
+    nrecords = ldjson.write_lines(lines, args.outfile)
 
     if (nrecords == 0) and (len(seqs) > 0):
-        raise ParseError(
-            filename = args.infile.name,
-            line = None,
-            message = (
-                "We could not parse any records from the input file.\n"
-                "It's possible that the input is empty, or that it is in the wrong format.\n"
-                "This can happen if an analysis fails but doesn't tell us that it failed.\n"
-                "Please check the input file indicated above and contact us for help if you need it."
-            )
-        )
+        raise no_records_error(args.infile.name)
     return
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from contextlib import ExitStack
+from typing import NamedTuple, Optional, TextIO
+from collections.abc import Iterable, Iterator
+
+from .. import ldjson
+from ..analyses import Analyses
+from ..checksum_cache import fasta_checksums
+from ..parsers import ParseError
+from .r2js import convert_file, no_records_error
+
+
+def cli(parser: argparse.ArgumentParser) -> None:
+
+    parser.add_argument(
+        "manifest",
+        type=argparse.FileType('r'),
+        help=(
+            "A tab separated file with the columns: analysis, infile, "
+            "software version, and database version. "
+            "The versions can be empty or left out. "
+            "Lines starting with '#' are ignored."
+        )
+    )
+
+    parser.add_argument(
+        "infasta",
+        type=argparse.FileType('r'),
+        help="The fasta file used to calculate results"
+    )
+
+    parser.add_argument(
+        "-o", "--outfile",
+        type=argparse.FileType('w'),
+        default=sys.stdout,
+        help=(
+            "Where to write the output for all analyses to. "
+            "Ignored if --template is given. Default: stdout"
+        )
+    )
+
+    parser.add_argument(
+        "-t", "--template",
+        type=str,
+        default=None,
+        help=(
+            "Write each analysis to a separate file instead, using this "
+            "template for the filenames, e.g. '{analysis}.ldjson'. "
+            "Can use python `.format` style variable analysis. "
+            "Directories will be created."
+        )
+    )
+
+    parser.add_argument(
+        "--pipeline-version",
+        dest="pipeline_version",
+        type=str,
+        default=None,
+        help="The version of predector that you're running."
+    )
+
+    parser.add_argument(
+        "--no-checksum-cache",
+        dest="checksum_cache",
+        action="store_false",
+        default=True,
+        help=(
+            "Don't read or write the checksums of the fasta file to a "
+            "'.checksums' file alongside it."
+        ),
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="The number of files to convert at the same time. Default: 1"
+    )
+    return
+
+
+class ManifestEntry(NamedTuple):
+
+    analysis: Analyses
+    infile: str
+    software_version: Optional[str]
+    database_version: Optional[str]
+
+
+def parse_manifest(handle: TextIO) -> list[ManifestEntry]:
+    filename = getattr(handle, "name", None)
+    entries = []
+
+    for i, line in enumerate(handle, 1):
+        line = line.rstrip("\r\n")
+        if (line.strip() == "") or line.startswith("#"):
+            continue
+
+        fields = line.split("\t")
+        if not (2 <= len(fields) <= 4):
+            raise ParseError(
+                filename,
+                i,
+                "Expected 2 to 4 tab separated columns but got "
+                f"{len(fields)}."
+            )
+
+        try:
+            analysis = Analyses.from_string(fields[0])
+        except ValueError as e:
+            raise ParseError(filename, i, str(e))
+
+        # The versions are optional.
+        fields.extend([""] * (4 - len(fields)))
+        versions = [None if v == "" else v for v in fields[2:]]
+
+        entries.append(ManifestEntry(analysis, fields[1], *versions))
+    return entries
+
+
+def read_entry(
+    entry: ManifestEntry,
+    checksums: dict[str, str],
+    md5sums: dict[str, str],
+    pipeline_version: Optional[str],
+) -> Iterator[str]:
+    """ Converts one results file, yielding the JSON lines. """
+
+    with open(entry.infile, "r") as handle:
+        yield from convert_file(
+            handle,
+            entry.analysis,
+            checksums,
+            md5sums,
+            pipeline_version,
+            entry.software_version,
+            entry.database_version,
+        )
+    return
+
+
+# The fasta checksums in a worker process, set once by init_worker
+# instead of being pickled with every file.
+WORKER_CHECKSUMS: dict[str, str] = {}
+WORKER_MD5SUMS: dict[str, str] = {}
+
+
+def init_worker(checksums: dict[str, str], md5sums: dict[str, str]) -> None:
+    global WORKER_CHECKSUMS, WORKER_MD5SUMS
+    WORKER_CHECKSUMS = checksums
+    WORKER_MD5SUMS = md5sums
+    return
+
+
+def convert_entry(
+    entry: ManifestEntry,
+    pipeline_version: Optional[str],
+) -> list[str]:
+    """ Converts one results file in a worker process. """
+
+    try:
+        return list(read_entry(
+            entry,
+            WORKER_CHECKSUMS,
+            WORKER_MD5SUMS,
+            pipeline_version
+        ))
+    except ParseError as e:
+        # Errors raised with keyword arguments can't be sent back from a
+        # process pool.
+        raise ParseError(e.filename, e.line, e.message) from None
+
+
+def convert_entries(
+    entries: list[ManifestEntry],
+    checksums: dict[str, str],
+    md5sums: dict[str, str],
+    pipeline_version: Optional[str],
+    jobs: int = 1,
+) -> Iterator[tuple[ManifestEntry, Iterable[str]]]:
+    """ Converts the results files, yielding them in the manifest order.
+
+    With one job the lines of each file are converted as they are
+    consumed, so each must be consumed before the next is requested.
+    """
+
+    if jobs <= 1:
+        for entry in entries:
+            yield entry, read_entry(
+                entry,
+                checksums,
+                md5sums,
+                pipeline_version
+            )
+        return
+
+    pending: deque[tuple[ManifestEntry, Future[list[str]]]] = deque()
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(checksums, md5sums),
+    ) as executor:
+        for entry in entries:
+            pending.append((entry, executor.submit(
+                convert_entry,
+                entry,
+                pipeline_version
+            )))
+
+            if len(pending) >= (2 * jobs):
+                entry, future = pending.popleft()
+                yield entry, future.result()
+
+        while len(pending) > 0:
+            entry, future = pending.popleft()
+            yield entry, future.result()
+    return
+
+
+def open_template(
+    stack: ExitStack,
+    template: str,
+    analysis: Analyses,
+) -> TextIO:
+    fname = template.format(analysis=str(analysis))
+    dname = os.path.dirname(fname)
+    if dname != '':
+        os.makedirs(dname, exist_ok=True)
+
+    return stack.enter_context(open(fname, "w"))
+
+
+def runner(args: argparse.Namespace) -> None:
+    entries = parse_manifest(args.manifest)
+
+    # The fasta is only read once for all of the analyses.
+    seqs = fasta_checksums(args.infasta, use_cache=args.checksum_cache)
+    checksums = {id_: checksum for id_, checksum, _ in seqs}
+    md5sums = {id_: md5sum for id_, _, md5sum in seqs}
+
+    with ExitStack() as stack:
+        handles: dict[Analyses, TextIO] = {}
+
+        for entry, lines in convert_entries(
+            entries,
+            checksums,
+            md5sums,
+            args.pipeline_version,
+            args.jobs,
+        ):
+            if args.template is None:
+                handle = args.outfile
+            elif entry.analysis in handles:
+                handle = handles[entry.analysis]
+            else:
+                handle = open_template(stack, args.template, entry.analysis)
+                handles[entry.analysis] = handle
+
+            nrecords = ldjson.write_lines(lines, handle)
+
+            if (nrecords == 0) and (len(checksums) > 0):
+                raise no_records_error(entry.infile)
+    return
@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 
 import sys
+import json
+import heapq
+import hashlib
 import argparse
 
 from math import floor
-from statistics import median
+from contextlib import ExitStack
+from tempfile import TemporaryFile
+from typing import Optional, Union, TextIO
+from collections.abc import Iterator, Iterable
 
 import sqlite3
 
-from typing import Optional
-
 import numpy as np
 import pandas as pd
 import xgboost as xgb
 
+from .. import __version__
 from ..analyses import Analyses
 from ..database import ResultsTable
+from ..features import (
+    FeatureTable,
+    FEATURE_COLUMNS,
+    register_aggregates,
+)
 from ..data import (
     get_interesting_dbcan_ids,
     get_ltr_model,
@@ -47,6 +57,28 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help=(
+            "Store the ranked table in the database, and only re-score "
+            "proteins whose results have changed since the last "
+            "incremental run. Changing any of the weights or dbcan "
+            "targets causes everything to be re-scored."
+        )
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help=(
+            "Score this many proteins at a time, to limit memory use. "
+            "By default everything is scored at once."
+        )
+    )
+
     parser.add_argument(
         "--dbcan",
         type=argparse.FileType('r'),
@@ -293,644 +325,6 @@ def agg_dbcan_vir() -> str:
     return s
 
 
-class AggBase(object):
-
-    nargs: int
-    analysis: Analyses
-    sql_fname: str
-
-    def __init__(self) -> None:
-        raise NotImplementedError("this is a baseclass")
-
-
-class AggPhobiusTMDomains(AggBase):
-
-    nargs = 1
-    analysis = Analyses.phobius
-    sql_fname = "agg_phobius_domains"
-
-    def __init__(self) -> None:
-        self.matches: list[tuple[int, int]] = []
-        return
-
-    def step(self, data: str) -> None:
-        from ..analyses import GFFAble
-        an = (
-            Analyses(self.analysis)
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, GFFAble)
-
-        for gffrow in an.as_gff():
-            if gffrow.type != "transmembrane_polypeptide_region":
-                continue
-
-            self.matches.append((gffrow.start + 1, gffrow.end))
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-
-        return "tm:" + ",".join(
-            f"{s}-{e}"
-            for s, e
-            in sorted(self.matches, key=lambda t: t[0])
-        )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            f"{cls.sql_fname}(data)"
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-        )
-
-
-class AggTMHMMDomains(AggBase):
-
-    nargs = 1
-    analysis = Analyses.tmhmm
-    sql_fname = "agg_tmhmm_domains"
-
-    def __init__(self) -> None:
-        self.matches: list[tuple[int, int]] = []
-        return
-
-    def step(self, data: str) -> None:
-        from ..analyses import GFFAble
-        an = (
-            Analyses(self.analysis)
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, GFFAble)
-
-        for gffrow in an.as_gff():
-            if gffrow.type != "transmembrane_polypeptide_region":
-                continue
-
-            self.matches.append((gffrow.start + 1, gffrow.end))
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-
-        return "tm:" + ",".join(
-            f"{s}-{e}"
-            for s, e
-            in sorted(self.matches, key=lambda t: t[0])
-        )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            f"{cls.sql_fname}(data)"
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-        )
-
-
-class AggTMSPCoverage(AggBase):
-
-    nargs = 2
-    analyses = [
-        Analyses.signalp3_hmm,
-        Analyses.signalp3_nn,
-        Analyses.signalp4,
-        Analyses.signalp5,
-        Analyses.signalp6,
-        Analyses.deepsig,
-        Analyses.phobius,
-        Analyses.tmhmm
-    ]
-    sql_fname = "agg_tmsp_coverage"
-
-    def __init__(self) -> None:
-        self.signals: list[int] = []
-        self.membranes: list[tuple[int, int]] = []
-        return
-
-    def step(self, analysis: int, data: str) -> None:
-        from ..analyses import GFFAble
-        an = (
-            Analyses(analysis)
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, GFFAble)
-
-        for gffrow in an.as_gff():
-            if gffrow.type == "signal_peptide":
-                self.signals.append(gffrow.end)
-            elif gffrow.type == "transmembrane_polypeptide_region":
-                self.membranes.append((gffrow.start, gffrow.end))
-        return
-
-    def finalize(self) -> float:
-        if len(self.signals) == 0:
-            return 0.0
-
-        if len(self.membranes) == 0:
-            return 0.0
-
-        tm = sorted(self.membranes, key=lambda t: t[0])[0]
-        covs = [self.gff_coverage(sp, tm) for sp in self.signals]
-        return median(covs)
-
-    @classmethod
-    def sql_query(cls) -> str:
-        sources = ",".join(str(int(a)) for a in cls.analyses)
-
-        return (
-            f"{cls.sql_fname}(analysis, data)"
-            f"FILTER (WHERE analysis IN ({sources}))"
-        )
-
-    def gff_intersection(self, sp: int, tm: tuple[int, int]) -> int:
-        lstart = 0
-        lend = sp
-
-        rstart = min(tm)
-        rend = max(tm)
-
-        start = max([lstart, rstart])
-        end = min([lend, rend])
-
-        # This will be < 0 if they don't overlap
-        if start < end:
-            return end - start
-        else:
-            return 0
-
-    def gff_coverage(self, sp: int, tm: tuple[int, int]) -> float:
-        noverlap = self.gff_intersection(sp, tm)
-        rstart, rend = tm
-        return noverlap / (rend - rstart)
-
-
-class AggSPCutsite(AggBase):
-
-    nargs = 2
-    analyses = [
-        Analyses.signalp3_hmm,
-        Analyses.signalp3_nn,
-        Analyses.signalp4,
-        Analyses.signalp5,
-        Analyses.signalp6,
-        Analyses.deepsig,
-        Analyses.phobius
-    ]
-    sql_fname = "agg_sp_cutsite"
-
-    def __init__(self) -> None:
-        self.matches: list[tuple[str, int]] = []
-        return
-
-    def step(self, analysis: int, data: str) -> None:
-        from ..analyses import GFFAble
-        an = (
-            Analyses(analysis)
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, GFFAble)
-
-        for gffrow in an.as_gff():
-            if gffrow.type != "signal_peptide":
-                continue
-
-            self.matches.append((an.__class__.__name__, gffrow.end))
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-
-        return ",".join(
-            f"{n}:{e}"
-            for n, e
-            in sorted(self.matches, key=lambda t: t[1])
-        )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        sources = ",".join(str(int(a)) for a in cls.analyses)
-
-        return (
-            f"{cls.sql_fname}(analysis, data)"
-            f"FILTER (WHERE analysis IN ({sources}))"
-        )
-
-
-class AggKex2(AggBase):
-    nargs = 4
-    analysis = Analyses.kex2_cutsite
-    sql_fname = "agg_kex2"
-
-    def __init__(self) -> None:
-        self.matches: dict[tuple[str, int, int], set[str]] = dict()
-        return
-
-    def step(
-        self,
-        pattern: str,
-        match: str,
-        start: int,
-        end: int
-    ) -> None:
-        pattern = pattern.replace("[A-Z]", "X")
-        tup = (match, start + 1, end)
-        if tup in self.matches:
-            self.matches[tup].add(pattern)
-        else:
-            self.matches[tup] = {pattern}
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-        else:
-            return ",".join(
-                f"{m}:{'&'.join(ps)}:{s}-{e}"
-                for (m, s, e), ps
-                in sorted(self.matches.items(), key=lambda t: t[0][1])
-            )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            f"{cls.sql_fname}("
-            "json_extract(data, '$.pattern'), "
-            "json_extract(data, '$.match'), "
-            "json_extract(data, '$.start'), "
-            "json_extract(data, '$.end')"
-            ") "
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-        )
-
-
-class AggRxLR(AggBase):
-    nargs = 3
-    analysis = Analyses.rxlr_like_motif
-    sql_fname = "agg_rxlr"
-
-    def __init__(self) -> None:
-        self.matches: list[tuple[str, int, int]] = []
-        return
-
-    def step(
-        self,
-        match: str,
-        start: int,
-        end: int
-    ) -> None:
-        self.matches.append((match, start + 1, end))
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-        else:
-            return ",".join(
-                f"{m}:{s}-{e}"
-                for (m, s, e)
-                in sorted(self.matches, key=lambda t: t[1])
-            )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            f"{cls.sql_fname}("
-            "json_extract(data, '$.match'), "
-            "json_extract(data, '$.start'), "
-            "json_extract(data, '$.end')"
-            ") "
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-        )
-
-
-class AggPHIMatches(AggBase):
-    nargs = 1
-    index: int
-
-    def __init__(self) -> None:
-        self.matches: dict[str, float] = dict()
-        return
-
-    def step(self, data: str) -> None:
-        from ..analyses import MMSeqs
-        an = (
-            self.analysis
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, MMSeqs)
-
-        if an.decide_significant():
-            si = an.target.strip().split("#")
-            assert len(si) == 6
-            matches = set(si[self.index].split("__"))
-            for match in matches:
-                if match in self.matches:
-                    if an.evalue < self.matches[match]:
-                        self.matches[match] = an.evalue
-                else:
-                    self.matches[match] = an.evalue
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-        else:
-            return ",".join(
-                k
-                for k, _
-                in sorted(self.matches.items(), key=lambda t: t[1])
-            )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            f"{cls.sql_fname}(data) "
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-        )
-
-
-class AggPHIPhenos(AggPHIMatches):
-    nargs = 1
-    sql_fname = "agg_phi_phenos"
-    analysis = Analyses.phibase
-    index = 5
-
-
-class AggPHIIDs(AggPHIMatches):
-    nargs = 1
-    sql_fname = "agg_phi_ids"
-    analysis = Analyses.phibase
-    index = 1
-
-
-class AggPHIGenes(AggPHIMatches):
-    nargs = 1
-    sql_fname = "agg_phi_genes"
-    analysis = Analyses.phibase
-    index = 2
-
-
-class AggPHIHasMatch(AggBase):
-    nargs = 1
-    analysis = Analyses.phibase
-    index = 5
-    targets: set[str]
-
-    def __init__(self) -> None:
-        self.phenos: set[str] = set()
-        return
-
-    def step(self, data: str) -> None:
-        from ..analyses import MMSeqs
-        an = (
-            self.analysis
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, MMSeqs)
-        if an.decide_significant():
-            si = an.target.strip().split("#")
-            assert len(si) == 6
-            phenos = set(si[self.index].lower().split("__"))
-            self.phenos.update(phenos)
-        return
-
-    def finalize(self) -> bool:
-        if len(self.phenos) == 0:
-            return False
-        return len(
-            self.phenos.intersection(self.targets)
-        ) > 0
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            "IFNULL("
-            f"{cls.sql_fname}(data) "
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-            ", 0)"
-        )
-
-
-class AggPHIEffectorMatch(AggPHIHasMatch):
-    sql_fname = "agg_phi_ematch"
-    targets = {
-        "loss_of_pathogenicity",
-        "increased_virulence_(hypervirulence)",
-        "effector_(plant_avirulence_determinant)"
-    }
-
-
-class AggPHIVirulenceMatch(AggPHIHasMatch):
-    sql_fname = "agg_phi_vmatch"
-    targets = {"reduced_virulence"}
-
-
-class AggPHILethalMatch(AggPHIHasMatch):
-    sql_fname = "agg_phi_lmatch"
-    targets = {"lethal"}
-
-
-class AggHMMER(AggBase):
-    nargs = 1
-
-    def __init__(self) -> None:
-        self.matches: dict[str, float] = {}
-        return
-
-    def step(self, data: str) -> None:
-        from ..analyses import DomTbl
-        an = (
-            self.analysis
-            .get_analysis()
-            .from_json_str(data)
-        )
-
-        assert isinstance(an, DomTbl)
-
-        if an.decide_significant():
-            if an.hmm in self.matches:
-                if self.matches[an.hmm] > an.domain_i_evalue:
-                    self.matches[an.hmm] = an.domain_i_evalue
-            else:
-                self.matches[an.hmm] = an.domain_i_evalue
-
-        return
-
-    def finalize(self) -> Optional[str]:
-        if len(self.matches) == 0:
-            return None
-
-        return ",".join(
-            k
-            for k, _
-            in sorted(self.matches.items(), key=lambda t: t[1])
-        )
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (
-            f"{cls.sql_fname}(data) "
-            f"FILTER (WHERE analysis = {int(cls.analysis)})"
-        )
-
-
-class AggEffectorDB(AggHMMER):
-    analysis = Analyses.effectordb
-    sql_fname = "agg_effdb"
-
-
-class AggDBCAN(AggHMMER):
-    analysis = Analyses.dbcan
-    sql_fname = "agg_dbcan"
-
-
-class AggSperProb(AggBase):
-    nargs = 2
-    pred_col: str
-    prob_col: str
-    pos_values: list[str]
-
-    def __init__(self) -> None:
-        self.prob: Optional[float] = None
-        return
-
-    def step(self, prob: float, pred: str) -> None:
-        if (self.prob is not None) and (self.prob != prob):
-            raise ValueError("This shouldn't happen!")
-
-        if pred in self.pos_values:
-            self.prob = prob
-        else:
-            self.prob = 1 - prob
-        return
-
-    def finalize(self) -> Optional[float]:
-        return self.prob
-
-    @classmethod
-    def sql_query(cls) -> str:
-        return (  # noqa
-            f"{cls.sql_fname}("
-                f"json_extract(data, '$.{cls.prob_col}'), "
-                f"json_extract(data, '$.{cls.pred_col}')"
-            f') FILTER (WHERE analysis = {int(cls.analysis)})'
-        )
-
-
-class AggEP1(AggSperProb):
-
-    sql_fname = "agg_ep1"
-    prob_col = "prob"
-    pred_col = "prediction"
-    analysis = Analyses.effectorp1
-
-    pos_values = ["Effector"]
-
-
-class AggEP2(AggSperProb):
-
-    sql_fname = "agg_ep2"
-    prob_col = "prob"
-    pred_col = "prediction"
-    analysis = Analyses.effectorp2
-
-    pos_values = ["Effector", "Unlikely effector"]
-
-
-class AggApoplastP(AggSperProb):
-
-    sql_fname = "agg_apoplastp"
-    prob_col = "prob"
-    pred_col = "prediction"
-    analysis = Analyses.apoplastp
-
-    pos_values = ["Apoplastic"]
-
-
-def agg_json(field: str, analysis: str) -> str:
-    an = Analyses.from_string(analysis)
-    return (
-        f"MAX(json_extract(data, '$.{field}')) "
-        f"FILTER (WHERE analysis = {int(an)})"
-    )
-
-
-# This variant makes sure it's between 0 and 1
-def agg_json_prob(field: str, analysis: str) -> str:
-    an = Analyses.from_string(analysis)
-
-    filtered = (
-        f"(MAX(json_extract(data, '$.{field}')) "
-        f"FILTER (WHERE analysis = {int(an)}))"
-    )
-
-    return f"MAX(MIN(({filtered}), 1.0), 0.0)"
-
-
-# Checks if it is a value
-def agg_json_eq_str(field: str, value: str, analysis: str) -> str:
-    an = Analyses.from_string(analysis)
-
-    return (
-        f"MAX(json_extract(data, '$.{field}') == '{value}') "
-        f"FILTER (WHERE analysis = {int(an)})"
-    )
-
-
-def agg_deepsig(pred: str) -> str:
-    an = Analyses.deepsig
-
-    filtered = (  # noqa
-        "MAX(json_extract(data, '$.prob'))"
-        "FILTER ("
-            f"WHERE analysis = {int(an)} "
-            f"AND json_extract(data, '$.prediction') == '{pred}'"
-        ")"
-    )
-
-    return f"MAX(MIN(({filtered}), 1.0), 0.0)"
-
-
-def agg_fkyin_gap() -> str:
-    an = Analyses.pepstats
-
-    template = (
-        "(MAX(json_extract(data, '$.{field}')) "
-        f"FILTER (WHERE analysis = {int(an)}))"
-    )
-
-    col_template = "residue_{}_number"
-
-    numerator = "+".join([
-        template.format(field=col_template.format(b))
-        for b
-        in "fkyin"
-    ])
-
-    denominator = " + ".join([
-        template.format(field=col_template.format(b))
-        for b
-        in "gap"
-    ])
-
-    return f"((1.0 * {numerator} + 1) / (1.0 * {denominator} + 1))"
-
-
 def load_db(
     path: str,
     mem: float
@@ -939,14 +333,7 @@ def load_db(
     con = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
     con.row_factory = sqlite3.Row
 
-    for c in [
-        AggEP1, AggEP2, AggApoplastP, AggEffectorDB, AggDBCAN,
-        AggPHIPhenos, AggPHIIDs, AggPHIGenes,
-        AggPHIEffectorMatch, AggPHIVirulenceMatch, AggPHILethalMatch,
-        AggKex2, AggRxLR,
-        AggSPCutsite, AggTMSPCoverage, AggTMHMMDomains, AggPhobiusTMDomains
-    ]:
-        con.create_aggregate(c.sql_fname, c.nargs, c)  # type: ignore
+    register_aggregates(con)
 
     cur = con.cursor()
     # Allow it to use 1GB RAM for cache
@@ -1009,104 +396,243 @@ def create_select_all_table(tab: ResultsTable) -> None:
     return
 
 
+# These are filled in after the features are fetched from the database.
+PLACEHOLDER_COLUMNS = [
+    "effector_score",
+    "manual_effector_score",
+    "manual_secretion_score",
+    "is_secreted",
+    "any_signal_peptide",
+    "single_transmembrane",
+    "multiple_transmembrane",
+]
+
+RANK_COLUMNS = [
+    "name",
+    "effector_score",
+    "manual_effector_score",
+    "manual_secretion_score",
+    "effector_matches",
+    "phibase_genes",
+    "phibase_phenotypes",
+    "phibase_ids",
+    "has_phibase_effector_match",
+    "has_phibase_virulence_match",
+    "has_phibase_lethal_match",
+    "dbcan_matches",
+    "has_dbcan_virulence_match",
+    "effectorp1",
+    "effectorp2",
+    "effectorp3_cytoplasmic",
+    "effectorp3_apoplastic",
+    "effectorp3_noneffector",
+    "deepredeff_fungi",
+    "deepredeff_oomycete",
+    "apoplastp",
+    "is_secreted",
+    "any_signal_peptide",
+    "single_transmembrane",
+    "multiple_transmembrane",
+    "molecular_weight",
+    "residue_number",
+    "charge",
+    "isoelectric_point",
+    "aa_c_number",
+    "aa_tiny_number",
+    "aa_small_number",
+    "aa_aliphatic_number",
+    "aa_aromatic_number",
+    "aa_nonpolar_number",
+    "aa_charged_number",
+    "aa_basic_number",
+    "aa_acidic_number",
+    "fykin_gap",
+    "kex2_cutsites",
+    "rxlr_like_motifs",
+    "localizer_nucleus",
+    "localizer_chloro",
+    "localizer_mito",
+    "signal_peptide_cutsites",
+    "signalp3_nn",
+    "signalp3_hmm",
+    "signalp4",
+    "signalp5",
+    "signalp6",
+    "deepsig",
+    "phobius_sp",
+    "phobius_tmcount",
+    "phobius_tm_domains",
+    "tmhmm_tmcount",
+    "tmhmm_first_60",
+    "tmhmm_exp_aa",
+    "tmhmm_first_tm_sp_coverage",
+    "tmhmm_domains",
+    "targetp_secreted",
+    "targetp_secreted_prob",
+    "targetp_mitochondrial_prob",
+    "deeploc_membrane",
+    "deeploc_nucleus",
+    "deeploc_cytoplasm",
+    "deeploc_extracellular",
+    "deeploc_mitochondrion",
+    "deeploc_cell_membrane",
+    "deeploc_endoplasmic_reticulum",
+    "deeploc_plastid",
+    "deeploc_golgi",
+    "deeploc_lysosome",
+    "deeploc_peroxisome",
+    "signalp3_nn_d",
+    "signalp3_hmm_s",
+    "signalp4_d",
+    "signalp5_prob",
+    "signalp6_prob",
+    "deepsig_signal_prob",
+    "deepsig_transmembrane_prob",
+    "deepsig_other_prob",
+]
+
+
+# The incremental cache is keyed by checksum rather than name.
+CACHE_COLUMNS = ["checksum"] + [c for c in RANK_COLUMNS if c != "name"]
+
+
+def select_rank_columns(
+    exprs: dict[str, str],
+    columns: Optional[list[str]] = None,
+) -> str:
+    """ Builds the select clause for the rank table.
+
+    exprs maps column names to the SQL expression used to get them.
+    Placeholder columns are filled with NULL unless they are in exprs.
+    """
+    if columns is None:
+        columns = RANK_COLUMNS
+
+    selected = []
+    for column in columns:
+        if (column in PLACEHOLDER_COLUMNS) and (column not in exprs):
+            expr = "NULL"
+        else:
+            expr = exprs[column]
+
+        selected.append(f"{expr} as {column}")
+
+    return ",\n".join(selected)
+
+
+def create_tables_from_results(
+    tab: ResultsTable,
+    pending: bool = False,
+) -> pd.DataFrame:
+    """ Fetches the rank table by aggregating all results.
+
+    If pending is True, only the checksums in the rank_pending table
+    are aggregated, and the table has a checksum column instead of a name.
+    """
+
+    exprs = {name: expr for name, _, expr in FEATURE_COLUMNS}
+    exprs["name"] = "name"
+    exprs["checksum"] = "checksum"
+    exprs["has_dbcan_virulence_match"] = agg_dbcan_vir()
+
+    if pending:
+        FeatureTable(tab.con, tab.cur).create_source_view()
+        return pd.read_sql_query(
+            f"""
+            SELECT
+                {select_rank_columns(exprs, CACHE_COLUMNS)}
+            FROM feature_source
+            WHERE checksum IN (SELECT checksum FROM rank_pending)
+            GROUP BY checksum
+            ORDER BY checksum
+            """,
+            tab.con
+        )
+
+    create_select_all_table(tab)
+    return pd.read_sql_query(
+        f"""
+        SELECT
+            {select_rank_columns(exprs)}
+        FROM rank_table
+        GROUP BY name, checksum
+        """,
+        tab.con
+    )
+
+
+def create_tables_from_features(
+    tab: ResultsTable,
+    pending: bool = False,
+) -> pd.DataFrame:
+    """ Fetches the rank table using the precomputed features table.
+
+    This avoids running the aggregate functions over all of the results.
+    If pending is True, only the checksums in the rank_pending table
+    are selected, and the table has a checksum column instead of a name.
+    """
+
+    assert tab.exists_table("decoder"), "no decoder table"
+
+    exprs = {name: f"f.{name}" for name, _, _ in FEATURE_COLUMNS}
+    exprs["name"] = "d.name"
+    exprs["checksum"] = "d.checksum"
+
+    if pending:
+        columns = CACHE_COLUMNS
+        source = "rank_pending d"
+        order = "d.checksum"
+    else:
+        columns = RANK_COLUMNS
+        source = "(SELECT DISTINCT name, checksum FROM decoder) d"
+        order = "d.name, d.checksum"
+
+    if tab.exists_table(f"results_{Analyses.dbcan}"):
+        dbcan_join = f"""
+        LEFT JOIN (
+            SELECT
+                checksum,
+                MAX(json_extract(data, '$.hmm') IN dbcan_targets)
+                    AS has_dbcan_virulence_match
+            FROM results_{Analyses.dbcan}
+            GROUP BY checksum
+        ) v
+            ON d.checksum = v.checksum
+        """
+        exprs["has_dbcan_virulence_match"] = (
+            "IFNULL(v.has_dbcan_virulence_match, 0)"
+        )
+    else:
+        dbcan_join = ""
+        exprs["has_dbcan_virulence_match"] = "0"
+
+    return pd.read_sql_query(
+        f"""
+        SELECT
+            {select_rank_columns(exprs, columns)}
+        FROM {source}
+        INNER JOIN features f
+            ON d.checksum = f.checksum
+        {dbcan_join}
+        ORDER BY {order}
+        """,
+        tab.con
+    )
+
+
 def create_tables(
     con: sqlite3.Connection,
     cur: sqlite3.Cursor,
     dbcan_targets: set[str],
     tmhmm_first_60_threshold: float = 10,
+    pending: bool = False,
 ) -> pd.DataFrame:
     tab = ResultsTable(con, cur)
-    create_select_all_table(tab)
 
-    table = pd.read_sql_query(
-        f""" --  # noqa
-        SELECT
-            name,
-            NULL as effector_score,
-            NULL as manual_effector_score,
-            NULL as manual_secretion_score,
-            {AggEffectorDB.sql_query()} as effector_matches,
-            {AggPHIGenes.sql_query()} as phibase_genes,
-            {AggPHIPhenos.sql_query()} as phibase_phenotypes,
-            {AggPHIIDs.sql_query()} as phibase_ids,
-            {AggPHIEffectorMatch.sql_query()} as has_phibase_effector_match,
-            {AggPHIVirulenceMatch.sql_query()} as has_phibase_virulence_match,
-            {AggPHILethalMatch.sql_query()} as has_phibase_lethal_match,
-            {AggDBCAN.sql_query()} as dbcan_matches,
-            {agg_dbcan_vir()} as has_dbcan_virulence_match,
-            {AggEP1.sql_query()} as effectorp1,
-            {AggEP2.sql_query()} as effectorp2,
-            {agg_json('cytoplasmic_prob', 'effectorp3')} as effectorp3_cytoplasmic,
-            {agg_json('apoplastic_prob', 'effectorp3')} as effectorp3_apoplastic,
-            {agg_json('noneffector_prob', 'effectorp3')} as effectorp3_noneffector,
-            {agg_json('s_score', 'deepredeff_fungi')} as deepredeff_fungi,
-            {agg_json('s_score', 'deepredeff_oomycete')} as deepredeff_oomycete,
-            {AggApoplastP.sql_query()} as apoplastp,
-            NULL as is_secreted,
-            NULL as any_signal_peptide,
-            NULL as single_transmembrane,
-            NULL as multiple_transmembrane,
-            {agg_json('molecular_weight', 'pepstats')} as molecular_weight,
-            {agg_json('residues', 'pepstats')} as residue_number,
-            {agg_json('charge', 'pepstats')} as charge,
-            {agg_json('isoelectric_point', 'pepstats')} as isoelectric_point,
-            {agg_json('residue_c_number', 'pepstats')} as aa_c_number,
-            {agg_json('property_tiny_number', 'pepstats')} as aa_tiny_number,
-            {agg_json('property_small_number', 'pepstats')} as aa_small_number,
-            {agg_json('property_aliphatic_number', 'pepstats')} as aa_aliphatic_number,
-            {agg_json('property_aromatic_number', 'pepstats')} as aa_aromatic_number,
-            {agg_json('property_nonpolar_number', 'pepstats')} as aa_nonpolar_number,
-            {agg_json('property_charged_number', 'pepstats')} as aa_charged_number,
-            {agg_json('property_basic_number', 'pepstats')} as aa_basic_number,
-            {agg_json('property_acidic_number', 'pepstats')} as aa_acidic_number,
-            {agg_fkyin_gap()} as fykin_gap,
-            {AggKex2.sql_query()} as kex2_cutsites,
-            {AggRxLR.sql_query()} as rxlr_like_motifs,
-            {agg_json('nucleus_decision', 'localizer')} as localizer_nucleus,
-            {agg_json('chloroplast_decision', 'localizer')} as localizer_chloro,
-            {agg_json('mitochondria_decision', 'localizer')} as localizer_mito,
-            {AggSPCutsite.sql_query()} as signal_peptide_cutsites,
-            {agg_json('d_decision', 'signalp3_nn')} as signalp3_nn,
-            {agg_json('is_secreted', 'signalp3_hmm')} as signalp3_hmm,
-            {agg_json('decision', 'signalp4')} as signalp4,
-            {agg_json_eq_str("prediction", "SP(Sec/SPI)", "signalp5")} as signalp5,
-            {agg_json_eq_str("prediction", "SP", "signalp6")} as signalp6,
-            {agg_json_eq_str("prediction", "SignalPeptide", "deepsig")} as deepsig,
-            {agg_json('sp', 'phobius')} as phobius_sp,
-            {agg_json('tm', 'phobius')} as phobius_tmcount,
-            {AggPhobiusTMDomains.sql_query()} as phobius_tm_domains,
-            {agg_json('pred_hel', 'tmhmm')} as tmhmm_tmcount,
-            {agg_json('first_60', 'tmhmm')} as tmhmm_first_60,
-            {agg_json('exp_aa', 'tmhmm')} as tmhmm_exp_aa,
-            {AggTMSPCoverage.sql_query()} as tmhmm_first_tm_sp_coverage,
-            {AggTMHMMDomains.sql_query()} as tmhmm_domains,
-            {agg_json_eq_str('prediction', 'SP', 'targetp_non_plant')} as targetp_secreted,
-            {agg_json_prob('sp', 'targetp_non_plant')} as targetp_secreted_prob,
-            {agg_json_prob('mtp', 'targetp_non_plant')} as targetp_mitochondrial_prob,
-            {agg_json_prob('membrane', 'deeploc')} as deeploc_membrane,
-            {agg_json_prob('nucleus', 'deeploc')} as deeploc_nucleus,
-            {agg_json_prob('cytoplasm', 'deeploc')} as deeploc_cytoplasm,
-            {agg_json_prob('extracellular', 'deeploc')} as deeploc_extracellular,
-            {agg_json_prob('mitochondrion', 'deeploc')} as deeploc_mitochondrion,
-            {agg_json_prob('cell_membrane', 'deeploc')} as deeploc_cell_membrane,
-            {agg_json_prob('endoplasmic_reticulum', 'deeploc')} as deeploc_endoplasmic_reticulum,
-            {agg_json_prob('plastid', 'deeploc')} as deeploc_plastid,
-            {agg_json_prob('golgi_apparatus', 'deeploc')} as deeploc_golgi,
-            {agg_json_prob('lysosome_vacuole', 'deeploc')} as deeploc_lysosome,
-            {agg_json_prob('peroxisome', 'deeploc')} as deeploc_peroxisome,
-            {agg_json('d', 'signalp3_nn')} as signalp3_nn_d,
-            {agg_json('sprob', 'signalp3_hmm')} as signalp3_hmm_s,
-            {agg_json('d', 'signalp4')} as signalp4_d,
-            {agg_json_prob('prob_signal', 'signalp5')} as signalp5_prob,
-            {agg_json_prob('prob_signal', 'signalp6')} as signalp6_prob,
-            {agg_deepsig("SignalPeptide")} as deepsig_signal_prob,
-            {agg_deepsig("Transmembrane")} as deepsig_transmembrane_prob,
-            {agg_deepsig("Other")} as deepsig_other_prob
-        FROM rank_table
-        GROUP BY name, checksum
-        """,
-        con
-    )
+    if FeatureTable(con, cur).exists():
+        table = create_tables_from_features(tab, pending=pending)
+    else:
+        table = create_tables_from_results(tab, pending=pending)
 
     table["any_signal_peptide"] = decide_any_signal(table)
     table["multiple_transmembrane"] = decide_is_multi_tm(table)
@@ -1386,24 +912,309 @@ def run_ltr(df: pd.DataFrame) -> np.ndarray:
     return model.predict(dmat)
 
 
-def inner(
-    con: sqlite3.Connection,
-    cur: sqlite3.Cursor,
-    args: argparse.Namespace
-) -> None:
-    if args.dbcan is not None:
-        dbcan: set[str] = {d.strip() for d in args.dbcan.readlines()}
-    else:
-        dbcan = set(get_interesting_dbcan_ids())
+# The SQL types of the columns in the rank cache that aren't features.
+CACHE_TYPES = {
+    "effector_score": "real",
+    "manual_effector_score": "real",
+    "manual_secretion_score": "real",
+    "is_secreted": "integer",
+    "any_signal_peptide": "integer",
+    "single_transmembrane": "integer",
+    "multiple_transmembrane": "integer",
+    "has_dbcan_virulence_match": "integer",
+}
+
+
+def rank_parameters_digest(
+    args: argparse.Namespace,
+    dbcan: set[str]
+) -> str:
+    """ A digest of everything other than the results that the scores
+    depend on.
+
+    If any of these change, the whole rank cache must be recomputed.
+    """
+    params = {
+        k: v
+        for k, v
+        in vars(args).items()
+        if k.endswith("_weight") or k.endswith("_threshold")
+    }
+    params["dbcan"] = sorted(dbcan)
+    params["version"] = __version__
+
+    return hashlib.md5(
+        json.dumps(params, sort_keys=True).encode()
+    ).hexdigest()
 
-    create_dbcan_targets(con, cur, dbcan)
 
-    df = create_tables(
-        con,
-        cur,
-        dbcan,
-        args.tmhmm_first_60_threshold
+def create_rank_cache(tab: ResultsTable) -> None:
+    types = {name: type_ for name, type_, _ in FEATURE_COLUMNS}
+    types.update(CACHE_TYPES)
+
+    columns = ",\n".join(
+        f"{column} {types[column]}"
+        for column
+        in CACHE_COLUMNS
+        if column != "checksum"
+    )
+
+    tab.cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS rank_cache (
+            checksum text NOT NULL PRIMARY KEY,
+            fingerprint text NOT NULL,
+            {columns}
+        )
+        """
+    )
+    tab.cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rank_parameters (
+            digest text NOT NULL
+        )
+        """
+    )
+    tab.con.commit()
+    return
+
+
+def create_rank_fingerprints(tab: ResultsTable) -> None:
+    """ Finds a fingerprint of the results contributing to each checksum.
+
+    The fingerprint changes if a result for a new analysis, software
+    version, or database version is added for a checksum, or if the
+    number of rows for any of those changes.
+    """
+
+    query = []
+    for an in Analyses:
+        ans = str(an)
+        anv = an.value
+
+        if not tab.exists_table(f"results_{ans}"):
+            continue
+
+        if an.needs_database():
+            db_col = "database_version"
+        else:
+            db_col = "''"
+
+        q = f"""
+        SELECT
+            checksum,
+            '{anv}:' || software_version || ':' || IFNULL({db_col}, '')
+            || ':' || COUNT(*) || ':' || MAX(rowid) AS part
+        FROM results_{ans}
+        WHERE checksum IN (SELECT checksum FROM decoder)
+        GROUP BY checksum, software_version, {db_col}
+        """
+        query.append(q)
+
+    tab.cur.execute("DROP TABLE IF EXISTS rank_fingerprints")
+    tab.cur.execute(
+        """
+        CREATE TEMP TABLE rank_fingerprints (
+            checksum text NOT NULL PRIMARY KEY,
+            fingerprint text NOT NULL
+        )
+        """
+    )
+
+    if len(query) == 0:
+        return
+
+    tab.cur.execute(
+        f"""
+        INSERT INTO rank_fingerprints (checksum, fingerprint)
+        SELECT checksum, GROUP_CONCAT(part, ';')
+        FROM (
+            {" UNION ALL ".join(query)}
+            ORDER BY checksum, part
+        )
+        GROUP BY checksum
+        """
     )
+    return
+
+
+def find_stale_checksums(tab: ResultsTable, digest: str) -> int:
+    """ Fills the rank_stale table with checksums that need re-scoring.
+
+    Returns the number of checksums that are stale.
+    """
+    create_rank_cache(tab)
+    create_rank_fingerprints(tab)
+
+    old = tab.cur.execute("SELECT digest FROM rank_parameters").fetchone()
+    if (old is None) or (old["digest"] != digest):
+        tab.cur.execute("DELETE FROM rank_cache")
+        tab.cur.execute("DELETE FROM rank_parameters")
+        tab.cur.execute(
+            "INSERT INTO rank_parameters (digest) VALUES (?)",
+            (digest,)
+        )
+
+    tab.cur.execute(
+        """
+        DELETE FROM rank_cache
+        WHERE checksum NOT IN (SELECT checksum FROM rank_fingerprints)
+        """
+    )
+
+    tab.cur.execute("DROP TABLE IF EXISTS rank_stale")
+    tab.cur.execute(
+        """
+        CREATE TEMP TABLE rank_stale (
+            checksum text NOT NULL PRIMARY KEY,
+            fingerprint text NOT NULL
+        )
+        """
+    )
+    tab.cur.execute(
+        """
+        INSERT INTO rank_stale (checksum, fingerprint)
+        SELECT f.checksum, f.fingerprint
+        FROM rank_fingerprints f
+        LEFT JOIN rank_cache c
+            ON f.checksum = c.checksum
+        WHERE c.fingerprint IS NULL OR c.fingerprint != f.fingerprint
+        """
+    )
+    tab.con.commit()
+
+    n = tab.cur.execute("SELECT COUNT(*) FROM rank_stale").fetchone()
+    return n[0]
+
+
+def iter_pending_chunks(
+    tab: ResultsTable,
+    source: str,
+    chunk_size: Optional[int] = None,
+) -> Iterator[int]:
+    """ Fills the rank_pending table with successive chunks of checksums.
+
+    source must be a table or subquery with checksum and fingerprint
+    columns. The checksums are paged through in sorted order so that
+    no statement is left open between chunks.
+    Yields the number of checksums in each chunk.
+    """
+    tab.cur.execute("DROP TABLE IF EXISTS rank_pending")
+    tab.cur.execute(
+        """
+        CREATE TEMP TABLE rank_pending (
+            checksum text NOT NULL PRIMARY KEY,
+            fingerprint text
+        )
+        """
+    )
+
+    limit = -1 if chunk_size is None else chunk_size
+    last = ""
+
+    while True:
+        tab.cur.execute("DELETE FROM rank_pending")
+        tab.cur.execute(
+            f"""
+            INSERT INTO rank_pending (checksum, fingerprint)
+            SELECT checksum, fingerprint
+            FROM {source}
+            WHERE checksum > ?
+            ORDER BY checksum
+            LIMIT ?
+            """,
+            (last, limit)
+        )
+
+        n = tab.cur.rowcount
+        if n <= 0:
+            break
+
+        last = tab.cur.execute(
+            "SELECT MAX(checksum) FROM rank_pending"
+        ).fetchone()[0]
+        yield n
+
+    tab.cur.execute("DROP TABLE IF EXISTS rank_pending")
+    return
+
+
+def attach_names(tab: ResultsTable, df: pd.DataFrame) -> pd.DataFrame:
+    """ Joins the names of the pending checksums onto a chunk. """
+    names = pd.read_sql_query(
+        """
+        SELECT DISTINCT name, checksum
+        FROM decoder
+        WHERE checksum IN (SELECT checksum FROM rank_pending)
+        ORDER BY name, checksum
+        """,
+        tab.con
+    )
+    return names.merge(df, on="checksum", how="inner").loc[:, RANK_COLUMNS]
+
+
+def update_rank_cache(tab: ResultsTable, df: pd.DataFrame) -> None:
+    """ Replaces the rows in the rank cache for the pending checksums. """
+    df = df.loc[:, CACHE_COLUMNS].astype(object)
+    df = df.where(df.notnull(), None)
+
+    tab.cur.execute(
+        "DELETE FROM rank_cache "
+        "WHERE checksum IN (SELECT checksum FROM rank_pending)"
+    )
+
+    columns = ", ".join(CACHE_COLUMNS)
+    placeholders = ", ".join("?" for _ in CACHE_COLUMNS)
+    tab.cur.executemany(
+        f"""
+        INSERT INTO rank_cache (fingerprint, {columns})
+        SELECT fingerprint, {placeholders}
+        FROM rank_pending
+        WHERE checksum = ?
+        """,
+        (
+            row + (row[0],)
+            for row
+            in df.itertuples(index=False, name=None)
+        )
+    )
+    tab.con.commit()
+    return
+
+
+def select_rank_cache(
+    tab: ResultsTable,
+    chunk_size: Optional[int] = None,
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """ Gets the full rank table from the cache.
+
+    If chunk_size is given, an iterator of chunks is returned, already
+    sorted by the effector score.
+    """
+    exprs = {c: f"c.{c}" for c in CACHE_COLUMNS}
+    exprs["name"] = "d.name"
+
+    if chunk_size is None:
+        order = "d.name, d.checksum"
+    else:
+        order = "c.effector_score DESC, d.name, d.checksum"
+
+    return pd.read_sql_query(
+        f"""
+        SELECT
+            {select_rank_columns(exprs)}
+        FROM (SELECT DISTINCT name, checksum FROM decoder) d
+        INNER JOIN rank_cache c
+            ON d.checksum = c.checksum
+        ORDER BY {order}
+        """,
+        tab.con,
+        chunksize=chunk_size
+    )
+
+
+def score_table(df: pd.DataFrame, args: argparse.Namespace) -> None:
+    """ Fills in the score columns of the rank table in place. """
 
     df["manual_secretion_score"] = secretion_score_it(
         df,
@@ -1432,7 +1243,186 @@ def inner(
         args.lethal_homology_weight,
     )
 
-    df["effector_score"] = run_ltr(df)
+    if len(df) > 0:
+        df["effector_score"] = run_ltr(df)
+    return
+
+
+def rank_chunks(
+    con: sqlite3.Connection,
+    cur: sqlite3.Cursor,
+    dbcan: set[str],
+    args: argparse.Namespace,
+    source: str,
+    names: bool = True,
+) -> Iterator[pd.DataFrame]:
+    """ Scores the checksums in source, one chunk at a time. """
+    tab = ResultsTable(con, cur)
+
+    for _ in iter_pending_chunks(tab, source, args.chunk_size):
+        df = create_tables(
+            con,
+            cur,
+            dbcan,
+            args.tmhmm_first_60_threshold,
+            pending=True
+        )
+        score_table(df, args)
+
+        if names:
+            df = attach_names(tab, df)
+        yield df
+    return
+
+
+def update_incremental(
+    con: sqlite3.Connection,
+    cur: sqlite3.Cursor,
+    dbcan: set[str],
+    args: argparse.Namespace
+) -> None:
+    """ Re-scores any checksums that have changed since the last
+    incremental run, and stores them in the rank cache.
+    """
+    tab = ResultsTable(con, cur)
+
+    digest = rank_parameters_digest(args, dbcan)
+    if find_stale_checksums(tab, digest) == 0:
+        return
+
+    for df in rank_chunks(con, cur, dbcan, args, "rank_stale", names=False):
+        update_rank_cache(tab, df)
+
+    tab.cur.execute("DROP TABLE IF EXISTS rank_stale")
+    tab.con.commit()
+    return
+
+
+def merge_key(line: str) -> float:
+    return float(line.split("\t", 1)[0])
+
+
+def as_float_columns(line: str, indices: list[int]) -> str:
+    """ Writes whole numbers in some columns of a line like floats. """
+    fields = line.split("\t")
+    for i in indices:
+        value = fields[i].rstrip("\n")
+        if value.lstrip("-").isdigit():
+            fields[i] = fields[i].replace(value, f"{value}.0", 1)
+    return "\t".join(fields)
+
+
+def write_merged_chunks(
+    chunks: Iterable[pd.DataFrame],
+    outfile: TextIO,
+) -> None:
+    """ Writes chunks of the rank table sorted by effector score.
+
+    Each chunk is sorted and written to a temporary file, and the files are
+    merged, so only one chunk needs to be held in memory at a time.
+    The output is formatted like the whole table written at once.
+    Rows with equal scores are kept in the order of the chunks.
+    """
+
+    # A column with missing values is a float column in the whole table,
+    # even in chunks that don't have any and so have integers.
+    float_columns: set[str] = set()
+    int_columns: set[str] = set()
+
+    with ExitStack() as stack:
+        runs = []
+        for df in chunks:
+            df = df.sort_values(
+                "effector_score",
+                ascending=False,
+                kind="stable"
+            )
+
+            for c, dtype in df.dtypes.items():
+                if pd.api.types.is_float_dtype(dtype):
+                    float_columns.add(c)
+                elif pd.api.types.is_integer_dtype(dtype):
+                    int_columns.add(c)
+
+            # Missing scores come last, like sort_values.
+            out = df.round(3)
+            out.insert(
+                0,
+                "sort_key",
+                (-df["effector_score"].astype(float)).fillna(np.inf)
+            )
+
+            run = stack.enter_context(TemporaryFile(mode="w+"))
+            out.to_csv(run, sep="\t", index=False, header=False, na_rep=".")
+            run.seek(0)
+            runs.append(run)
+
+        print("\t".join(RANK_COLUMNS), file=outfile)
+
+        indices = [
+            i
+            for i, c
+            in enumerate(RANK_COLUMNS)
+            if (c in float_columns) and (c in int_columns)
+        ]
+
+        for line in heapq.merge(*runs, key=merge_key):
+            line = line.split("\t", 1)[1]
+
+            if len(indices) > 0:
+                line = as_float_columns(line, indices)
+
+            outfile.write(line)
+    return
+
+
+def inner(
+    con: sqlite3.Connection,
+    cur: sqlite3.Cursor,
+    args: argparse.Namespace
+) -> None:
+    if args.dbcan is not None:
+        dbcan: set[str] = {d.strip() for d in args.dbcan.readlines()}
+    else:
+        dbcan = set(get_interesting_dbcan_ids())
+
+    create_dbcan_targets(con, cur, dbcan)
+    tab = ResultsTable(con, cur)
+
+    if args.incremental:
+        update_incremental(con, cur, dbcan, args)
+
+        if args.chunk_size is None:
+            df = select_rank_cache(tab)
+        else:
+            write_merged_chunks(
+                select_rank_cache(tab, args.chunk_size),
+                args.outfile
+            )
+            return
+
+    elif args.chunk_size is None:
+        df = create_tables(
+            con,
+            cur,
+            dbcan,
+            args.tmhmm_first_60_threshold
+        )
+        score_table(df, args)
+
+    else:
+        write_merged_chunks(
+            rank_chunks(
+                con,
+                cur,
+                dbcan,
+                args,
+                "(SELECT DISTINCT checksum, NULL AS fingerprint FROM decoder)"
+            ),
+            args.outfile
+        )
+        return
+
     df.sort_values("effector_score", ascending=False, inplace=True)
     df.round(3).to_csv(
         args.outfile,
@@ -3,11 +3,11 @@
 import re
 import sys
 import argparse
-import json
 
 from Bio import SeqIO
 
 from ..analyses import Analysis
+from .. import ldjson
 from ..regex import (
     FLAGS,
     KEX2_CLASSIC,
@@ -64,7 +64,7 @@ def cli(parser: argparse.ArgumentParser) -> None:
 
 
 def format_ldjson(a: Analysis, first: bool) -> str:
-    return json.dumps(a.as_dict()) + "\n"
+    return ldjson.dumps(a.as_dict(), compact=False) + "\n"
 
 
 def format_tsv(a: Analysis, first: bool) -> str:
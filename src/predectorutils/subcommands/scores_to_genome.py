@@ -4,14 +4,18 @@ from __future__ import annotations
 import sys
 import argparse
 from collections import defaultdict
+from contextlib import ExitStack
 
 from typing import TextIO
 from typing import Optional
+from collections.abc import Iterable, Iterator
 
+import numpy as np
 import pandas as pd
-from intervaltree import IntervalTree, Interval
 
 from ..gff import GFFRecord
+from ..bigwig import BigWigWriter
+from ..parsers import ParseError
 
 NUMERIC_COLUMNS = [
     'effector_score',
@@ -117,6 +121,28 @@ def cli(parser: argparse.ArgumentParser) -> None:
         )
     )
 
+    parser.add_argument(
+        "--bigwig",
+        type=str,
+        default=None,
+        help=(
+            "Write a BigWig file for each column to "
+            "'{prefix}{column}.bw' instead of the bedgraph."
+        )
+    )
+
+    parser.add_argument(
+        "--chrom-sizes",
+        type=argparse.FileType('r'),
+        default=None,
+        help=(
+            "A tab separated file of sequence names and lengths, "
+            "e.g. a samtools faidx index, used for the BigWig files. "
+            "By default the furthest end of any feature on each sequence "
+            "in the genes GFF is used."
+        )
+    )
+
     return
 
 
@@ -145,16 +171,182 @@ def get_id(
     return id_
 
 
+# The approximate number of CDSs to process at a time.
+BATCH_SIZE = 100000
+
+
+def split_overlaps(
+    starts: np.ndarray,
+    ends: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Splits intervals at every start and end position of the others.
+
+    Returns the sorted boundaries, and the (segment, interval) index pairs
+    for each segment that an interval covers.
+    Segment i spans from boundaries[i] to boundaries[i + 1].
+    """
+
+    boundaries = np.unique(np.concatenate([starts, ends]))
+    first = np.searchsorted(boundaries, starts)
+    counts = np.searchsorted(boundaries, ends) - first
+
+    intervals = np.repeat(np.arange(len(starts)), counts)
+
+    # The offset of each segment from the first one in its interval.
+    offsets = (
+        np.arange(counts.sum()) -
+        np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    segments = np.repeat(first, counts) + offsets
+    return boundaries, segments, intervals
+
+
+def reduce_segments(
+    cdss: pd.DataFrame,
+    preds: pd.DataFrame,
+    reducer: str
+) -> pd.DataFrame:
+    """ Combines the scores of the proteins overlapping each segment.
+
+    cdss has the seqid, start, end and name of each CDS.
+    Any CDS can split the others, but only segments overlapping at
+    least one protein in preds are returned.
+    """
+
+    # Offset each seqid so that all of them can be split in one go.
+    codes, seqids = pd.factorize(cdss["seqid"], sort=True)
+    width = int(cdss["end"].max()) + 1
+    offset = codes.astype(np.int64) * width
+
+    boundaries, segments, intervals = split_overlaps(
+        cdss["start"].to_numpy() + offset,
+        cdss["end"].to_numpy() + offset,
+    )
+
+    pairs = pd.DataFrame({
+        "segment": segments,
+        "name": cdss["name"].to_numpy()[intervals],
+    })
+
+    # CDSs missing the ID field still split the others.
+    pairs = pairs[pairs["name"].notna()].drop_duplicates()
+    pairs = pairs.join(preds, on="name", how="inner")
+
+    reduced = (
+        pairs
+        .groupby("segment", sort=True)[list(preds.columns)]
+        .agg(reducer)
+    )
+
+    # Reducing each segment's rows gives a single type for all columns.
+    if len(reduced.columns) > 0:
+        reduced = reduced.astype(np.result_type(*reduced.dtypes))
+
+    segment = reduced.index.to_numpy()
+    start = boundaries[segment]
+    seqid_codes = start // width
+
+    locs = pd.DataFrame({
+        "#seqid": seqids[seqid_codes],
+        "start": start - (seqid_codes * width),
+        "end": boundaries[segment + 1] - (seqid_codes * width),
+    })
+    return pd.concat([locs, reduced.reset_index(drop=True)], axis=1)
+
+
+def batch_cdss(
+    cdss: dict[str, list[tuple[int, int, Optional[str]]]]
+) -> Iterator[pd.DataFrame]:
+    """ Groups whole seqids into tables of about BATCH_SIZE CDSs,
+    in sorted order.
+    """
+
+    columns = ["seqid", "start", "end", "name"]
+    batch: list[tuple[str, int, int, Optional[str]]] = []
+    for seqid in sorted(cdss.keys()):
+        batch.extend((seqid, s, e, n) for s, e, n in cdss[seqid])
+
+        if len(batch) >= BATCH_SIZE:
+            yield pd.DataFrame(batch, columns=columns)
+            batch = []
+
+    if len(batch) > 0:
+        yield pd.DataFrame(batch, columns=columns)
+    return
+
+
+def read_chrom_sizes(handle: TextIO) -> dict[str, int]:
+    """ Reads the first two columns of a chrom.sizes or fasta index file. """
+
+    sizes = {}
+    for i, line in enumerate(handle):
+        if line.strip() == "":
+            continue
+
+        columns = line.rstrip("\r\n").split("\t")
+        try:
+            sizes[columns[0]] = int(columns[1])
+        except (IndexError, ValueError):
+            raise ParseError(
+                filename=None,
+                line=i,
+                message=(
+                    "Expected a sequence name and length separated "
+                    f"by a tab, but got '{line.strip()}'."
+                )
+            ).add_filename_from_handle(handle)
+
+    return sizes
+
+
+def write_bigwigs(
+    prefix: str,
+    bedgraphs: Iterable[pd.DataFrame],
+    columns: list[str],
+    chrom_sizes: dict[str, int],
+) -> None:
+    """ Writes each column of the bedgraphs to a separate BigWig file.
+
+    The bedgraphs are written as they come, so they must be sorted.
+    """
+
+    with ExitStack() as stack:
+        writers = {
+            column: stack.enter_context(
+                BigWigWriter(f"{prefix}{column}.bw", chrom_sizes)
+            )
+            for column
+            in columns
+        }
+
+        for bedgraph in bedgraphs:
+            seqids = bedgraph["#seqid"].to_numpy()
+            starts = bedgraph["start"].to_numpy()
+            ends = bedgraph["end"].to_numpy()
+
+            for column, writer in writers.items():
+                writer.add(
+                    seqids,
+                    starts,
+                    ends,
+                    bedgraph[column].to_numpy(
+                        dtype=np.float64,
+                        na_value=np.nan
+                    ),
+                )
+    return
+
+
 def inner(  # noqa: C901
     genes: TextIO,
     annotations: TextIO,
     outfile: TextIO,
     id_field: str,
     target: Optional[list[str]],
-    reducer: str
+    reducer: str,
+    bigwig: Optional[str] = None,
+    chrom_sizes_file: Optional[TextIO] = None,
 ):
-    gff = list(GFFRecord.from_file(genes))
-
     preds = pd.read_csv(
         annotations,
         sep="\t",
@@ -172,43 +364,55 @@ def inner(  # noqa: C901
         preds = preds[target]
 
     # Gets the intervals of CDS entries.
-    intervals: defaultdict[str, IntervalTree] = defaultdict(IntervalTree)
-    for feature in gff:
+    cdss: defaultdict[str, list[tuple[int, int, Optional[str]]]] = (
+        defaultdict(list)
+    )
+    seqid_ends: dict[str, int] = {}
+    for feature in GFFRecord.from_file(genes):
+        seqid_ends[feature.seqid] = max(
+            feature.end,
+            seqid_ends.get(feature.seqid, 0)
+        )
+
         if feature.type != "CDS":
             continue
 
         id_ = get_id(feature, id_field)
-        intervals[feature.seqid].add(Interval(
-            feature.start,
-            feature.end,
-            data={id_}
-        ))
-
-    # Splits any overlapping CDS entries
-    # then merges them.
-    for _, itree in intervals.items():
-        itree.split_overlaps()
-        itree.merge_equals(data_reducer=lambda a, b: a | b)
-
-    rows = []
-    for seqid, itree in intervals.items():
-        for interval in itree:
-            ids = [id_ for id_ in interval.data if id_ in preds.index]
-
-            if len(ids) == 0:
-                continue
-
-            loc = pd.Series(
-                [seqid, interval.begin, interval.end],
-                index=["#seqid", "start", "end"]
-            )
-            vals = getattr(preds.loc[ids], reducer)(axis=0)
-            row = pd.concat([loc, vals])
-            rows.append(row)
+        cdss[feature.seqid].append((feature.start, feature.end, id_))
+
+    # Overlapping CDSs are split into segments and the scores of the
+    # proteins in each segment are reduced together.
+    bedgraphs = (
+        reduce_segments(batch, preds, reducer)
+        for batch
+        in batch_cdss(cdss)
+    )
+
+    if bigwig is not None:
+        if chrom_sizes_file is None:
+            chrom_sizes = seqid_ends
+        else:
+            chrom_sizes = read_chrom_sizes(chrom_sizes_file)
 
-    bedgraph = pd.DataFrame(rows)
-    bedgraph.sort_values(by=["#seqid", "start"], inplace=True)
-    bedgraph.to_csv(outfile, sep="\t", index=False, na_rep="NA")
+        # Without any CDSs the tracks are empty, like the bedGraph.
+        write_bigwigs(
+            bigwig,
+            bedgraphs,
+            list(preds.columns),
+            chrom_sizes
+        )
+        return
+
+    print("\t".join(["#seqid", "start", "end", *preds.columns]), file=outfile)
+
+    for bedgraph in bedgraphs:
+        bedgraph.to_csv(
+            outfile,
+            sep="\t",
+            index=False,
+            header=False,
+            na_rep="NA"
+        )
     return
 
 
@@ -221,6 +425,8 @@ def runner(args: argparse.Namespace) -> None:
             target=args.target,
             id_field=args.id_field,
             reducer=args.reducer,
+            bigwig=args.bigwig,
+            chrom_sizes_file=args.chrom_sizes,
         )
     except Exception as e:
         raise e
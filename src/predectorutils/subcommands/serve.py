@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+""" Runs predutils commands in a warm process listening on a unix socket.
+
+Clients send their arguments, working directory and environment, along
+with their stdin, stdout and stderr file descriptors.
+The server forks a child to run each command, so the imports and data
+loaded by the server are shared, but commands can't affect each other.
+The child sends its process ID to the client, so that the client can pass
+on interrupts, and writes the exit code back when it finishes.
+Only the user running the server can connect to the socket.
+"""
+
+import os
+import sys
+import stat
+import json
+import signal
+import socket
+import struct
+import argparse
+import traceback
+
+from typing import Any, Optional
+
+from ..main import SOCKET_ENV, SUBCOMMANDS, import_subcommand
+
+LENGTH = struct.Struct("!I")
+EXIT_CODE = struct.Struct("!i")
+PID = struct.Struct("!i")
+
+# The pid, uid and gid of a struct ucred, from SO_PEERCRED.
+PEER_CREDENTIALS = struct.Struct("3i")
+
+# The signals that the client passes on to the command.
+FORWARDED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def cli(parser: argparse.ArgumentParser) -> None:
+
+    parser.add_argument(
+        "socket",
+        type=str,
+        help=(
+            "The path of the unix socket to listen on. "
+            f"Set the {SOCKET_ENV} environment variable to this path to "
+            "run predutils commands in this server."
+        )
+    )
+
+    parser.add_argument(
+        "--preload",
+        nargs="+",
+        metavar="SUBCOMMAND",
+        choices=[s for s in SUBCOMMANDS if s != "serve"],
+        default=None,
+        help=(
+            "The subcommands to import before accepting commands. "
+            "Default: all of them"
+        )
+    )
+    return
+
+
+def recv_exactly(conn: socket.socket, size: int) -> bytes:
+    buf = b""
+    while len(buf) < size:
+        data = conn.recv(size - len(buf))
+        if len(data) == 0:
+            raise ValueError("The connection closed during a message.")
+        buf += data
+    return buf
+
+
+def send_request(
+    conn: socket.socket,
+    argv: list[str],
+    cwd: str,
+    env: dict[str, str],
+) -> None:
+    payload = json.dumps({"argv": argv, "cwd": cwd, "env": env}).encode()
+    socket.send_fds(conn, [LENGTH.pack(len(payload))], [0, 1, 2])
+    conn.sendall(payload)
+    return
+
+
+def recv_request(conn: socket.socket) -> tuple[dict[str, Any], list[int]]:
+    header, fds, _, _ = socket.recv_fds(conn, LENGTH.size, 3)
+
+    try:
+        if len(fds) != 3:
+            raise ValueError("Expected the client's stdin, stdout and stderr.")
+
+        header += recv_exactly(conn, LENGTH.size - len(header))
+        (length,) = LENGTH.unpack(header)
+        request = json.loads(recv_exactly(conn, length))
+    except (OSError, ValueError):
+        for fd in fds:
+            os.close(fd)
+        raise
+
+    return request, fds
+
+
+def signal_child(pid: int, signum: int) -> None:
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+    return
+
+
+def forward(path: str, argv: list[str]) -> Optional[int]:
+    """ Runs a command in the server and returns its exit code.
+
+    Returns None if there's no server listening on the socket, so that the
+    command can be run locally instead.
+    SIGINT and SIGTERM are passed on to the command.
+    If the command stops without sending an exit code, e.g. because it
+    was killed, this returns 128 plus the last signal received, or 1.
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+
+        pid: Optional[int] = None
+        signals: list[int] = []
+
+        # Signals received before the child's pid are sent once it arrives.
+        def interrupt(signum: int, _frame: Any) -> None:
+            signals.append(signum)
+            if pid is not None:
+                signal_child(pid, signum)
+            return
+
+        handlers = {
+            signum: signal.signal(signum, interrupt)
+            for signum in FORWARDED_SIGNALS
+        }
+
+        try:
+            send_request(conn, argv, os.getcwd(), dict(os.environ))
+            (pid,) = PID.unpack(recv_exactly(conn, PID.size))
+            for signum in signals:
+                signal_child(pid, signum)
+
+            (code,) = EXIT_CODE.unpack(recv_exactly(conn, EXIT_CODE.size))
+        except (OSError, ValueError):
+            print(
+                "The predutils server stopped before the command finished.",
+                file=sys.stderr
+            )
+            code = 128 + signals[-1] if len(signals) > 0 else 1
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+    return code
+
+
+def exit_code(code: Any) -> int:
+    """ Converts the argument of sys.exit into the process exit code. """
+    if code is None:
+        return 0
+    elif isinstance(code, int):
+        return code
+    else:
+        print(code, file=sys.stderr)
+        return 1
+
+
+def run_request(
+    conn: socket.socket,
+    request: dict[str, Any],
+    fds: list[int],
+) -> None:
+    """ Runs a command in a forked child. This never returns. """
+
+    from ..main import main
+    code = 1
+
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        conn.sendall(PID.pack(os.getpid()))
+
+        for fd, target in zip(fds, (0, 1, 2)):
+            os.dup2(fd, target)
+            os.close(fd)
+
+        # Buffered like the standard streams of a new interpreter.
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", 1 if os.isatty(1) else -1, closefd=False)
+        sys.stderr = open(2, "w", 1, closefd=False)
+
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+
+        # Otherwise main would send the command back to the server.
+        os.environ.pop(SOCKET_ENV, None)
+        sys.argv = request["argv"]
+
+        try:
+            main()
+            code = 0
+        except SystemExit as e:
+            code = exit_code(e.code)
+    except BaseException:
+        traceback.print_exc(file=sys.stderr)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            conn.sendall(EXIT_CODE.pack(code))
+        finally:
+            os._exit(code)
+
+
+def remove_socket(path: str) -> None:
+    """ Removes a socket left by a previous server. """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    return
+
+
+def peer_uid(conn: socket.socket) -> Optional[int]:
+    """ Gets the user ID of the client, where the platform supports it. """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+
+    credentials = conn.getsockopt(
+        socket.SOL_SOCKET,
+        socket.SO_PEERCRED,
+        PEER_CREDENTIALS.size
+    )
+    _, uid, _ = PEER_CREDENTIALS.unpack(credentials)
+    return uid
+
+
+def inner(path: str, preload: list[str]) -> None:
+    for name in preload:
+        import_subcommand(name)
+
+    # The xgboost model isn't loaded here. Its OpenMP runtime can hang
+    # in forked children once it has started threads in the parent.
+    if "rank" in preload:
+        from ..data import get_interesting_dbcan_ids
+        get_interesting_dbcan_ids()
+
+    # The children are never waited for, so this stops them being zombies.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    # Exit normally when killed so that the socket is removed.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    remove_socket(path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        # Anyone who can connect can run commands as this user.
+        umask = os.umask(0o177)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(umask)
+
+        server.listen()
+
+        try:
+            while True:
+                conn, _ = server.accept()
+
+                with conn:
+                    uid = peer_uid(conn)
+                    if (uid is not None) and (uid != os.getuid()):
+                        print(
+                            f"Ignoring a request from user {uid}.",
+                            file=sys.stderr
+                        )
+                        continue
+
+                    try:
+                        request, fds = recv_request(conn)
+                    except (OSError, ValueError) as e:
+                        print(f"Ignoring a bad request: {e}", file=sys.stderr)
+                        continue
+
+                    if os.fork() == 0:
+                        server.close()
+                        run_request(conn, request, fds)
+
+                    for fd in fds:
+                        os.close(fd)
+        finally:
+            remove_socket(path)
+    return
+
+
+def runner(args: argparse.Namespace) -> None:
+    if args.preload is None:
+        preload = [s for s in SUBCOMMANDS if s != "serve"]
+    else:
+        preload = args.preload
+
+    inner(args.socket, preload)
+    return
@@ -0,0 +1,291 @@
+import sys
+import json
+import random
+
+from typing import Any, Callable, Optional
+
+import pytest
+
+from predectorutils.analyses import Analyses
+from predectorutils.analyses.base import (
+    int_or_none,
+    float_or_none,
+    str_or_none,
+)
+from predectorutils.data import get_interesting_dbcan_ids
+from predectorutils.main import cli, import_subcommand
+
+# The analyses that rank uses, with values for the fields that rank parses
+# or compares to fixed strings.
+RANK_FIELDS: dict[Analyses, dict[str, list[Any]]] = {
+    Analyses.signalp3_nn: {"ymax_pos": [20, 25]},
+    Analyses.signalp3_hmm: {"cmax_pos": [20, 25]},
+    Analyses.signalp4: {"ymax_pos": [20, 25]},
+    Analyses.signalp5: {
+        "prediction": ["SP(Sec/SPI)", "OTHER"],
+        "cs_pos": [None, "CS pos: 19-20. VSA-AP. Pr: 0.9"],
+    },
+    Analyses.signalp6: {
+        "prediction": ["SP", "OTHER"],
+        "cs_pos": [None, "CS pos: 19-20. Pr: 0.9"],
+    },
+    Analyses.deepsig: {
+        "prediction": ["SignalPeptide", "Transmembrane", "Other"],
+    },
+    Analyses.phobius: {
+        "topology": ["o", "i", "n3-14c19/20o", "n3-14c19/20o40-60i"],
+    },
+    Analyses.tmhmm: {
+        "topology": ["o", "i", "o20-42i", "i5-27o60-82i"],
+    },
+    Analyses.deeploc: {"prediction": ["Extracellular", "Nucleus"]},
+    Analyses.targetp_non_plant: {"prediction": ["SP", "noTP", "mTP"]},
+    Analyses.effectorp1: {"prediction": ["Effector", "Non-effector"]},
+    Analyses.effectorp2: {
+        "prediction": ["Effector", "Unlikely effector", "Non-effector"],
+    },
+    Analyses.effectorp3: {"prediction": ["Apoplastic effector", "-"]},
+    Analyses.apoplastp: {"prediction": ["Apoplastic", "Non-apoplastic"]},
+    Analyses.deepredeff_fungi: {"prediction": ["effector", "non-effector"]},
+    Analyses.deepredeff_oomycete: {
+        "prediction": ["effector", "non-effector"],
+    },
+    Analyses.localizer: {},
+    Analyses.pepstats: {},
+    Analyses.kex2_cutsite: {
+        "kind": ["kex2_cutsite"],
+        "pattern": ["[KR]R", "[LIJVAP][A-Z][KRTPEI]R"],
+        "match": ["KR", "RR"],
+    },
+    Analyses.rxlr_like_motif: {
+        "kind": ["rxlr_like_motif"],
+        "pattern": ["R[A-Z]LR"],
+        "match": ["RALR", "RLLR"],
+    },
+    Analyses.phibase: {
+        "target": [
+            "PHI:1#PHI:1#GeneA#Fusarium#Wheat#reduced_virulence",
+            "PHI:2#PHI:2#GeneB#Fusarium#Wheat#lethal__increased_virulence",
+        ],
+        "evalue": [1e-20, 1.0],
+    },
+    Analyses.dbcan: {
+        "hmm": ["GH1", get_interesting_dbcan_ids()[0]],
+        "domain_i_evalue": [1e-20, 1.0],
+    },
+    Analyses.effectordb: {
+        "hmm": ["Avr2", "ToxA"],
+        "domain_i_evalue": [1e-20, 1.0],
+    },
+}
+
+# These can have more than one result per protein.
+MULTIPLE = {
+    Analyses.kex2_cutsite,
+    Analyses.rxlr_like_motif,
+    Analyses.phibase,
+    Analyses.dbcan,
+    Analyses.effectordb,
+}
+
+
+def random_value(rng: random.Random, type_: Callable[[Any], Any]) -> Any:
+    if type_ in (int_or_none, float_or_none, str_or_none):
+        if rng.random() < 0.2:
+            return None
+
+        type_ = {
+            int_or_none: int,
+            float_or_none: float,
+            str_or_none: str,
+        }[type_]
+
+    if type_ is bool:
+        return rng.random() < 0.5
+    elif type_ is int:
+        return rng.randint(1, 60)
+    elif type_ is float:
+        return round(rng.random(), 3)
+    elif type_ is str:
+        return "x"
+    else:
+        return []
+
+
+def random_record(
+    rng: random.Random,
+    analysis: Analyses,
+    name: str,
+    checksum: str,
+) -> dict[str, Any]:
+    cls = analysis.get_analysis()
+    fields = RANK_FIELDS[analysis]
+
+    data = {}
+    for column, type_ in zip(cls.columns, cls.types):
+        if column == cls.name_column:
+            data[column] = name
+        elif column in fields:
+            data[column] = rng.choice(fields[column])
+        else:
+            data[column] = random_value(rng, type_)
+
+    if analysis == Analyses.deepsig:
+        is_sp = data["prediction"] == "SignalPeptide"
+        data["cs_pos"] = rng.randint(15, 30) if is_sp else None
+    elif analysis in (Analyses.phobius, Analyses.tmhmm):
+        ntm = data["topology"].count("-") - data["topology"].count("/")
+        data["tm" if analysis == Analyses.phobius else "pred_hel"] = ntm
+    elif analysis in (Analyses.dbcan, Analyses.effectordb):
+        data["hmm_from"], data["hmm_to"], data["hmm_len"] = 1, 90, 100
+    elif analysis == Analyses.phibase:
+        data["tcov"] = 0.9
+    elif analysis in (Analyses.kex2_cutsite, Analyses.rxlr_like_motif):
+        data["end"] = data["start"] + len(data["match"])
+    elif analysis == Analyses.pepstats:
+        data["residues"] = rng.randint(100, 300)
+        data["molecular_weight"] = data["residues"] * 110.0
+
+    return {
+        "analysis": str(analysis),
+        "software": cls.software,
+        "software_version": "1.0",
+        "database": cls.database,
+        "database_version": "1.0" if analysis.needs_database() else None,
+        "checksum": checksum,
+        "md5sum": "md5" + checksum,
+        "data": data,
+    }
+
+
+def random_results(
+    nproteins: int,
+    seed: int = 0,
+    analyses: Optional[list[Analyses]] = None,
+) -> list[str]:
+    """ Makes line delimited JSON results for the analyses used by rank.
+
+    Each protein gets a result from each analysis, or up to two for
+    the analyses that can have several.
+    """
+    rng = random.Random(seed)
+
+    if analyses is None:
+        analyses = list(RANK_FIELDS)
+
+    lines = []
+    for i in range(nproteins):
+        name = f"protein{i}"
+        checksum = f"chk{seed}_{i:04d}"
+
+        for analysis in analyses:
+            n = rng.randint(1, 2) if analysis in MULTIPLE else 1
+            for _ in range(n):
+                record = random_record(rng, analysis, name, checksum)
+                lines.append(json.dumps(record))
+    return lines
+
+
+@pytest.fixture
+def rank_results():
+    return random_results
+
+
+def run_predutils(args: list[str]) -> None:
+    """ Runs a subcommand in this process. """
+    parsed = cli("predutils", args)
+    try:
+        import_subcommand(parsed.subparser_name).runner(parsed)
+    finally:
+        for value in vars(parsed).values():
+            if value in (sys.stdin, sys.stdout):
+                continue
+            elif hasattr(value, "close"):
+                value.close()
+    return
+
+
+@pytest.fixture
+def predutils():
+    return run_predutils
+
+
+def gene_gffs(
+    nproteins: int,
+    seed: int = 0,
+    missing_cdss: tuple[int, ...] = (),
+) -> tuple[str, str]:
+    """ Makes a genes GFF3 and a predector-like annotation GFF3.
+
+    Both are sorted by protein ID. The proteins in missing_cdss have a
+    gene and mRNA but no CDSs, and some proteins have no annotations.
+    """
+    rng = random.Random(seed)
+
+    genes = ["##gff-version 3"]
+    annotations = []
+    for i in range(nproteins):
+        mrna = f"mrna{i:04d}"
+        seqid = f"chr{rng.randint(1, 3)}"
+        strand = rng.choice("+-")
+
+        exons = []
+        start = rng.randint(1, 10000)
+        for _ in range(rng.randint(1, 4)):
+            end = start + rng.randint(180, 300)
+            exons.append((start, end))
+            start = end + rng.randint(50, 200)
+
+        genes.extend([
+            f"{seqid}\tsrc\tgene\t{exons[0][0]}\t{exons[-1][1]}\t.\t"
+            f"{strand}\t.\tID=gene{i}",
+            f"{seqid}\tsrc\tmRNA\t{exons[0][0]}\t{exons[-1][1]}\t.\t"
+            f"{strand}\t.\tID={mrna};Parent=gene{i}",
+        ])
+
+        length = 0
+        for start, end in (exons if strand == "+" else reversed(exons)):
+            phase = (3 - length % 3) % 3
+            length += end - start + 1
+            if i not in missing_cdss:
+                genes.append(
+                    f"{seqid}\tsrc\tCDS\t{start}\t{end}\t.\t{strand}\t"
+                    f"{phase}\tID=cds-{mrna};Parent={mrna}"
+                )
+
+        length = length // 3 - 1
+        if rng.random() < 0.2:
+            continue
+
+        if rng.random() < 0.5:
+            annotations.extend([
+                f"{mrna}\tSignalP:4.1\tsignal_peptide\t1\t20\t0.8\t+\t.\t"
+                "d=0.8",
+                f"{mrna}\tPhobius:1\tsignal_peptide\t1\t20\t.\t+\t.\t"
+                f"ID=signal_peptide{i}",
+                f"{mrna}\tPhobius:1\tn_terminal_region\t1\t3\t.\t+\t.\t"
+                f"Parent=signal_peptide{i}",
+            ])
+
+        for _ in range(rng.randint(0, 3)):
+            start = rng.randint(1, length - 50)
+            pfam = f"PF{rng.randint(0, 99):05d}"
+            annotations.append(
+                f"{mrna}\tPfam:1\tprotein_hmm_match\t{start}\t{start + 40}\t"
+                f"{rng.random():.3f}\t+\t.\tTarget={pfam} 1 41 +;"
+                f"Dbxref=Pfam:{pfam};evalue=1e-5"
+            )
+
+        if rng.random() < 0.4:
+            start = rng.randint(1, length - 2)
+            annotations.append(
+                f"{mrna}\tkex2_cutsite:1\tpropeptide_cleavage_site\t"
+                f"{start}\t{start + 1}\t.\t+\t.\tpattern=[KR]R"
+            )
+
+    return "\n".join(genes) + "\n", "\n".join(annotations) + "\n"
+
+
+@pytest.fixture
+def gene_annotations():
+    return gene_gffs
@@ -0,0 +1,20 @@
+from predectorutils.analyses import Analyses
+
+
+def test_batch_from_dicts_is_typed():
+    cls = Analyses.signalp6.get_analysis()
+    dicts = [
+        {"name": "one", "prediction": "SP", "prob_signal": 0.9,
+         "prob_other": 0.1, "cs_pos": 20},
+        {"name": "two", "prediction": "OTHER", "prob_signal": 0.1,
+         "prob_other": 0.9, "cs_pos": None},
+    ]
+
+    records = [cls.from_dict(d) for d in dicts]
+    batch = cls.batch_from_records(records)
+
+    assert list(batch.columns) == cls.columns
+    assert batch.equals(cls.batch_from_dicts(d.as_dict() for d in records))
+    assert batch["prob_signal"].dtype == "float64"
+    assert batch["cs_pos"].isna().tolist() == [False, True]
+    return
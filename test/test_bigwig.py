@@ -0,0 +1,220 @@
+import zlib
+import struct
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from predectorutils import bigwig
+from predectorutils.bigwig import (
+    BIGWIG_MAGIC,
+    HEADER,
+    ZOOM_HEADER,
+    TOTAL_SUMMARY,
+    CHROM_TREE_HEADER,
+    INDEX_HEADER,
+    LEAF_ITEM,
+    BRANCH_ITEM,
+    NODE_HEADER,
+    SECTION_HEADER,
+    BigWigWriter,
+    write_bigwig,
+    write_chrom_tree
+)
+
+
+def test_write_bigwig(tmp_path):
+    path = str(tmp_path / "test.bw")
+    write_bigwig(
+        path,
+        {"chr2": 100, "chr1": 50},
+        ["chr2", "chr2", "chr1", "chr2"],
+        [0, 10, 5, 40],
+        [10, 20, 15, 45],
+        [1.0, float("nan"), 2.5, 3.0],
+        items_per_slot=1,
+    )
+
+    with open(path, "rb") as handle:
+        data = handle.read()
+
+    (
+        magic, version, nzooms, chrom_tree, data_offset,
+        index_offset, *_, buf_size, _
+    ) = HEADER.unpack_from(data)
+    assert (magic, version) == (BIGWIG_MAGIC, 4)
+    assert struct.unpack_from("<I", data, len(data) - 4)[0] == BIGWIG_MAGIC
+
+    # Chromosomes are numbered in sorted order.
+    _, _, key_size, _, nchroms, _ = CHROM_TREE_HEADER.unpack_from(
+        data, chrom_tree)
+    offset = chrom_tree + CHROM_TREE_HEADER.size + NODE_HEADER.size
+    assert nchroms == 2
+    assert data[offset:offset + key_size] == b"chr1"
+
+    # The NaN interval is skipped, and each block holds one interval.
+    assert struct.unpack_from("<Q", data, data_offset)[0] == 3
+
+    index = INDEX_HEADER.unpack_from(data, index_offset)
+    assert index[2] == 3
+    assert index[3:7] == (0, 5, 1, 45)
+
+    is_leaf, _, count = NODE_HEADER.unpack_from(
+        data, index_offset + INDEX_HEADER.size)
+    assert (is_leaf, count) == (1, 3)
+
+    leaf = LEAF_ITEM.unpack_from(
+        data, index_offset + INDEX_HEADER.size + NODE_HEADER.size)
+    block = zlib.decompress(data[leaf[4]:leaf[4] + leaf[5]])
+    assert len(block) <= buf_size
+
+    chrom, start, end, *_, nitems = SECTION_HEADER.unpack_from(block)
+    assert (chrom, start, end, nitems) == (0, 5, 15, 1)
+    assert struct.unpack_from("<IIf", block, SECTION_HEADER.size) == (
+        5, 15, 2.5)
+    return
+
+
+def read_chrom_tree(data: bytes, offset: int) -> dict[str, tuple[int, int]]:
+    """ Finds the id and size of each chromosome by walking the tree. """
+
+    _, _, key_size, _, nchroms, _ = CHROM_TREE_HEADER.unpack_from(
+        data, offset)
+
+    chroms = {}
+    nodes = [offset + CHROM_TREE_HEADER.size]
+    while len(nodes) > 0:
+        node = nodes.pop(0)
+        is_leaf, _, count = NODE_HEADER.unpack_from(data, node)
+        item = node + NODE_HEADER.size
+        for _ in range(count):
+            key = data[item:item + key_size].rstrip(b"\0").decode()
+            item += key_size
+            if is_leaf:
+                chroms[key] = struct.unpack_from("<II", data, item)
+                item += 8
+            else:
+                nodes.append(struct.unpack_from("<Q", data, item)[0])
+                item += 8
+
+    assert len(chroms) == nchroms
+    return chroms
+
+
+def read_index(
+    data: bytes,
+    offset: int,
+    fmt: str,
+    skip: int = 0,
+) -> list[tuple]:
+    """ Reads the records of every block in an R-tree index,
+    skipping a header at the start of each block.
+    """
+
+    records = []
+    nodes = [offset + INDEX_HEADER.size]
+    while len(nodes) > 0:
+        node = nodes.pop(0)
+        is_leaf, _, count = NODE_HEADER.unpack_from(data, node)
+        item = node + NODE_HEADER.size
+        for _ in range(count):
+            if is_leaf:
+                *_, block, size = LEAF_ITEM.unpack_from(data, item)
+                item += LEAF_ITEM.size
+                block = zlib.decompress(data[block:block + size])
+                records.extend(struct.iter_unpack(fmt, block[skip:]))
+            else:
+                nodes.append(BRANCH_ITEM.unpack_from(data, item)[4])
+                item += BRANCH_ITEM.size
+
+    return records
+
+
+def read_bigwig(path: str) -> tuple:
+    with open(path, "rb") as handle:
+        data = handle.read()
+
+    (
+        _, _, nzooms, chrom_tree, _, index_offset, *_, summary_offset, _, _
+    ) = HEADER.unpack_from(data)
+
+    records = read_index(data, index_offset, "<IIf", SECTION_HEADER.size)
+
+    zooms = []
+    for i in range(nzooms):
+        reduction, _, _, zoom_index = ZOOM_HEADER.unpack_from(
+            data, HEADER.size + i * ZOOM_HEADER.size)
+        zooms.append((
+            reduction,
+            read_index(data, zoom_index, "<IIIIffff")
+        ))
+
+    return (
+        read_chrom_tree(data, chrom_tree),
+        records,
+        zooms,
+        TOTAL_SUMMARY.unpack_from(data, summary_offset),
+    )
+
+
+def test_chrom_tree_has_several_levels():
+    names = sorted(f"chr{i}" for i in range(1000))
+    sizes = [100 + i for i in range(1000)]
+
+    handle = BytesIO()
+    write_chrom_tree(handle, names, sizes, block_size=4)
+    assert read_chrom_tree(handle.getvalue(), 0) == {
+        n: (i, s) for i, (n, s) in enumerate(zip(names, sizes))
+    }
+
+    # More than fit in the item count of one node.
+    names = sorted(f"scaffold{i}" for i in range(70000))
+    handle = BytesIO()
+    write_chrom_tree(handle, names, [1] * len(names))
+    chroms = read_chrom_tree(handle.getvalue(), 0)
+    assert chroms["scaffold69999"] == (names.index("scaffold69999"), 1)
+    return
+
+
+def test_adding_pieces_matches_one_table(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    chrom_sizes = {f"chr{i}": 5000 for i in range(5)}
+
+    chroms = []
+    starts = []
+    for chrom in sorted(chrom_sizes):
+        positions = np.sort(rng.choice(2500, 1000, replace=False)) * 2
+        chroms.extend([chrom] * len(positions))
+        starts.extend(positions.tolist())
+
+    ends = [s + 2 for s in starts]
+    values = rng.random(len(starts)).tolist()
+
+    write_bigwig(
+        str(tmp_path / "one.bw"), chrom_sizes, chroms, starts, ends, values,
+        items_per_slot=16,
+    )
+
+    # Read the data back a few chromosomes at a time for the zoom levels.
+    monkeypatch.setattr(bigwig, "READ_BATCH_SIZE", 1500)
+    with BigWigWriter(
+        str(tmp_path / "pieces.bw"), chrom_sizes, items_per_slot=16
+    ) as writer:
+        for i in range(0, len(starts), 150):
+            piece = slice(i, i + 150)
+            writer.add(chroms[piece], starts[piece], ends[piece],
+                       values[piece])
+
+    one = read_bigwig(str(tmp_path / "one.bw"))
+    pieces = read_bigwig(str(tmp_path / "pieces.bw"))
+    assert len(one[1]) == 5000
+    assert len(one[2]) > 0
+    assert pieces[:3] == one[:3]
+    assert pieces[3] == pytest.approx(one[3])
+
+    with pytest.raises(ValueError):
+        with BigWigWriter(str(tmp_path / "bad.bw"), chrom_sizes) as writer:
+            writer.add(["chr1"], [10], [20], [1.0])
+            writer.add(["chr0"], [10], [20], [1.0])
+    return
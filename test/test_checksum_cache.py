@@ -0,0 +1,34 @@
+import os
+
+from predectorutils.checksum_cache import (
+    cache_path,
+    fasta_checksums,
+    sequence_checksums
+)
+
+
+def test_cache_is_reused_and_invalidated(tmp_path):
+    fasta = tmp_path / "in.fasta"
+    fasta.write_text(">one desc\nMAGIC\n>two\nMAGICK\n")
+
+    with open(fasta) as handle:
+        rows = fasta_checksums(handle)
+
+    assert rows == [
+        ("one", *sequence_checksums("MAGIC")),
+        ("two", *sequence_checksums("MAGICK")),
+    ]
+    assert os.path.exists(cache_path(str(fasta)))
+
+    # A stale cache must be ignored and rewritten.
+    fasta.write_text(">one desc\nMAGICKS\n")
+    with open(fasta) as handle:
+        rows = fasta_checksums(handle)
+
+    assert rows == [("one", *sequence_checksums("MAGICKS"))]
+
+    # Cached rows are returned without reading the fasta.
+    with open(fasta) as handle:
+        handle.read()
+        assert fasta_checksums(handle) == rows
+    return
@@ -0,0 +1,228 @@
+import json
+
+import pytest
+
+from typing import Any
+
+from predectorutils.analyses import Analyses
+from predectorutils.database import load_db, ResultsTable, ResultRow, TargetRow
+
+
+def make_line(name: str, checksum: str, prob: float = 0.5) -> str:
+    return json.dumps({
+        "analysis": "effectorp1",
+        "software": "EffectorP",
+        "software_version": "1.0",
+        "checksum": checksum,
+        "md5sum": "md5" + checksum,
+        "data": {"name": name, "prediction": "Effector", "prob": prob},
+    })
+
+
+def test_staging_merge_removes_duplicates():
+    con, cur = load_db(":memory:")
+    tab = ResultsTable(con, cur)
+    tab.create_result_tables()
+    tab.create_staging_tables()
+
+    lines = [
+        make_line("one", "A"),
+        make_line("two", "A"),
+        make_line("three", "B"),
+    ]
+
+    tab.insert_results(
+        ResultRow.from_file(lines, drop_name=True),
+        staging=True
+    )
+
+    count = cur.execute("SELECT COUNT(*) FROM results_effectorp1").fetchone()
+    assert count[0] == 0
+
+    tab.merge_staging_tables()
+
+    count = cur.execute("SELECT COUNT(*) FROM results_effectorp1").fetchone()
+    assert count[0] == 2
+    assert not tab.exists_table("staging_effectorp1")
+    return
+
+
+def test_find_remaining_targets():
+    con, cur = load_db(":memory:")
+    tab = ResultsTable(con, cur)
+    tab.create_result_tables()
+    tab.insert_results(ResultRow.from_file([make_line("one", "A")]))
+
+    tab.insert_checksums({"A", "B"})
+    tab.insert_targets([
+        TargetRow(Analyses.effectorp1, "1.0", None),
+        TargetRow(Analyses.effectorp1, "2.0", None),
+    ])
+
+    remaining = sorted(tab.find_remaining_targets())
+    assert remaining == [
+        (TargetRow(Analyses.effectorp1, "1.0", None), "B"),
+        (TargetRow(Analyses.effectorp1, "2.0", None), "A"),
+        (TargetRow(Analyses.effectorp1, "2.0", None), "B"),
+    ]
+
+    selected = list(tab.select_targets(checksums=True))
+    assert len(selected) == 1
+    assert selected[0].checksum == "A"
+    return
+
+
+def test_typed_layout_matches_json():
+    lines = [
+        make_line("one", "A", 0.25),
+        make_line("two", "B", 0.75),
+    ]
+
+    con, cur = load_db(":memory:")
+    json_tab = ResultsTable(con, cur)
+    json_tab.create_result_tables()
+    json_tab.insert_results(ResultRow.from_file(lines))
+    expected = sorted(r.as_str() for r in json_tab.select_all())
+
+    assert json_tab.migrate_to_typed() != []
+    assert json_tab.is_typed(Analyses.effectorp1)
+    assert sorted(r.as_str() for r in json_tab.select_all()) == expected
+
+    con, cur = load_db(":memory:")
+    typed_tab = ResultsTable(con, cur)
+    typed_tab.create_result_tables(typed=True)
+    typed_tab.insert_results(ResultRow.from_file(lines + lines))
+    assert sorted(r.as_str() for r in typed_tab.select_all()) == expected
+    return
+
+
+def test_as_str_matches_as_dict():
+    line = json.loads(make_line("one", "A"))
+    line["pipeline_version"] = "1.2"
+    line["data"]["prob"] = 1e-05
+
+    rows = [
+        ResultRow.from_string(make_line("one", "A")),
+        ResultRow.from_string(make_line("one", "A"), drop_name=True),
+        ResultRow.from_string(json.dumps(line)),
+    ]
+
+    for row in rows:
+        assert json.loads(row.as_str()) == row.as_dict()
+    return
+
+
+def test_from_string_normalises_data():
+    expected = ResultRow.from_string(make_line("one", "A", 1.0))
+    assert ResultRow.from_string(
+        make_line("one", "A", 1.0),
+        validate=False
+    ) == expected
+
+    # These all need the full conversion.
+    for data in [
+        {"name": "one", "prediction": "Effector", "prob": 1},
+        {"prob": 1.0, "name": "one", "prediction": "Effector"},
+        {"name": "one", "prediction": "Effector", "prob": 1.0, "extra": 1},
+    ]:
+        line = json.loads(make_line("one", "A"))
+        line["data"] = data
+        assert ResultRow.from_string(json.dumps(line)) == expected
+    return
+
+
+def select_data(db: str) -> list[list[tuple[str, Any]]]:
+    """ The data of each result, keeping the order of the keys. """
+    con, cur = load_db(db)
+    rows = cur.execute(
+        "SELECT data FROM results_effectorp1 ORDER BY checksum"
+    ).fetchall()
+    con.close()
+    return [list(json.loads(row["data"]).items()) for row in rows]
+
+
+def test_migrate_keeps_exact_data(tmp_path, predutils):
+    # The first three need more than 15 significant digits.
+    probs = [0.1 + 0.2, 1 / 3, 0.12345678901234567, 1e-20, 0.5]
+    lines = [make_line(f"p{i}", f"C{i}", p) for i, p in enumerate(probs)]
+
+    infile = tmp_path / "in.ldjson"
+    infile.write_text("\n".join(lines) + "\n")
+
+    def dump(db: str) -> list[dict]:
+        outfile = tmp_path / "out.ldjson"
+        predutils(["dump_db", "-o", str(outfile), db])
+        return sorted(
+            (json.loads(line) for line in outfile.read_text().splitlines()),
+            key=lambda d: d["checksum"]
+        )
+
+    for flags in [[], ["--drop-name"]]:
+        db = str(tmp_path / f"results{len(flags)}.db")
+        typed_db = str(tmp_path / f"typed{len(flags)}.db")
+        predutils(["load_db", *flags, db, str(infile)])
+        predutils(["load_db", "--typed", *flags, typed_db, str(infile)])
+
+        expected = dump(db)
+        assert [d["data"]["prob"] for d in expected] == probs
+        expected_data = select_data(db)
+
+        predutils(["migrate_db", db])
+        for path in [db, typed_db]:
+            assert dump(path) == expected
+            assert select_data(path) == expected_data
+
+        # Only the rows that can't be rebuilt keep their JSON.
+        con, cur = load_db(db)
+        n = cur.execute(
+            "SELECT COUNT(*) FROM typed_effectorp1 WHERE data IS NOT NULL"
+        ).fetchone()[0]
+        con.close()
+        assert n == 3
+    return
+
+
+def test_bulk_load_drops_old_staging_tables(tmp_path, predutils):
+    db = str(tmp_path / "results.db")
+    infile = tmp_path / "in.ldjson"
+
+    # A bulk load that failed after inserting some rows.
+    con, cur = load_db(db)
+    tab = ResultsTable(con, cur)
+    tab.create_result_tables()
+    tab.create_staging_tables()
+    tab.insert_results(
+        ResultRow.from_file([make_line("old", "A")], drop_name=True),
+        staging=True
+    )
+    con.commit()
+    cur.close()
+    con.close()
+
+    infile.write_text(make_line("one", "B") + "\n")
+    predutils(["load_db", "--bulk", db, str(infile)])
+
+    def names() -> list[str]:
+        con, cur = load_db(db)
+        rows = cur.execute(
+            """
+            SELECT name FROM sqlite_master
+            WHERE name LIKE 'staging_%' OR name = 'results_index_effectorp1'
+            """
+        ).fetchall()
+        checksums = cur.execute(
+            "SELECT checksum FROM results_effectorp1"
+        ).fetchall()
+        con.close()
+        return [r["name"] for r in rows] + [r["checksum"] for r in checksums]
+
+    assert names() == ["results_index_effectorp1", "B"]
+
+    # A failed load also cleans up and restores the index.
+    infile.write_text(make_line("two", "C") + "\nnot json\n")
+    with pytest.raises(ValueError):
+        predutils(["load_db", "--bulk", db, str(infile)])
+
+    assert names()[0] == "results_index_effectorp1"
+    assert not any(n.startswith("staging_") for n in names())
+    return
@@ -0,0 +1,49 @@
+import sqlite3
+
+from predectorutils.analyses import Analyses
+
+
+def test_features_give_the_same_ranks(tmp_path, rank_results, predutils):
+    old = rank_results(20, seed=1)
+    new = rank_results(10, seed=2)
+
+    # Results for existing proteins from an analysis that isn't loaded yet.
+    pepstats = str(Analyses.pepstats)
+    first = [line for line in old if f'"{pepstats}"' not in line]
+    second = [line for line in old if f'"{pepstats}"' in line] + new
+
+    for name, lines in [
+        ("all.ldjson", old + new),
+        ("first.ldjson", first),
+        ("second.ldjson", second),
+    ]:
+        (tmp_path / name).write_text("\n".join(lines) + "\n")
+
+    def path(name: str) -> str:
+        return str(tmp_path / name)
+
+    predutils(["load_db", path("plain.db"), path("all.ldjson")])
+    predutils([
+        "load_db", "--features",
+        path("features.db"), path("all.ldjson")
+    ])
+
+    # The features are kept up to date once the table exists.
+    predutils([
+        "load_db", "--features",
+        path("split.db"), path("first.ldjson")
+    ])
+    predutils(["load_db", path("split.db"), path("second.ldjson")])
+
+    with sqlite3.connect(path("split.db")) as con:
+        n = con.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+        assert n == 30
+
+    for db in ["plain", "features", "split"]:
+        predutils(["rank", "-o", path(f"{db}.tsv"), path(f"{db}.db")])
+
+    expected = (tmp_path / "plain.tsv").read_text()
+    assert len(expected.splitlines()) == 31
+    assert (tmp_path / "features.tsv").read_text() == expected
+    assert (tmp_path / "split.tsv").read_text() == expected
+    return
@@ -0,0 +1,144 @@
+import pytest
+from io import StringIO
+
+from predectorutils.gff import (
+    GFFRecord,
+    GFFAttributes,
+    copy_records,
+    pack_records,
+    unpack_records,
+    write_blocks
+)
+from predectorutils.parsers import FieldParseError, ParseError
+
+
+def test_linking_records_is_idempotent_and_ordered():
+    parent = GFFRecord("chr1", "test", "gene", 0, 100)
+    children = [
+        GFFRecord("chr1", "test", "CDS", i, i + 10)
+        for i in range(5)
+    ]
+
+    parent.add_children(children)
+    parent.add_children(children[::-1])
+    children[2].add_parent(parent)
+
+    assert list(parent.children) == children
+    assert all(list(c.parents) == [parent] for c in children)
+    assert len(children[0].children) == 0
+
+    parent.children = []
+    assert len(parent.children) == 0
+    return
+
+
+def test_unused_attributes_are_not_written():
+    attributes = GFFAttributes.parse("ID=one;Note=a%2Cb,c;custom=x")
+
+    assert attributes.alias == []
+    assert attributes.note == ["a,b", "c"]
+    assert attributes.as_str() == "ID=one;Note=a%2Cb,c;custom=x"
+
+    attributes.note = []
+    del attributes["custom"]
+    attributes.id = None
+    assert attributes.is_empty()
+    assert attributes.as_str() == "."
+    return
+
+
+def test_fast_parser_matches_validated_parser():
+    lines = [
+        "chr1\tsrc\tCDS\t10\t1\t.\t-\t2",
+        "chr1\tsrc\tgene\t1\t10\t0.5\t+\t.\tID=a%3Bb;Note=x,y;k=v",
+    ]
+
+    for line in lines:
+        fast = GFFRecord.parse_fast(line)
+        validated = GFFRecord.parse_validated(line)
+        assert str(fast) == str(validated)
+        assert repr(fast.attributes) == repr(validated.attributes)
+
+    with pytest.raises(FieldParseError):
+        GFFRecord.parse("chr1\tsrc\tgene\tone\t10\t.\t+\t.\tID=a")
+    return
+
+
+def test_blocks_from_file_flushes_at_directives():
+    gff = StringIO(
+        "chr1\tsrc\tmRNA\t1\t10\t.\t+\t.\tParent=gene1;ID=mrna1\n"
+        "chr1\tsrc\tgene\t1\t10\t.\t+\t.\tID=gene1\n"
+        "###\n"
+        "chr1\tsrc\tgene\t20\t30\t.\t+\t.\tID=gene2\n"
+        "chr2\tsrc\tgene\t1\t10\t.\t+\t.\tID=gene3\n"
+    )
+
+    blocks = list(GFFRecord.blocks_from_file(gff))
+    assert [[r.attributes.id for r in b] for b in blocks] == [
+        ["gene1", "mrna1"],
+        ["gene2"],
+        ["gene3"],
+    ]
+    assert [r.attributes.id for r in blocks[0][0].children] == ["mrna1"]
+
+    gff = StringIO(
+        "chr1\tsrc\tmRNA\t1\t10\t.\t+\t.\tParent=gene1;ID=mrna1\n"
+        "###\n"
+        "chr1\tsrc\tgene\t1\t10\t.\t+\t.\tID=gene1\n"
+    )
+
+    with pytest.raises(ParseError):
+        list(GFFRecord.from_file(gff, stream=True))
+    return
+
+
+def test_packed_records_keep_their_links():
+    gene = GFFRecord.parse("chr1\tsrc\tgene\t1\t10\t.\t+\t.\tID=gene1")
+    mrna = GFFRecord.parse("chr1\tsrc\tmRNA\t1\t10\t.\t+\t.\tID=mrna1")
+    cds = GFFRecord.parse("chr1\tsrc\tCDS\t1\t10\t.\t+\t0\tk=a%3Bb")
+    gene.add_child(mrna)
+    mrna.add_child(cds)
+    cds.add_derives_from(gene)
+
+    records = unpack_records(pack_records([mrna, cds]))
+    assert [str(r) for r in records] == [str(mrna), str(cds)]
+    assert list(records[0].children) == [records[1]]
+    assert len(records[0].parents) == 0
+    assert len(records[1].derives_from) == 0
+    return
+
+
+def test_copy_records_only_copies_links_between_records():
+    gene = GFFRecord.parse("chr1\tsrc\tgene\t1\t10\t.\t+\t.\tID=gene1")
+    mrna = GFFRecord.parse("chr1\tsrc\tmRNA\t1\t10\t.\t+\t.\tID=mrna1")
+    cds = GFFRecord.parse("chr1\tsrc\tCDS\t1\t10\t.\t+\t0\tNote=a,b;k=v")
+    gene.add_child(mrna)
+    mrna.add_child(cds)
+
+    new_mrna, new_cds = copy_records([mrna, cds])
+    assert str(new_cds) == str(cds)
+    assert list(new_mrna.children) == [new_cds]
+    assert list(new_cds.parents) == [new_mrna]
+    assert len(new_mrna.parents) == 0
+
+    new_cds.attributes.note.append("c")
+    new_cds.attributes.custom["k"] = "w"
+    assert cds.attributes.as_str() == "Note=a,b;k=v"
+    return
+
+
+def test_write_blocks_matches_printing_each_block():
+    blocks = [
+        f"chr1\tsrc\tgene\t{i}\t{i}\t.\t+\t.\t.\n###"
+        for i in range(5)
+    ]
+
+    for buffer_size in (1, 50, 1 << 20):
+        handle = StringIO()
+        write_blocks(iter(blocks), handle, buffer_size=buffer_size)
+        assert handle.getvalue() == "".join(b + "\n" for b in blocks)
+
+    handle = StringIO()
+    write_blocks([], handle)
+    assert handle.getvalue() == ""
+    return
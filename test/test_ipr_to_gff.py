@@ -0,0 +1,57 @@
+from io import StringIO
+
+from predectorutils.subcommands.ipr_to_gff import (
+    convert,
+    convert_chunk,
+    split_proteins,
+    NAMESPACE,
+)
+
+PROTEIN = """    <protein>
+        <sequence md5="abc">MAGIC</sequence>
+        <xref id="prot{i}" name="prot{i}"/>
+        <matches>
+            <coils-match>
+                <signature ac="Coil">
+                    <signature-library-release library="COILS" version="2.2"/>
+                </signature>
+                <locations>
+                    <coils-location start="{i}" end="20">
+                        <location-fragments>
+                            <coils-location-fragment start="{i}" end="20"/>
+                        </location-fragments>
+                    </coils-location>
+                </locations>
+            </coils-match>
+        </matches>
+    </protein>
+"""
+
+
+def make_xml(nproteins: int) -> str:
+    return "".join([
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f'<protein-matches xmlns="{NAMESPACE[1:-1]}" ',
+        'interproscan-version="5.59-91.0">\n',
+        *(PROTEIN.format(i=i + 1) for i in range(nproteins)),
+        "</protein-matches>\n"
+    ])
+
+
+def test_converting_chunks_matches_converting_the_file():
+    xml = make_xml(5)
+
+    expected = StringIO()
+    convert(StringIO(xml), expected, NAMESPACE)
+    assert len(expected.getvalue().splitlines()) == 5
+
+    for read_size in (7, 1 << 20):
+        chunks = list(split_proteins(StringIO(xml), 2, read_size=read_size))
+        assert len(chunks) == 3
+        assert all(c.endswith("</protein></protein-matches>") for c in chunks)
+
+        output = "".join(convert_chunk(c, NAMESPACE) for c in chunks)
+        assert output == expected.getvalue()
+
+    assert list(split_proteins(StringIO(make_xml(0)))) == []
+    return
@@ -0,0 +1,64 @@
+import json
+from io import StringIO
+
+import pytest
+
+from predectorutils import ldjson
+
+
+@pytest.mark.parametrize("obj", [
+    '{"name":"one","prob":0.5}',
+    '{"prob":0.5,"name": "a \\"quoted\\" name"}',
+    '{"prob":0.5,"other_name":"x"}',
+    '{}',
+    '{"prob" : 0.5, "name" : "one"}',
+    '{"other":{"name":"x"},"prob":0.5}',
+])
+def test_set_field_matches_decoding(obj):
+    expected = json.loads(obj)
+    expected["name"] = "two"
+
+    def no_duplicates(pairs: list[tuple[str, object]]) -> dict[str, object]:
+        assert len({k for k, _ in pairs}) == len(pairs)
+        return dict(pairs)
+
+    out = ldjson.set_field(obj, "name", "two")
+    assert json.loads(out, object_pairs_hook=no_duplicates) == expected
+    return
+
+
+def test_write_lines():
+    handle = StringIO()
+    lines = [ldjson.dumps({"i": i}) for i in range(100)]
+
+    assert ldjson.write_lines(lines, handle, buffer_size=64) == 100
+    assert [ldjson.loads(line) for line in handle.getvalue().splitlines()] == [
+        {"i": i} for i in range(100)
+    ]
+    return
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_dumps_layout(monkeypatch, use_orjson):
+    if use_orjson and (ldjson.orjson is None):
+        pytest.skip("orjson isn't installed")
+
+    monkeypatch.setattr(ldjson, "USE_ORJSON", use_orjson)
+
+    obj = {"name": "one", "prob": 0.5, "hits": [1, 2], "database": None}
+    compact = '{"name":"one","prob":0.5,"hits":[1,2],"database":null}'
+    assert ldjson.dumps(obj) == compact
+
+    # The json module keeps the layout that r2js and regex always had.
+    if use_orjson:
+        assert ldjson.dumps(obj, compact=False) == compact
+        nan = ldjson.dumps({"x": float("nan"), "y": None}, compact=False)
+        assert nan == '{"x":NaN,"y":null}'
+    else:
+        assert ldjson.dumps(obj, compact=False) == json.dumps(obj)
+
+    for value in [float("nan"), float("inf"), float("-inf")]:
+        decoded = ldjson.loads(ldjson.dumps({"database": None, "x": value}))
+        assert decoded["database"] is None
+        assert repr(decoded["x"]) == repr(value)
+    return
@@ -0,0 +1,79 @@
+import sys
+import subprocess
+
+import pytest
+
+from predectorutils.main import SUBCOMMANDS, cli, selected_subcommand
+
+
+def import_times(args: list[str]) -> dict[str, int]:
+    """ Parses the arguments in a new interpreter using -X importtime.
+
+    Returns the cumulative time in microseconds to import each module.
+    Modules imported with importlib aren't reported, so this includes the
+    dependencies of the selected subcommand but not the subcommand itself.
+    """
+    code = (
+        "from predectorutils.main import cli; "
+        f"cli('predutils', {args!r})"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def test_selected_subcommand_skips_flags():
+    assert selected_subcommand(["--version"]) is None
+    assert selected_subcommand(["-h", "gff", "-o", "out"]) == "gff"
+    assert selected_subcommand(["not_a_subcommand", "gff"]) is None
+    return
+
+
+def test_only_the_selected_subcommand_is_imported():
+    times = import_times(["gff", "--help"])
+
+    assert "predectorutils.analyses" in times
+    assert "pandas" not in times
+    assert "xgboost" not in times
+
+    times = import_times(["rank", "--help"])
+    assert "xgboost" in times
+    return
+
+
+def test_r2js_skips_the_other_subcommands():
+    times = import_times(["r2js", "--help"])
+
+    assert "predectorutils.analyses" in times
+    assert "pandas" not in times
+    assert "xgboost" not in times
+    assert not any(
+        name.startswith("predectorutils.subcommands.")
+        for name
+        in times
+    )
+    return
+
+
+@pytest.mark.parametrize("name", list(SUBCOMMANDS))
+def test_every_subcommand_has_a_cli(name, capsys):
+    with pytest.raises(SystemExit) as e:
+        cli("predutils", [name, "--help"])
+
+    assert e.value.code == 0
+    assert f"usage: predutils {name}" in capsys.readouterr().out
+    return
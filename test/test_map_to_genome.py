@@ -0,0 +1,80 @@
+import pytest
+
+
+def read_outputs(tmp_path, prefix: str) -> dict[str, str]:
+    return {
+        p.name[len(prefix):]: p.read_text()
+        for p
+        in sorted(tmp_path.glob(f"{prefix}*"))
+    }
+
+
+@pytest.mark.parametrize("split", [None, "source", "type"])
+def test_sorted_matches_default(tmp_path, predutils, gene_annotations, split):
+    genes, annotations = gene_annotations(50, missing_cdss=(3,))
+    (tmp_path / "genes.gff3").write_text(genes)
+    (tmp_path / "annotations.gff3").write_text(annotations)
+    assert "mrna0003\t" in annotations
+
+    args = [str(tmp_path / "genes.gff3"), str(tmp_path / "annotations.gff3")]
+    if split is not None:
+        args.extend(["--split", split])
+
+    predutils(["map_to_genome", "-o", str(tmp_path / "default_"), *args])
+
+    # A small chunk size makes the sort use temporary files.
+    predutils([
+        "map_to_genome",
+        "--sorted",
+        "--chunk-size", "7",
+        "-o", str(tmp_path / "sorted_"),
+        *args
+    ])
+
+    default = read_outputs(tmp_path, "default_")
+    assert len(default) > 0
+    assert all(len(v) > 0 for v in default.values())
+    assert "mrna0003" not in "".join(default.values())
+    assert read_outputs(tmp_path, "sorted_") == default
+    return
+
+
+@pytest.mark.parametrize("sorted_", [False, True])
+@pytest.mark.parametrize("split", [None, "source", "type"])
+def test_jobs_match_one_job(
+    tmp_path,
+    monkeypatch,
+    predutils,
+    gene_annotations,
+    split,
+    sorted_,
+):
+    from predectorutils.subcommands import map_to_genome
+
+    # Small batches so that the proteins are spread over the workers.
+    monkeypatch.setattr(map_to_genome, "BATCH_SIZE", 4)
+
+    genes, annotations = gene_annotations(50, missing_cdss=(3,))
+    (tmp_path / "genes.gff3").write_text(genes)
+    (tmp_path / "annotations.gff3").write_text(annotations)
+
+    args = [str(tmp_path / "genes.gff3"), str(tmp_path / "annotations.gff3")]
+    if split is not None:
+        args.extend(["--split", split])
+
+    if sorted_:
+        args.append("--sorted")
+
+    predutils(["map_to_genome", "-o", str(tmp_path / "one_"), *args])
+    predutils([
+        "map_to_genome",
+        "-j", "2",
+        "-o", str(tmp_path / "two_"),
+        *args
+    ])
+
+    one = read_outputs(tmp_path, "one_")
+    assert len(one) > 0
+    assert all(len(v) > 0 for v in one.values())
+    assert read_outputs(tmp_path, "two_") == one
+    return
@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from Bio import SeqIO
+
+from predectorutils.checksum_cache import (
+    cache_path,
+    read_checksum_cache,
+    sequence_checksums,
+    write_checksum_cache
+)
+from predectorutils.database import load_db, ResultsTable, ResultRow
+from predectorutils.main import cli, import_subcommand
+
+# "three" is a duplicate of "one", and the sequences are wrapped
+# differently to how SeqIO writes them.
+FASTA = (
+    ">one first\nMAGICKRRAAKR\n"
+    ">two\nMRLRKRTT\nAAAGGG\n"
+    ">three\nMAGICKRRAAKR\n"
+    ">four\nMKKLLRRAA\n"
+)
+
+ANALYSES = "effectorp1\t1.0\t\nphobius\t1.0\t\n"
+
+
+def make_line(name: str, seq: str) -> str:
+    checksum, md5sum = sequence_checksums(seq)
+    return json.dumps({
+        "analysis": "effectorp1",
+        "software": "EffectorP",
+        "software_version": "1.0",
+        "checksum": checksum,
+        "md5sum": md5sum,
+        "data": {"name": name, "prediction": "Effector", "prob": 0.5},
+    })
+
+
+def run(args: list[str]) -> None:
+    parsed = cli("predutils", args)
+    try:
+        import_subcommand(parsed.subparser_name).runner(parsed)
+    finally:
+        for value in vars(parsed).values():
+            if hasattr(value, "close"):
+                value.close()
+    return
+
+
+def read_outputs(outdir) -> dict[str, set[tuple[str, str]]]:
+    """ The id and sequence of each remaining record by output file. """
+    return {
+        p.name: {(r.id, str(r.seq)) for r in SeqIO.parse(str(p), "fasta")}
+        for p in outdir.iterdir()
+    }
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    db = tmp_path / "results.db"
+    con, cur = load_db(str(db))
+    tab = ResultsTable(con, cur)
+    tab.create_result_tables()
+    tab.insert_results(ResultRow.from_file(
+        [make_line("one", "MAGICKRRAAKR"), make_line("two", "MRLRKRTTAAAGGG")],
+        drop_name=True
+    ))
+    con.commit()
+    con.close()
+
+    (tmp_path / "in.fasta").write_text(FASTA)
+    (tmp_path / "analyses.tsv").write_text(ANALYSES)
+    return tmp_path
+
+
+def run_precomputed(tmp_path, name: str, *flags: str):
+    outdir = tmp_path / name
+    outdir.mkdir()
+    outfile = tmp_path / f"{name}.ldjson"
+
+    run([
+        "precomputed",
+        *flags,
+        "-o", str(outfile),
+        "-t", str(outdir / "{analysis}.fasta"),
+        str(tmp_path / "results.db"),
+        str(tmp_path / "analyses.tsv"),
+        str(tmp_path / "in.fasta"),
+    ])
+    return sorted(outfile.read_text().splitlines()), read_outputs(outdir)
+
+
+def test_stream_matches_default(inputs):
+    fasta = inputs / "in.fasta"
+
+    expected = run_precomputed(inputs, "default", "--no-checksum-cache")
+    assert not (inputs / cache_path(fasta.name)).exists()
+
+    results, remaining = expected
+    assert len(results) == 2
+    assert remaining == {
+        "effectorp1.fasta": {("four", "MKKLLRRAA")},
+        "phobius.fasta": {
+            ("one", "MAGICKRRAAKR"),
+            ("two", "MRLRKRTTAAAGGG"),
+            ("three", "MAGICKRRAAKR"),
+            ("four", "MKKLLRRAA"),
+        },
+    }
+
+    # Without the sidecar, then writing and reading it.
+    assert run_precomputed(
+        inputs,
+        "stream",
+        "--stream",
+        "--no-checksum-cache"
+    ) == expected
+    assert not (inputs / cache_path(fasta.name)).exists()
+    assert run_precomputed(inputs, "no_cache", "--stream") == expected
+    assert (inputs / cache_path(fasta.name)).exists()
+    assert run_precomputed(inputs, "cached", "--stream") == expected
+
+    (inputs / cache_path(fasta.name)).unlink()
+    assert run_precomputed(inputs, "write_cache") == expected
+    assert run_precomputed(inputs, "default_cached", "--stream") == expected
+    return
+
+
+def test_stream_replaces_a_bad_cache(inputs):
+    fasta = str(inputs / "in.fasta")
+    expected = run_precomputed(inputs, "default", "--no-checksum-cache")
+
+    rows = [
+        ("one", *sequence_checksums("MAGICKRRAAKR")),
+        ("two", *sequence_checksums("MRLRKRTTAAAGGG")),
+    ]
+
+    # Up to date, but with fewer rows than records.
+    write_checksum_cache(fasta, rows)
+    assert run_precomputed(inputs, "stream", "--stream") == expected
+
+    cached = read_checksum_cache(fasta)
+    assert cached is not None
+    assert [id_ for id_, _, _ in cached] == ["one", "two", "three", "four"]
+    assert cached[:2] == rows
+    return
@@ -0,0 +1,45 @@
+import pytest
+
+
+def read_outputs(tmp_path, prefix: str) -> dict[str, str]:
+    return {
+        p.name[len(prefix):]: p.read_text()
+        for p
+        in sorted(tmp_path.glob(f"{prefix}*"))
+    }
+
+
+@pytest.mark.parametrize("split", [False, True])
+def test_jobs_match_one_job(
+    tmp_path,
+    monkeypatch,
+    predutils,
+    gene_annotations,
+    split,
+):
+    from predectorutils.subcommands import prot_to_genome
+
+    # Small batches so that the proteins are spread over the workers.
+    monkeypatch.setattr(prot_to_genome, "BATCH_SIZE", 4)
+
+    genes, annotations = gene_annotations(50, missing_cdss=(3,))
+    (tmp_path / "genes.gff3").write_text(genes)
+    (tmp_path / "annotations.gff3").write_text(annotations)
+
+    args = [str(tmp_path / "genes.gff3"), str(tmp_path / "annotations.gff3")]
+    if split:
+        args.append("--split")
+
+    predutils(["prot_to_genome", "-o", str(tmp_path / "one_"), *args])
+    predutils([
+        "prot_to_genome",
+        "-j", "2",
+        "-o", str(tmp_path / "two_"),
+        *args
+    ])
+
+    one = read_outputs(tmp_path, "one_")
+    assert len(one) > 0
+    assert all(len(v) > 0 for v in one.values())
+    assert read_outputs(tmp_path, "two_") == one
+    return
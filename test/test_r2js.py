@@ -0,0 +1,41 @@
+import json
+import math
+
+FASTA = ">one\nMAGIC\n>two\nMKKL\n"
+
+# ApoplastP probabilities aren't optional, so NaN is a real value.
+APOPLASTP = "one\tApoplastic\tnan\ntwo\tNon-apoplastic\t0.25\n"
+
+
+def test_nan_values_load_back(tmp_path, predutils):
+    (tmp_path / "in.fasta").write_text(FASTA)
+    (tmp_path / "apoplastp.txt").write_text(APOPLASTP)
+
+    def path(name: str) -> str:
+        return str(tmp_path / name)
+
+    predutils([
+        "r2js",
+        "--no-checksum-cache",
+        "--software-version", "1.0",
+        "-o", path("out.ldjson"),
+        "apoplastp",
+        path("apoplastp.txt"),
+        path("in.fasta"),
+    ])
+
+    lines = (tmp_path / "out.ldjson").read_text().splitlines()
+    probs = [json.loads(line)["data"]["prob"] for line in lines]
+    assert math.isnan(probs[0])
+    assert probs[1] == 0.25
+
+    predutils(["load_db", "--typed", path("results.db"), path("out.ldjson")])
+    predutils(["dump_db", "-o", path("dump.ldjson"), path("results.db")])
+
+    dumped = [
+        json.loads(line)["data"]["prob"]
+        for line
+        in (tmp_path / "dump.ldjson").read_text().splitlines()
+    ]
+    assert sorted(map(repr, dumped)) == ["0.25", "nan"]
+    return
@@ -0,0 +1,95 @@
+from io import StringIO
+
+import pytest
+
+from predectorutils.analyses import Analyses
+from predectorutils.parsers import ParseError
+from predectorutils.subcommands.r2js import convert_file
+from predectorutils.subcommands.r2js_batch import (
+    ManifestEntry,
+    convert_entries,
+    parse_manifest,
+)
+
+KEX2 = (
+    "name\tkind\tpattern\tmatch\tstart\tend\n"
+    "one\tkex2_cutsite\t[KR]R\tKR\t5\t7\n"
+    "two\tkex2_cutsite\t[KR]R\tRR\t1\t3\n"
+)
+
+
+def test_parse_manifest_fills_in_missing_versions():
+    manifest = StringIO(
+        "# analysis\tinfile\n"
+        "kex2_cutsite\tkex2.tsv\n"
+        "\n"
+        "pepstats\tpepstats.txt\t6.6.0\t\n"
+    )
+
+    assert parse_manifest(manifest) == [
+        ManifestEntry(Analyses.kex2_cutsite, "kex2.tsv", None, None),
+        ManifestEntry(Analyses.pepstats, "pepstats.txt", "6.6.0", None),
+    ]
+
+    with pytest.raises(ParseError):
+        parse_manifest(StringIO("not_an_analysis\tfile.txt\n"))
+    return
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_entries_matches_converting_each_file(tmp_path, jobs):
+    kex2 = tmp_path / "kex2.tsv"
+    kex2.write_text(KEX2)
+    checksums = {"one": "c1", "two": "c2"}
+    md5sums = {"one": "m1", "two": "m2"}
+
+    entries = [
+        ManifestEntry(Analyses.kex2_cutsite, str(kex2), "1", None),
+        ManifestEntry(Analyses.kex2_cutsite, str(kex2), None, None),
+    ]
+
+    expected = []
+    for entry in entries:
+        with open(entry.infile) as handle:
+            expected.extend(convert_file(
+                handle,
+                entry.analysis,
+                checksums,
+                md5sums,
+                "0.1",
+                entry.software_version,
+                entry.database_version
+            ))
+
+    converted = convert_entries(entries, checksums, md5sums, "0.1", jobs)
+    assert [e for e, _ in converted] == entries
+
+    converted = convert_entries(entries, checksums, md5sums, "0.1", jobs)
+    assert [line for _, lines in converted for line in lines] == expected
+    assert len(expected) == 4
+    return
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_empty_results_file_is_an_error(tmp_path, predutils, jobs):
+    (tmp_path / "kex2.tsv").write_text(KEX2)
+    (tmp_path / "empty.tsv").write_text("")
+    (tmp_path / "in.fasta").write_text(">one\nMKRAAA\n>two\nRRAAAA\n")
+    (tmp_path / "manifest.tsv").write_text(
+        f"kex2_cutsite\t{tmp_path / 'kex2.tsv'}\n"
+        f"rxlr_like_motif\t{tmp_path / 'empty.tsv'}\n"
+    )
+
+    with pytest.raises(ParseError) as e:
+        predutils([
+            "r2js_batch",
+            "--no-checksum-cache",
+            "-j", jobs,
+            "-o", str(tmp_path / "out.ldjson"),
+            str(tmp_path / "manifest.tsv"),
+            str(tmp_path / "in.fasta"),
+        ])
+
+    assert e.value.filename == str(tmp_path / "empty.tsv")
+    assert len((tmp_path / "out.ldjson").read_text().splitlines()) == 2
+    return
@@ -0,0 +1,148 @@
+import sqlite3
+
+from io import StringIO
+
+import pandas as pd
+
+from predectorutils.analyses import Analyses
+from predectorutils.subcommands.rank import RANK_COLUMNS, write_merged_chunks
+
+from conftest import RANK_FIELDS
+
+
+def read_table(db: str, query: str) -> dict[str, str]:
+    con = sqlite3.connect(db)
+    try:
+        return dict(con.execute(query).fetchall())
+    finally:
+        con.close()
+
+
+def by_score(table: str) -> list[tuple[str, list[str]]]:
+    """ Groups the rows by effector score, in order.
+
+    The order of rows with equal scores can depend on how they're sorted.
+    """
+    header, *rows = table.splitlines()
+    groups: dict[str, list[str]] = {}
+    for row in rows:
+        score = row.split("\t")[header.split("\t").index("effector_score")]
+        groups.setdefault(score, []).append(row)
+    return [(header, [])] + [(k, sorted(v)) for k, v in groups.items()]
+
+
+def test_incremental_matches_full_rank(tmp_path, rank_results, predutils):
+    old = rank_results(15, seed=1)
+    new = rank_results(10, seed=2)
+
+    # The second load adds pepstats for the old proteins, so they
+    # need re-scoring alongside the new ones.
+    pepstats = str(Analyses.pepstats)
+    first = [line for line in old if f'"{pepstats}"' not in line]
+    second = [line for line in old if f'"{pepstats}"' in line] + new
+
+    db = str(tmp_path / "results.db")
+
+    def load(name: str, lines: list[str]) -> None:
+        path = tmp_path / name
+        path.write_text("\n".join(lines) + "\n")
+        predutils(["load_db", db, str(path)])
+        return
+
+    def rank(name: str, *flags: str) -> str:
+        outfile = tmp_path / f"{name}.tsv"
+        predutils(["rank", *flags, "-o", str(outfile), db])
+        return outfile.read_text()
+
+    def fingerprints() -> dict[str, str]:
+        return read_table(db, "SELECT checksum, fingerprint FROM rank_cache")
+
+    load("first.ldjson", first)
+    expected = rank("full1")
+    assert len(expected.splitlines()) == 16
+    assert rank("incremental1", "--incremental") == expected
+
+    before = fingerprints()
+    assert len(before) == 15
+
+    load("second.ldjson", second)
+    expected = rank("full2")
+    assert len(expected.splitlines()) == 26
+    assert rank("incremental2", "--incremental") == expected
+
+    after = fingerprints()
+    assert len(after) == 25
+    assert all(after[k] != v for k, v in before.items())
+
+    # Nothing changed, so the cache is reused as is.
+    assert rank("incremental3", "--incremental") == expected
+    assert fingerprints() == after
+
+    # Changing a weight must re-score everything.
+    digest = read_table(db, "SELECT digest, 1 FROM rank_parameters")
+    weight = ["--effectorp1-weight", "10"]
+    expected = rank("full4", *weight)
+    assert expected != rank("full2")
+    assert rank("incremental4", "--incremental", *weight) == expected
+    assert read_table(db, "SELECT digest, 1 FROM rank_parameters") != digest
+    return
+
+
+def test_chunked_matches_full_rank(tmp_path, rank_results, predutils):
+    db = str(tmp_path / "results.db")
+    results = tmp_path / "results.ldjson"
+    # Proteins without localizer or pepstats results have missing
+    # integer values.
+    partial = [
+        an
+        for an in RANK_FIELDS
+        if an not in (Analyses.localizer, Analyses.pepstats)
+    ]
+    lines = (
+        rank_results(20, seed=3) +
+        rank_results(5, seed=4, analyses=partial)
+    )
+    results.write_text("\n".join(lines) + "\n")
+    predutils(["load_db", db, str(results)])
+
+    def rank(name: str, *flags: str) -> str:
+        outfile = tmp_path / f"{name}.tsv"
+        predutils(["rank", *flags, "-o", str(outfile), db])
+        return outfile.read_text()
+
+    expected = rank("full")
+    assert len(expected.splitlines()) == 26
+
+    chunked = rank("chunked", "--chunk-size", "7")
+    assert by_score(chunked) == by_score(expected)
+    assert by_score(rank(
+        "incremental",
+        "--incremental",
+        "--chunk-size", "7"
+    )) == by_score(expected)
+    return
+
+
+def test_merged_chunks_match_one_table():
+    def chunk(names: list[str], scores: list[float]) -> pd.DataFrame:
+        df = pd.DataFrame({c: 1 for c in RANK_COLUMNS}, index=names)
+        df["name"] = names
+        df["effector_score"] = scores
+        return df
+
+    chunks = [
+        chunk(["a", "b", "c"], [0.5, float("nan"), 2.0]),
+        chunk(["d", "e"], [1.0, 0.5]),
+    ]
+    # One column has a missing value in the first chunk only.
+    chunks[0].loc["a", "residue_number"] = None
+
+    expected = StringIO()
+    df = pd.concat(chunks)
+    df.sort_values("effector_score", ascending=False, inplace=True)
+    df.round(3).to_csv(expected, sep="\t", index=False, na_rep=".")
+
+    outfile = StringIO()
+    write_merged_chunks(chunks, outfile)
+    assert outfile.getvalue() == expected.getvalue()
+    return
@@ -0,0 +1,99 @@
+import struct
+
+import numpy as np
+import pandas as pd
+
+from predectorutils.bigwig import BIGWIG_MAGIC, HEADER
+from predectorutils.subcommands.scores_to_genome import (
+    split_overlaps,
+    reduce_segments
+)
+
+
+def test_split_overlaps_matches_every_covering_interval():
+    starts = np.array([0, 10, 10, 40])
+    ends = np.array([30, 20, 20, 50])
+
+    boundaries, segments, intervals = split_overlaps(starts, ends)
+
+    covering = sorted(
+        (int(boundaries[s]), int(boundaries[s + 1]), int(i))
+        for s, i in zip(segments, intervals)
+    )
+    assert covering == [
+        (0, 10, 0),
+        (10, 20, 0),
+        (10, 20, 1),
+        (10, 20, 2),
+        (20, 30, 0),
+        (40, 50, 3),
+    ]
+    return
+
+
+def test_reduce_segments():
+    cdss = pd.DataFrame(
+        [
+            ("chr2", 0, 30, "a"),
+            ("chr2", 10, 20, "b"),
+            ("chr1", 5, 15, None),
+            ("chr1", 0, 10, "b"),
+        ],
+        columns=["seqid", "start", "end", "name"]
+    )
+    preds = pd.DataFrame(
+        {"score": [1.0, 3.0]},
+        index=pd.Index(["a", "b"], name="name")
+    )
+
+    bedgraph = reduce_segments(cdss, preds, "mean")
+    assert bedgraph.values.tolist() == [
+        ["chr1", 0, 5, 3.0],
+        ["chr1", 5, 10, 3.0],
+        ["chr2", 0, 10, 1.0],
+        ["chr2", 10, 20, 2.0],
+        ["chr2", 20, 30, 1.0],
+    ]
+    return
+
+
+def test_no_cdss_give_empty_tracks(tmp_path, predutils):
+    (tmp_path / "genes.gff3").write_text(
+        "##gff-version 3\n"
+        "chr1\tsrc\tgene\t1\t100\t.\t+\t.\tID=gene1\n"
+    )
+    (tmp_path / "ranked.tsv").write_text(
+        "name\teffector_score\teffectorp1\n"
+        "mrna1\t1.5\t0.5\n"
+    )
+
+    def path(name: str) -> str:
+        return str(tmp_path / name)
+
+    predutils([
+        "scores_to_genome",
+        "--target", "effector_score", "effectorp1",
+        "-o", path("out.bedgraph"),
+        path("genes.gff3"),
+        path("ranked.tsv"),
+    ])
+    assert (tmp_path / "out.bedgraph").read_text() == (
+        "#seqid\tstart\tend\teffector_score\teffectorp1\n"
+    )
+
+    predutils([
+        "scores_to_genome",
+        "--target", "effector_score", "effectorp1",
+        "--bigwig", path("out_"),
+        path("genes.gff3"),
+        path("ranked.tsv"),
+    ])
+
+    for column in ["effector_score", "effectorp1"]:
+        data = (tmp_path / f"out_{column}.bw").read_bytes()
+        assert struct.unpack_from("<I", data)[0] == BIGWIG_MAGIC
+
+        # The data section starts with the number of blocks.
+        data_offset = HEADER.unpack_from(data)[4]
+        assert struct.unpack_from("<Q", data, data_offset)[0] == 0
+    return
@@ -0,0 +1,164 @@
+import os
+import sys
+import stat
+import time
+import signal
+import subprocess
+
+from contextlib import contextmanager
+
+import pytest
+
+import predectorutils
+
+FASTA = ">one\nMAGICKRRAAKR\n>two\nMRLRKRTTAAA\n"
+
+
+def environment() -> dict[str, str]:
+    """ Lets the commands import this copy of predectorutils from any cwd. """
+    env = dict(os.environ)
+    env.pop("PREDUTILS_SOCKET", None)
+
+    # rank orders some sets by their hash, so local and served commands
+    # need the same seed.
+    env["PYTHONHASHSEED"] = "0"
+
+    src = os.path.dirname(os.path.dirname(predectorutils.__file__))
+    env["PYTHONPATH"] = os.pathsep.join([src, env.get("PYTHONPATH", "")])
+    return env
+
+
+def predutils(args, cwd, socket=None, stdin=None):
+    env = environment()
+
+    if socket is not None:
+        env["PREDUTILS_SOCKET"] = str(socket)
+
+    return subprocess.run(
+        [sys.executable, "-m", "predectorutils.main", *args],
+        cwd=cwd,
+        env=env,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+@contextmanager
+def serving(socket, preload):
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "predectorutils.main",
+            "serve", str(socket), "--preload", *preload
+        ],
+        env=environment(),
+        stderr=subprocess.DEVNULL,
+    )
+
+    for _ in range(200):
+        if socket.exists():
+            break
+        time.sleep(0.05)
+
+    yield socket
+
+    process.terminate()
+    process.wait(timeout=10)
+    assert not socket.exists()
+    return
+
+
+@pytest.fixture
+def server(tmp_path):
+    with serving(tmp_path / "predutils.sock", ["regex"]) as socket:
+        yield socket
+    return
+
+
+def test_served_commands_match_local_commands(tmp_path, server):
+    (tmp_path / "in.fasta").write_text(FASTA)
+
+    commands = [
+        (["regex", "-k", "kex2_cutsite", "in.fasta"], None),
+        (["regex", "-k", "kex2_cutsite", "-"], FASTA),
+        (["regex", "-k", "kex2_cutsite", "missing.fasta"], None),
+    ]
+
+    returncodes = []
+    for args, stdin in commands:
+        local = predutils(args, tmp_path, stdin=stdin)
+        served = predutils(args, tmp_path, socket=server, stdin=stdin)
+
+        assert served.returncode == local.returncode
+        assert served.stdout == local.stdout
+        assert served.stderr == local.stderr
+        returncodes.append(local.returncode)
+
+    assert returncodes[0] == 0
+    assert returncodes[2] != 0
+    return
+
+
+def test_commands_run_locally_without_a_server(tmp_path):
+    (tmp_path / "in.fasta").write_text(FASTA)
+    args = ["regex", "-k", "kex2_cutsite", "in.fasta"]
+
+    local = predutils(args, tmp_path)
+    served = predutils(args, tmp_path, socket=tmp_path / "missing.sock")
+
+    assert local.returncode == 0
+    assert served.stdout == local.stdout
+    return
+
+
+def test_only_the_owner_can_use_the_socket(server):
+    assert stat.S_IMODE(os.stat(server).st_mode) == 0o600
+    return
+
+
+def test_interrupts_stop_the_served_command(tmp_path, server):
+    env = environment()
+    env["PREDUTILS_SOCKET"] = str(server)
+
+    # This waits for stdin, which is never closed.
+    client = subprocess.Popen(
+        [
+            sys.executable, "-m", "predectorutils.main",
+            "regex", "-k", "kex2_cutsite", "-"
+        ],
+        cwd=tmp_path,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    time.sleep(1)
+    client.send_signal(signal.SIGTERM)
+    assert client.wait(timeout=10) == 128 + signal.SIGTERM
+
+    # The command shares the client's stdout, so this only finishes once
+    # the command has stopped too.
+    client.stdin.close()
+    client.stdout.read()
+    assert b"stopped before the command finished" in client.stderr.read()
+    client.stdout.close()
+    client.stderr.close()
+    return
+
+
+def test_served_rank_matches_local_rank(tmp_path, rank_results):
+    results = tmp_path / "results.ldjson"
+    results.write_text("\n".join(rank_results(10)) + "\n")
+    loaded = predutils(["load_db", "results.db", "results.ldjson"], tmp_path)
+    assert loaded.returncode == 0
+
+    # The server imports xgboost before forking the rank commands.
+    with serving(tmp_path / "predutils.sock", ["rank"]) as socket:
+        local = predutils(["rank", "results.db"], tmp_path)
+        for _ in range(2):
+            served = predutils(["rank", "results.db"], tmp_path, socket)
+            assert served.returncode == local.returncode == 0
+            assert served.stdout == local.stdout
+    return